@@ -1,16 +1,23 @@
-from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import crud
 from app.db.database import get_db
-from app.db.models import User, AlertStatus
+from app.db.models import User, AlertStatus, model_to_dict
+from app.core.cache import response_cache
+from app.core.responses import ORJSONResponse, ORJSONStreamingResponse
 from app.core.security import get_current_active_user
-from app.services.notification import NotificationService
+from app.services.notification import notification_service
 from pydantic import BaseModel, Field
 
 router = APIRouter()
-notification_service = NotificationService()
+
+# Seconds a cached /alerts/pending response may be served
+PENDING_ALERTS_CACHE_TTL = 15
 
 class AlertStatusUpdate(BaseModel):
     status: AlertStatus
@@ -23,103 +30,91 @@ class AlertResponse(BaseModel):
     severity: int
     status: str
     message: str
-    created_at: str
-    acknowledged_at: Optional[str] = None
+    created_at: datetime
+    acknowledged_at: Optional[datetime] = None
     acknowledged_by: Optional[str] = None
     patient: Optional[Dict[str, Any]] = None
 
+@dataclass
+class AlertPatientRow:
+    __slots__ = ("id", "first_name", "last_name", "mrn")
+    id: str
+    first_name: str
+    last_name: str
+    mrn: str
+
+@dataclass
+class AlertRow:
+    __slots__ = (
+        "id", "patient_id", "prediction_id", "alert_type", "severity", "status",
+        "message", "created_at", "acknowledged_at", "acknowledged_by", "patient",
+    )
+    id: str
+    patient_id: str
+    prediction_id: str
+    alert_type: str
+    severity: int
+    status: AlertStatus
+    message: str
+    created_at: datetime
+    acknowledged_at: Optional[datetime]
+    acknowledged_by: Optional[str]
+    patient: Optional[AlertPatientRow]
+
+def _alert_row(row: Tuple[Any, ...]) -> AlertRow:
+    """
+    Build an AlertRow from a crud.ALERT_ROW_COLUMNS tuple
+    """
+    return AlertRow(*row[:10], AlertPatientRow(*row[10:]) if row[10] is not None else None)
+
+def _serialize_alert_rows(rows: List[Tuple[Any, ...]]) -> ORJSONResponse:
+    """
+    Build the alert list response from crud.get_alert_rows tuples;
+    orjson serializes the slotted dataclasses (and their datetimes) natively
+    """
+    return ORJSONResponse([_alert_row(row) for row in rows])
+
 @router.get("/", response_model=List[AlertResponse])
 async def get_alerts(
     status: Optional[AlertStatus] = None,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
     Get all alerts with optional filtering by status
     """
-    # Query alerts
-    if status:
-        alerts = db.query(crud.Alert).filter(
-            crud.Alert.status == status
-        ).order_by(crud.Alert.created_at.desc()).offset(skip).limit(limit).all()
-    else:
-        alerts = db.query(crud.Alert).order_by(
-            crud.Alert.created_at.desc()
-        ).offset(skip).limit(limit).all()
-    
-    # Format response
-    result = []
-    for alert in alerts:
-        # Get patient data
-        patient = crud.get_patient(db, alert.patient_id)
-        patient_data = None
-        if patient:
-            patient_data = {
-                "id": patient.id,
-                "first_name": patient.first_name,
-                "last_name": patient.last_name,
-                "mrn": patient.mrn
-            }
-        
-        result.append({
-            "id": alert.id,
-            "patient_id": alert.patient_id,
-            "prediction_id": alert.prediction_id,
-            "alert_type": alert.alert_type,
-            "severity": alert.severity,
-            "status": alert.status,
-            "message": alert.message,
-            "created_at": alert.created_at.isoformat() if alert.created_at else None,
-            "acknowledged_at": alert.acknowledged_at.isoformat() if alert.acknowledged_at else None,
-            "acknowledged_by": alert.acknowledged_by,
-            "patient": patient_data
-        })
+    # Project alert and patient columns in one joined statement and stream
+    # rows out as they arrive (the session stays open until the body is sent)
+    rows = crud.stream_alert_rows(db, status=status, skip=skip, limit=limit)
     
-    return result
+    return ORJSONStreamingResponse(_alert_row(row) async for row in rows)
 
 @router.get("/pending", response_model=List[AlertResponse])
 async def get_pending_alerts(
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
     Get all pending (unacknowledged) alerts
     """
-    alerts = crud.get_pending_alerts(db, skip=skip, limit=limit)
-    
-    # Format response
-    result = []
-    for alert in alerts:
-        # Get patient data
-        patient = crud.get_patient(db, alert.patient_id)
-        patient_data = None
-        if patient:
-            patient_data = {
-                "id": patient.id,
-                "first_name": patient.first_name,
-                "last_name": patient.last_name,
-                "mrn": patient.mrn
-            }
-        
-        result.append({
-            "id": alert.id,
-            "patient_id": alert.patient_id,
-            "prediction_id": alert.prediction_id,
-            "alert_type": alert.alert_type,
-            "severity": alert.severity,
-            "status": alert.status,
-            "message": alert.message,
-            "created_at": alert.created_at.isoformat() if alert.created_at else None,
-            "acknowledged_at": alert.acknowledged_at.isoformat() if alert.acknowledged_at else None,
-            "acknowledged_by": alert.acknowledged_by,
-            "patient": patient_data
-        })
-    
-    return result
+    # Dashboards poll this endpoint; serve repeat calls straight from Redis
+    cache_key = f"{current_user.role}:{skip}:{limit}"
+    cached = await response_cache.get(crud.PENDING_ALERTS_CACHE_NAMESPACE, cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    rows = await crud.get_alert_rows(db, status=AlertStatus.PENDING, skip=skip, limit=limit)
+    
+    response = _serialize_alert_rows(rows)
+    await response_cache.set(
+        crud.PENDING_ALERTS_CACHE_NAMESPACE, cache_key, response.body,
+        expire=PENDING_ALERTS_CACHE_TTL
+    )
+    return response
 
 @router.get("/patient/{patient_id}", response_model=List[AlertResponse])
 async def get_patient_alerts(
@@ -127,154 +122,82 @@ async def get_patient_alerts(
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
     Get alerts for a specific patient
     """
-    # Check if patient exists
-    patient = crud.get_patient(db, patient_id)
-    if not patient:
+    # Get alerts; the joined patient columns double as the existence check
+    rows = await crud.get_alert_rows(db, patient_id=patient_id, skip=skip, limit=limit)
+    
+    # Only an empty page needs a separate lookup to tell "no alerts" from "no patient"
+    if not rows and not await crud.patient_exists(db, patient_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Patient {patient_id} not found"
         )
     
-    # Get alerts
-    alerts = crud.get_patient_alerts(db, patient_id, skip=skip, limit=limit)
-    
-    # Format response
-    result = []
-    for alert in alerts:
-        result.append({
-            "id": alert.id,
-            "patient_id": alert.patient_id,
-            "prediction_id": alert.prediction_id,
-            "alert_type": alert.alert_type,
-            "severity": alert.severity,
-            "status": alert.status,
-            "message": alert.message,
-            "created_at": alert.created_at.isoformat() if alert.created_at else None,
-            "acknowledged_at": alert.acknowledged_at.isoformat() if alert.acknowledged_at else None,
-            "acknowledged_by": alert.acknowledged_by,
-            "patient": {
-                "id": patient.id,
-                "first_name": patient.first_name,
-                "last_name": patient.last_name,
-                "mrn": patient.mrn
-            }
-        })
-    
-    return result
+    return _serialize_alert_rows(rows)
 
 @router.get("/{alert_id}", response_model=AlertResponse)
 async def get_alert(
-    alert_id: str,
+    alert_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Get a specific alert by ID
     """
-    alert = crud.get_alert(db, alert_id)
-    if not alert:
+    row = await crud.get_alert_row(db, alert_id)
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Alert {alert_id} not found"
         )
     
-    # Get patient data
-    patient = crud.get_patient(db, alert.patient_id)
-    patient_data = None
-    if patient:
-        patient_data = {
-            "id": patient.id,
-            "first_name": patient.first_name,
-            "last_name": patient.last_name,
-            "mrn": patient.mrn
-        }
-    
-    return {
-        "id": alert.id,
-        "patient_id": alert.patient_id,
-        "prediction_id": alert.prediction_id,
-        "alert_type": alert.alert_type,
-        "severity": alert.severity,
-        "status": alert.status,
-        "message": alert.message,
-        "created_at": alert.created_at.isoformat() if alert.created_at else None,
-        "acknowledged_at": alert.acknowledged_at.isoformat() if alert.acknowledged_at else None,
-        "acknowledged_by": alert.acknowledged_by,
-        "patient": patient_data
-    }
+    return ORJSONResponse(_alert_row(row))
 
 @router.put("/{alert_id}/status", response_model=AlertResponse)
 async def update_alert_status(
-    alert_id: str,
+    alert_id: UUID,
     status_update: AlertStatusUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Update the status of an alert (acknowledge, mark as actioned, dismiss)
     """
-    # Check if alert exists
-    alert = crud.get_alert(db, alert_id)
-    if not alert:
+    # Update status; the alert and its patient come back from the same statement
+    row = await crud.update_alert_status(
+        db, alert_id, status_update.status, current_user.id
+    )
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Alert {alert_id} not found"
         )
     
-    # Update status
-    updated_alert = crud.update_alert_status(
-        db, alert_id, status_update.status, current_user.id
-    )
-    
-    # Get patient data
-    patient = crud.get_patient(db, updated_alert.patient_id)
-    patient_data = None
-    if patient:
-        patient_data = {
-            "id": patient.id,
-            "first_name": patient.first_name,
-            "last_name": patient.last_name,
-            "mrn": patient.mrn
-        }
-    
-    return {
-        "id": updated_alert.id,
-        "patient_id": updated_alert.patient_id,
-        "prediction_id": updated_alert.prediction_id,
-        "alert_type": updated_alert.alert_type,
-        "severity": updated_alert.severity,
-        "status": updated_alert.status,
-        "message": updated_alert.message,
-        "created_at": updated_alert.created_at.isoformat() if updated_alert.created_at else None,
-        "acknowledged_at": updated_alert.acknowledged_at.isoformat() if updated_alert.acknowledged_at else None,
-        "acknowledged_by": updated_alert.acknowledged_by,
-        "patient": patient_data
-    }
+    return ORJSONResponse(_alert_row(row))
 
 @router.post("/{alert_id}/send-notification", response_model=Dict[str, Any])
 async def send_alert_notification(
-    alert_id: str,
+    alert_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Manually send notification for an existing alert
     """
     # Check if alert exists
-    alert = crud.get_alert(db, alert_id)
+    alert = await crud.get_alert(db, alert_id)
     if not alert:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Alert {alert_id} not found"
         )
     
-    # Get patient data
-    patient = crud.get_patient(db, alert.patient_id)
+    # Patient is eagerly loaded with the alert
+    patient = alert.patient
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -282,16 +205,13 @@ async def send_alert_notification(
         )
     
     # Get users to notify (only doctors and nurses)
-    users = db.query(User).filter(
-        User.is_active == True,
-        (User.role == "doctor") | (User.role == "nurse")
-    ).all()
+    users = await crud.get_notification_recipients(db)
     
     if not users:
         return {"status": "no_users", "message": "No active users to notify"}
     
     # Convert patient to dict
-    patient_dict = {c.key: getattr(patient, c.key) for c in patient.__table__.columns}
+    patient_dict = model_to_dict(patient)
     
     # Send notifications
     notification_results = await notification_service.notify_users_of_alert(
@@ -1,9 +1,10 @@
 from datetime import timedelta
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.security import (
@@ -32,25 +33,25 @@ class UserCreate(BaseModel):
     password: str = Field(..., min_length=8)
     full_name: str
     role: RoleType
-    department: str = None
+    department: Optional[str] = None
 
 class UserResponse(BaseModel):
     id: str
     email: str
     full_name: str
     role: str
-    department: str = None
+    department: Optional[str] = None
     is_active: bool
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
-    db: Session = Depends(get_db),
+async def login_for_access_token(
+    db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Dict[str, Any]:
     """
     Get access token for user authentication
     """
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+    user = await crud.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -73,15 +74,15 @@ def login_for_access_token(
     }
 
 @router.post("/register", response_model=UserResponse)
-def register_user(
+async def register_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Register a new user
     """
     # Check if user with this email already exists
-    db_user = crud.get_user_by_email(db, email=user_data.email)
+    db_user = await crud.get_user_by_email(db, email=user_data.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -89,11 +90,11 @@ def register_user(
         )
     
     # Create new user
-    user_dict = user_data.dict()
+    user_dict = user_data.model_dump()
     password = user_dict.pop("password")
-    user_dict["hashed_password"] = get_password_hash(password)
+    user_dict["hashed_password"] = await run_in_threadpool(get_password_hash, password)
     
-    new_user = crud.create_user(db, user_dict)
+    new_user = await crud.create_user(db, user_dict)
     
     return {
         "id": new_user.id,
@@ -1,39 +1,38 @@
 from typing import Generator, Optional
 
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import settings
-from app.core.security import get_current_user, get_current_active_user, get_current_superuser
+from app.core.security import (
+    oauth2_scheme, get_current_user, get_current_active_user, get_current_superuser
+)
 from app.db.database import get_db
 from app.db.models import User, RoleType
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token")
+# Role sets are built once; RoleType is a str enum, so raw strings match too
+_DOCTOR_OR_ADMIN = frozenset({RoleType.DOCTOR, RoleType.ADMIN})
+_NURSE_OR_ABOVE = frozenset({RoleType.NURSE, RoleType.DOCTOR, RoleType.ADMIN})
 
-def get_current_doctor_or_admin(
+async def get_current_doctor_or_admin(
     current_user: User = Depends(get_current_active_user),
 ) -> User:
     """
     Dependency to ensure user is a doctor or admin
     """
-    if current_user.role != RoleType.DOCTOR and current_user.role != RoleType.ADMIN:
+    if current_user.role not in _DOCTOR_OR_ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user doesn't have enough privileges",
         )
     return current_user
 
-def get_current_nurse_or_above(
+async def get_current_nurse_or_above(
     current_user: User = Depends(get_current_active_user),
 ) -> User:
     """
     Dependency to ensure user is a nurse, doctor, or admin
     """
-    if (current_user.role != RoleType.NURSE and 
-        current_user.role != RoleType.DOCTOR and 
-        current_user.role != RoleType.ADMIN):
-        
+    if current_user.role not in _NURSE_OR_ABOVE:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user doesn't have enough privileges",
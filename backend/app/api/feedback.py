@@ -1,17 +1,20 @@
+from datetime import datetime
 from typing import Any, Dict, List, Optional
+from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import crud
 from app.db.database import get_db
-from app.db.models import User, FeedbackType
+from app.db.models import User, RoleType, FeedbackType
+from app.core.responses import ORJSONResponse, ORJSONStreamingResponse
 from app.core.security import get_current_active_user
 from pydantic import BaseModel, Field
 
 router = APIRouter()
 
 class FeedbackCreate(BaseModel):
-    prediction_id: str
+    prediction_id: UUID
     feedback_type: FeedbackType
     comments: Optional[str] = None
 
@@ -21,31 +24,30 @@ class FeedbackResponse(BaseModel):
     user_id: str
     feedback_type: str
     comments: Optional[str] = None
-    created_at: str
+    created_at: datetime
     user_name: Optional[str] = None
 
 @router.post("/", response_model=FeedbackResponse)
 async def create_feedback(
     feedback_data: FeedbackCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Submit feedback on a sepsis prediction
     """
     # Check if prediction exists
-    prediction = crud.get_prediction(db, feedback_data.prediction_id)
-    if not prediction:
+    if not await crud.prediction_exists(db, feedback_data.prediction_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Prediction {feedback_data.prediction_id} not found"
         )
     
     # Create feedback
-    feedback_dict = feedback_data.dict()
+    feedback_dict = feedback_data.model_dump()
     feedback_dict["user_id"] = current_user.id
     
-    feedback = crud.create_feedback(db, feedback_dict)
+    feedback = await crud.create_feedback(db, feedback_dict)
     
     return {
         "id": feedback.id,
@@ -53,36 +55,34 @@ async def create_feedback(
         "user_id": feedback.user_id,
         "feedback_type": feedback.feedback_type,
         "comments": feedback.comments,
-        "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
+        "created_at": feedback.created_at,
         "user_name": current_user.full_name
     }
 
 @router.get("/prediction/{prediction_id}", response_model=List[FeedbackResponse])
 async def get_feedback_for_prediction(
-    prediction_id: str,
+    prediction_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
     Get all feedback for a specific prediction
     """
-    # Check if prediction exists
-    prediction = crud.get_prediction(db, prediction_id)
-    if not prediction:
+    # Get feedback
+    feedback_list = await crud.get_feedback_for_prediction(db, prediction_id)
+    
+    # Only an empty list needs a separate lookup to tell "no feedback" from "no prediction"
+    if not feedback_list and not await crud.prediction_exists(db, prediction_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Prediction {prediction_id} not found"
         )
     
-    # Get feedback
-    feedback_list = crud.get_feedback_for_prediction(db, prediction_id)
-    
     # Format response
     result = []
     for feedback in feedback_list:
-        # Get user name
-        user = crud.get_user(db, feedback.user_id)
-        user_name = user.full_name if user else None
+        # User is batch-loaded with the feedback
+        user_name = feedback.user.full_name if feedback.user else None
         
         result.append({
             "id": feedback.id,
@@ -90,32 +90,33 @@ async def get_feedback_for_prediction(
             "user_id": feedback.user_id,
             "feedback_type": feedback.feedback_type,
             "comments": feedback.comments,
-            "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
+            "created_at": feedback.created_at,
             "user_name": user_name
         })
     
-    return result
+    # Serialize directly; skips response_model re-validation and jsonable_encoder
+    return ORJSONResponse(result)
 
 @router.get("/user/{user_id}", response_model=List[FeedbackResponse])
 async def get_feedback_by_user(
-    user_id: str,
+    user_id: UUID,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
     Get all feedback submitted by a specific user
     """
     # Check permissions - users can only access their own feedback unless admin
-    if current_user.id != user_id and current_user.role != "admin":
+    if current_user.id != str(user_id) and current_user.role != RoleType.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access this user's feedback"
         )
     
     # Check if user exists
-    user = crud.get_user(db, user_id)
+    user = await crud.get_user(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -123,7 +124,7 @@ async def get_feedback_by_user(
         )
     
     # Get feedback
-    feedback_list = crud.get_user_feedback(db, user_id, skip=skip, limit=limit)
+    feedback_list = await crud.get_user_feedback(db, user_id, skip=skip, limit=limit)
     
     # Format response
     result = []
@@ -134,11 +135,11 @@ async def get_feedback_by_user(
             "user_id": feedback.user_id,
             "feedback_type": feedback.feedback_type,
             "comments": feedback.comments,
-            "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
+            "created_at": feedback.created_at,
             "user_name": user.full_name
         })
     
-    return result
+    return ORJSONResponse(result)
 
 @router.get("/patient/{patient_id}", response_model=List[FeedbackResponse])
 async def get_feedback_for_patient(
@@ -146,49 +147,19 @@ async def get_feedback_for_patient(
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
     Get all feedback related to predictions for a specific patient
     """
-    # Check if patient exists
-    patient = crud.get_patient(db, patient_id)
-    if not patient:
+    # Check if patient exists (checked up front: a streamed response can't turn into a 404)
+    if not await crud.patient_exists(db, patient_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Patient {patient_id} not found"
         )
     
-    # Get predictions for patient
-    predictions = crud.get_patient_predictions(db, patient_id)
-    prediction_ids = [pred.id for pred in predictions]
-    
-    if not prediction_ids:
-        return []
-    
-    # Get feedback for all predictions
-    feedback_list = []
-    for pred_id in prediction_ids:
-        feedback_list.extend(crud.get_feedback_for_prediction(db, pred_id))
-    
-    # Apply pagination
-    paginated_feedback = feedback_list[skip:skip+limit]
-    
-    # Format response
-    result = []
-    for feedback in paginated_feedback:
-        # Get user name
-        user = crud.get_user(db, feedback.user_id)
-        user_name = user.full_name if user else None
-        
-        result.append({
-            "id": feedback.id,
-            "prediction_id": feedback.prediction_id,
-            "user_id": feedback.user_id,
-            "feedback_type": feedback.feedback_type,
-            "comments": feedback.comments,
-            "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
-            "user_name": user_name
-        })
+    # Stream feedback across all of the patient's predictions (joined and paginated in SQL)
+    rows = crud.stream_patient_feedback_rows(db, patient_id, skip=skip, limit=limit)
     
-    return result
\ No newline at end of file
+    return ORJSONStreamingResponse(row._asdict() async for row in rows)
\ No newline at end of file
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+
+from app.core.responses import ORJSONResponse
+from app.utils.helpers import decode_cursor, encode_cursor
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# List pages carry an ETag; clients must revalidate, and shared caches must not store them
+LIST_CACHE_CONTROL = "private, no-cache"
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """
+    Decode the `cursor` query parameter, rejecting malformed tokens with a 400
+    """
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def weak_etag(*parts: Any) -> str:
+    """
+    Weak ETag for a response fully determined by `parts` (e.g. a table version
+    and the query parameters)
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    A 304 response if the request's If-None-Match already holds `etag`, else None
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    # Weak comparison: ignore W/ prefixes on either side
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+        )
+    return None
+
+def paginated_response(
+    rows: Sequence[Any],
+    limit: int,
+    sort_key: Callable[[Any], Tuple[datetime, str]],
+    serialize: Callable[[Any], Any],
+    etag: Optional[str] = None
+) -> ORJSONResponse:
+    """
+    Build a list response from `limit + 1` fetched rows; the extra row only
+    signals that another page exists, and the cursor points at the last row returned
+    """
+    page: List[Any] = list(rows[:limit])
+    response = ORJSONResponse([serialize(row) for row in page])
+    if len(rows) > limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*sort_key(page[-1]))
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = LIST_CACHE_CONTROL
+    return response
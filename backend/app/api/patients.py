@@ -1,10 +1,14 @@
+from datetime import datetime
 from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import crud
 from app.db.database import get_db
-from app.db.models import User
+from app.db.models import Patient, User, model_serializer
+from app.api.pagination import not_modified, paginated_response, parse_cursor, weak_etag
+from app.core.cache import response_cache
+from app.core.responses import ORJSONResponse
 from app.core.security import get_current_active_user
 from app.services.patient_service import PatientService
 from pydantic import BaseModel, Field
@@ -12,6 +16,14 @@ from pydantic import BaseModel, Field
 router = APIRouter()
 patient_service = PatientService()
 
+# Seconds a cached patient record or summary may be served
+PATIENT_CACHE_TTL = 60
+
+# Columns left out of API responses (raw FHIR payloads and bookkeeping)
+_PATIENT_RESPONSE_EXCLUDE = ("fhir_resource",)
+_CLINICAL_DATA_RESPONSE_EXCLUDE = ("fhir_resource_id", "fhir_resource_type", "fhir_resource", "updated_at")
+_patient_response = model_serializer(Patient, exclude=_PATIENT_RESPONSE_EXCLUDE)
+
 class PatientBase(BaseModel):
     first_name: str
     last_name: str
@@ -27,8 +39,9 @@ class PatientCreate(PatientBase):
 
 class PatientResponse(PatientBase):
     id: str
-    created_at: str
-    updated_at: Optional[str] = None
+    date_of_birth: Optional[datetime] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
 
 class PatientSummary(BaseModel):
     patient: Dict[str, Any]
@@ -41,143 +54,120 @@ class PatientSummary(BaseModel):
 
 @router.get("/", response_model=List[PatientResponse])
 async def get_patients(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
-    Get list of patients with pagination
+    Get list of patients with pagination; pass the X-Next-Cursor response
+    header back as `cursor` to fetch the next page. Send the ETag back in
+    If-None-Match to get a 304 while the list is unchanged
     """
-    patients = crud.get_patients(db, skip=skip, limit=limit)
-    return [
-        {
-            "id": patient.id,
-            "first_name": patient.first_name,
-            "last_name": patient.last_name,
-            "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
-            "gender": patient.gender,
-            "mrn": patient.mrn,
-            "phone_number": patient.phone_number,
-            "email": patient.email,
-            "address": patient.address,
-            "created_at": patient.created_at.isoformat() if patient.created_at else None,
-            "updated_at": patient.updated_at.isoformat() if patient.updated_at else None
-        }
-        for patient in patients
-    ]
+    etag = weak_etag(await crud.get_patients_version(db), skip, limit, cursor)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    
+    patients = await crud.get_patients(
+        db, skip=skip, limit=limit + 1, cursor=parse_cursor(cursor),
+        exclude=_PATIENT_RESPONSE_EXCLUDE
+    )
+    # Rows come straight from the DB: serialize them without re-validating each one
+    return paginated_response(
+        patients, limit,
+        sort_key=lambda patient: (patient.created_at, patient.id),
+        serialize=_patient_response,
+        etag=etag
+    )
 
 @router.post("/", response_model=PatientResponse)
 async def create_patient(
     patient_data: PatientCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """
     Create a new patient
     """
     # Check if patient with same MRN exists
     if patient_data.mrn:
-        existing_patient = crud.get_patient_by_mrn(db, patient_data.mrn)
+        existing_patient = await crud.get_patient_by_mrn(db, patient_data.mrn)
         if existing_patient:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Patient with MRN {patient_data.mrn} already exists"
             )
     
-    # Create patient
-    patient_dict = patient_data.dict()
-    new_patient = crud.create_patient(db, patient_dict)
+    # Create patient (columns not sent fall back to their defaults)
+    patient_dict = patient_data.model_dump(exclude_unset=True)
+    new_patient = await crud.create_patient(db, patient_dict)
     
-    return {
-        "id": new_patient.id,
-        "first_name": new_patient.first_name,
-        "last_name": new_patient.last_name,
-        "date_of_birth": new_patient.date_of_birth.isoformat() if new_patient.date_of_birth else None,
-        "gender": new_patient.gender,
-        "mrn": new_patient.mrn,
-        "phone_number": new_patient.phone_number,
-        "email": new_patient.email,
-        "address": new_patient.address,
-        "created_at": new_patient.created_at.isoformat() if new_patient.created_at else None,
-        "updated_at": new_patient.updated_at.isoformat() if new_patient.updated_at else None
-    }
+    return ORJSONResponse(_patient_response(new_patient))
 
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> Response:
     """
     Get a specific patient by ID
     """
-    patient = crud.get_patient(db, patient_id)
+    cached = await response_cache.get(crud.PATIENT_CACHE_NAMESPACE, patient_id)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    patient = await crud.get_patient(db, patient_id)
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Patient {patient_id} not found"
         )
     
-    return {
-        "id": patient.id,
-        "first_name": patient.first_name,
-        "last_name": patient.last_name,
-        "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
-        "gender": patient.gender,
-        "mrn": patient.mrn,
-        "phone_number": patient.phone_number,
-        "email": patient.email,
-        "address": patient.address,
-        "created_at": patient.created_at.isoformat() if patient.created_at else None,
-        "updated_at": patient.updated_at.isoformat() if patient.updated_at else None
-    }
+    response = ORJSONResponse(_patient_response(patient))
+    await response_cache.set(
+        crud.PATIENT_CACHE_NAMESPACE, patient_id, response.body, expire=PATIENT_CACHE_TTL
+    )
+    return response
 
 @router.put("/{patient_id}", response_model=PatientResponse)
 async def update_patient(
     patient_id: str,
     patient_data: PatientCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """
-    Update a patient's information
+    Update a patient's information; fields omitted from the body are left unchanged
     """
-    # Check if patient exists
-    patient = crud.get_patient(db, patient_id)
-    if not patient:
+    # Update patient, writing only the fields that were sent
+    patient_dict = patient_data.model_dump(exclude_unset=True)
+    updated_patient = await crud.update_patient(db, patient_id, patient_dict)
+    if not updated_patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Patient {patient_id} not found"
         )
     
-    # Update patient
-    patient_dict = patient_data.dict()
-    updated_patient = crud.update_patient(db, patient_id, patient_dict)
-    
-    return {
-        "id": updated_patient.id,
-        "first_name": updated_patient.first_name,
-        "last_name": updated_patient.last_name,
-        "date_of_birth": updated_patient.date_of_birth.isoformat() if updated_patient.date_of_birth else None,
-        "gender": updated_patient.gender,
-        "mrn": updated_patient.mrn,
-        "phone_number": updated_patient.phone_number,
-        "email": updated_patient.email,
-        "address": updated_patient.address,
-        "created_at": updated_patient.created_at.isoformat() if updated_patient.created_at else None,
-        "updated_at": updated_patient.updated_at.isoformat() if updated_patient.updated_at else None
-    }
+    return ORJSONResponse(_patient_response(updated_patient))
 
 @router.get("/{patient_id}/summary", response_model=PatientSummary)
 async def get_patient_summary(
     patient_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> Response:
     """
     Get a comprehensive summary of patient data including clinical data and predictions
     """
+    cache_key = crud.patient_summary_cache_key(patient_id)
+    cached = await response_cache.get(crud.PATIENT_CACHE_NAMESPACE, cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
     summary = await patient_service.get_patient_summary(db, patient_id)
     if "status" in summary and summary["status"] == "error":
         raise HTTPException(
@@ -185,57 +175,58 @@ async def get_patient_summary(
             detail=summary["message"]
         )
     
-    return summary
+    # Already JSON: built by Postgres, sent as-is
+    body = summary["summary"].encode()
+    await response_cache.set(
+        crud.PATIENT_CACHE_NAMESPACE, cache_key, body, expire=PATIENT_CACHE_TTL
+    )
+    return Response(content=body, media_type="application/json")
 
 @router.get("/{patient_id}/clinical-data", response_model=List[Dict[str, Any]])
 async def get_patient_clinical_data(
+    request: Request,
     patient_id: str,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
-    Get clinical data for a specific patient
+    Get clinical data for a specific patient (ETag/If-None-Match as for the patient list)
     """
-    # Check if patient exists
-    patient = crud.get_patient(db, patient_id)
-    if not patient:
+    etag = weak_etag(
+        await crud.get_patient_clinical_data_version(db, patient_id), patient_id, skip, limit, cursor
+    )
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    
+    # Get clinical data
+    clinical_data = await crud.get_patient_clinical_data(
+        db, patient_id, skip=skip, limit=limit + 1, cursor=parse_cursor(cursor),
+        exclude=_CLINICAL_DATA_RESPONSE_EXCLUDE
+    )
+    
+    # Only an empty page needs a separate lookup to tell "no data" from "no patient"
+    if not clinical_data and not await crud.patient_exists(db, patient_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Patient {patient_id} not found"
         )
     
-    # Get clinical data
-    clinical_data = crud.get_patient_clinical_data(db, patient_id, skip=skip, limit=limit)
-    
-    return [
-        {
-            "id": data.id,
-            "patient_id": data.patient_id,
-            "timestamp": data.timestamp.isoformat() if data.timestamp else None,
-            "heart_rate": data.heart_rate,
-            "respiratory_rate": data.respiratory_rate,
-            "temperature": data.temperature,
-            "systolic_bp": data.systolic_bp,
-            "diastolic_bp": data.diastolic_bp,
-            "oxygen_saturation": data.oxygen_saturation,
-            "blood_glucose": data.blood_glucose,
-            "wbc_count": data.wbc_count,
-            "platelet_count": data.platelet_count,
-            "lactate": data.lactate,
-            "creatinine": data.creatinine,
-            "bilirubin": data.bilirubin,
-            "created_at": data.created_at.isoformat() if data.created_at else None
-        }
-        for data in clinical_data
-    ]
+    return paginated_response(
+        clinical_data, limit,
+        sort_key=lambda data: (data.timestamp, data.id),
+        serialize=lambda data: data._asdict(),
+        etag=etag
+    )
 
 @router.post("/{patient_id}/sync-fhir", response_model=Dict[str, Any])
 async def sync_patient_from_fhir(
     patient_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Sync patient data from FHIR server
@@ -254,10 +245,10 @@ async def search_patients(
     query: str = Query(..., min_length=2),
     limit: int = Query(20, ge=1, le=100),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> List[Dict[str, Any]]:
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """
     Search for patients by name, MRN, etc.
     """
     results = await patient_service.search_patients(db, query, limit=limit)
-    return results
\ No newline at end of file
+    return ORJSONResponse(results)
\ No newline at end of file
@@ -1,10 +1,13 @@
 from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Body, status
-from sqlalchemy.orm import Session
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import crud
 from app.db.database import get_db
-from app.db.models import User
+from app.db.models import SepsisPrediction, User, model_serializer
+from app.api.pagination import paginated_response, parse_cursor
+from app.core.responses import ORJSONResponse
 from app.core.security import get_current_active_user
 from app.services.prediction_service import PredictionService
 from pydantic import BaseModel, Field
@@ -12,6 +15,9 @@ from pydantic import BaseModel, Field
 router = APIRouter()
 prediction_service = PredictionService()
 
+# History rows leave out the SHAP explanation; GET /predictions/{id} returns it
+_prediction_history_item = model_serializer(SepsisPrediction, exclude=("user_id", "explanation"))
+
 class PredictionResponse(BaseModel):
     prediction_id: str
     patient: Dict[str, Any]
@@ -19,7 +25,7 @@ class PredictionResponse(BaseModel):
     timestamp: str
 
 class BatchPredictionRequest(BaseModel):
-    patient_ids: List[str] = Field(..., min_items=1, max_items=100)
+    patient_ids: List[str] = Field(..., min_length=1, max_length=100)
 
 class BatchPredictionResponse(BaseModel):
     successful: List[Dict[str, Any]]
@@ -31,23 +37,25 @@ class BatchPredictionResponse(BaseModel):
 @router.post("/predict-sepsis/{patient_id}", response_model=PredictionResponse)
 async def predict_sepsis_for_patient(
     patient_id: str,
+    explain: bool = True,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """
-    Run sepsis prediction for a specific patient
+    Run sepsis prediction for a specific patient; ?explain=false skips the
+    SHAP explanation (e.g. for triage-only calls)
     """
     # Check if patient exists
-    patient = crud.get_patient(db, patient_id)
+    patient = await crud.get_patient(db, patient_id)
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Patient {patient_id} not found"
         )
     
-    # Run prediction
+    # Run prediction (reusing the patient loaded above)
     result = await prediction_service.predict_sepsis_for_patient(
-        db, patient_id, current_user.id
+        db, patient_id, current_user.id, patient=patient, explain=explain
     )
     
     if "error" in result:
@@ -56,78 +64,75 @@ async def predict_sepsis_for_patient(
             detail=result["error"]
         )
     
-    return result
+    # Built from model output and DB rows: encode directly instead of re-validating
+    return ORJSONResponse(result)
 
 @router.post("/batch-predict", response_model=BatchPredictionResponse)
 async def batch_predict_sepsis(
     request: BatchPredictionRequest,
+    explain: bool = True,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """
-    Run sepsis prediction for multiple patients
+    Run sepsis prediction for multiple patients; ?explain=false skips the
+    SHAP explanations
     """
     results = await prediction_service.batch_predict_sepsis(
-        db, request.patient_ids, current_user.id
+        db, request.patient_ids, current_user.id, explain=explain
     )
-    return results
+    return ORJSONResponse(results)
 
 @router.get("/history/{patient_id}", response_model=List[Dict[str, Any]])
 async def get_prediction_history(
     patient_id: str,
     skip: int = 0,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
     Get prediction history for a specific patient
     """
-    # Check if patient exists
-    patient = crud.get_patient(db, patient_id)
-    if not patient:
+    # Get predictions
+    predictions = await crud.get_patient_predictions(
+        db, patient_id, skip=skip, limit=limit + 1, cursor=parse_cursor(cursor)
+    )
+    
+    # Only an empty page needs a separate lookup to tell "no predictions" from "no patient"
+    if not predictions and not await crud.patient_exists(db, patient_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Patient {patient_id} not found"
         )
     
-    # Get predictions
-    predictions = crud.get_patient_predictions(db, patient_id, skip=skip, limit=limit)
-    
-    return [
-        {
-            "id": pred.id,
-            "patient_id": pred.patient_id,
-            "probability": pred.probability,
-            "is_sepsis_risk": pred.is_sepsis_risk,
-            "model_version": pred.model_version,
-            "timestamp": pred.timestamp.isoformat() if pred.timestamp else None,
-            "features_used": pred.features_used,
-            "explanation": pred.explanation
-        }
-        for pred in predictions
-    ]
+    # Rows come straight from the DB: serialize them without re-validating each one
+    return paginated_response(
+        predictions, limit,
+        sort_key=lambda pred: (pred.timestamp, pred.id),
+        serialize=_prediction_history_item
+    )
 
 @router.get("/{prediction_id}", response_model=Dict[str, Any])
 async def get_prediction_details(
-    prediction_id: str,
+    prediction_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """
     Get details for a specific prediction
     """
-    prediction = crud.get_prediction(db, prediction_id)
-    if not prediction:
+    # Prediction and patient come back from one joined query
+    row = await crud.get_prediction_with_patient(db, prediction_id)
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Prediction {prediction_id} not found"
         )
+    prediction, patient = row
     
-    # Get patient data
-    patient = crud.get_patient(db, prediction.patient_id)
-    
-    return {
+    return ORJSONResponse({
         "id": prediction.id,
         "patient_id": prediction.patient_id,
         "patient": {
@@ -139,7 +144,7 @@ async def get_prediction_details(
         "probability": prediction.probability,
         "is_sepsis_risk": prediction.is_sepsis_risk,
         "model_version": prediction.model_version,
-        "timestamp": prediction.timestamp.isoformat() if prediction.timestamp else None,
+        "timestamp": prediction.timestamp,
         "features_used": prediction.features_used,
         "explanation": prediction.explanation
-    }
\ No newline at end of file
+    })
\ No newline at end of file
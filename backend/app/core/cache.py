@@ -0,0 +1,82 @@
+from typing import Optional
+
+import aioredis
+from loguru import logger
+
+from app.core.config import settings
+
+class ResponseCache:
+    """
+    Small Redis-backed cache for serialized API responses.
+
+    Failures are logged and treated as cache misses so Redis being down
+    never takes an endpoint with it.
+    """
+    def __init__(self, prefix: str = "sepsisx"):
+        self.prefix = prefix
+        self.redis = None
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    async def connect(self):
+        """
+        Create the Redis client (connections are opened lazily by the pool)
+        """
+        if self.redis is None:
+            self.redis = aioredis.from_url(
+                f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}"
+            )
+
+    async def disconnect(self):
+        """
+        Close the Redis connection pool
+        """
+        if self.redis is not None:
+            await self.redis.close()
+            self.redis = None
+
+    async def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Return the cached payload, or None on a miss
+        """
+        try:
+            await self.connect()
+            return await self.redis.get(self._key(namespace, key))
+        except Exception as e:
+            logger.error(f"Cache read failed: {str(e)}")
+            return None
+
+    async def set(self, namespace: str, key: str, value: bytes, expire: int) -> None:
+        """
+        Store a payload for `expire` seconds
+        """
+        try:
+            await self.connect()
+            await self.redis.set(self._key(namespace, key), value, ex=expire)
+        except Exception as e:
+            logger.error(f"Cache write failed: {str(e)}")
+
+    async def delete(self, namespace: str, *keys: str) -> None:
+        """
+        Drop specific cached entries
+        """
+        try:
+            await self.connect()
+            await self.redis.delete(*(self._key(namespace, key) for key in keys))
+        except Exception as e:
+            logger.error(f"Cache invalidation failed: {str(e)}")
+
+    async def clear(self, namespace: str) -> None:
+        """
+        Drop every cached entry in a namespace
+        """
+        try:
+            await self.connect()
+            keys = [key async for key in self.redis.scan_iter(match=self._key(namespace, "*"))]
+            if keys:
+                await self.redis.delete(*keys)
+        except Exception as e:
+            logger.error(f"Cache invalidation failed: {str(e)}")
+
+response_cache = ResponseCache()
@@ -1,8 +1,12 @@
-from pydantic import BaseSettings, PostgresDsn, validator
-from typing import Optional, Dict, Any, Union, List
+from functools import lru_cache
+from pydantic import Field, PostgresDsn, ValidationInfo, field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional, Any, Union, Tuple
 import os
 from pathlib import Path
 
+_MODELS_DIR = Path(__file__).parent.parent.parent / "models"
+
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Sepsis Prediction System"
@@ -12,8 +16,8 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     
-    # CORS
-    BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8080"]
+    # CORS (immutable; read as-is by the CORS middleware on every request)
+    BACKEND_CORS_ORIGINS: Tuple[str, ...] = ("http://localhost:3000", "http://localhost:8080")
     
     # DATABASE
     POSTGRES_SERVER: str = os.getenv("POSTGRES_SERVER", "localhost")
@@ -21,19 +25,27 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "postgres")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "sepsis_prediction")
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
-    DATABASE_URI: Optional[PostgresDsn] = None
+    DATABASE_URI: Optional[PostgresDsn] = Field(default=None, validate_default=True)
+    # Per-process pool; keep workers x (pool size + overflow) under Postgres' max_connections
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "0"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Set when DATABASE_URI points at PgBouncer in transaction mode (e.g. port 6432)
+    DB_USE_PGBOUNCER: bool = os.getenv("DB_USE_PGBOUNCER", "false").lower() == "true"
 
-    @validator("DATABASE_URI", pre=True)
-    def assemble_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
+    @field_validator("DATABASE_URI", mode="before")
+    @classmethod
+    def assemble_db_connection(cls, v: Optional[str], info: ValidationInfo) -> Any:
         if isinstance(v, str):
             return v
+        values = info.data
         return PostgresDsn.build(
-            scheme="postgresql",
-            user=values.get("POSTGRES_USER"),
+            scheme="postgresql+asyncpg",
+            username=values.get("POSTGRES_USER"),
             password=values.get("POSTGRES_PASSWORD"),
             host=values.get("POSTGRES_SERVER"),
-            port=values.get("POSTGRES_PORT"),
-            path=f"/{values.get('POSTGRES_DB') or ''}",
+            port=int(values.get("POSTGRES_PORT")),
+            path=values.get("POSTGRES_DB") or "",
         )
     
     # FHIR API
@@ -42,32 +54,47 @@ class Settings(BaseSettings):
     FHIR_CLIENT_SECRET: Optional[str] = os.getenv("FHIR_CLIENT_SECRET")
     
     # ML MODEL
-    MODEL_PATH: str = os.getenv(
-        "MODEL_PATH", 
-        str(Path(__file__).parent.parent.parent / "models" / "sepsis_model.pkl")
-    )
-    EXPLAINER_PATH: str = os.getenv(
-        "EXPLAINER_PATH", 
-        str(Path(__file__).parent.parent.parent / "models" / "explainer.pkl")
-    )
-    FEATURE_CONFIG_PATH: str = os.getenv(
-        "FEATURE_CONFIG_PATH", 
-        str(Path(__file__).parent.parent.parent / "models" / "feature_config.json")
-    )
+    # Paths are read from the environment by BaseSettings; defaults point into models/
+    MODEL_PATH: str = Field(default_factory=lambda: str(_MODELS_DIR / "sepsis_model.pkl"))
+    EXPLAINER_PATH: str = Field(default_factory=lambda: str(_MODELS_DIR / "explainer.pkl"))
+    FEATURE_CONFIG_PATH: str = Field(default_factory=lambda: str(_MODELS_DIR / "feature_config.json"))
+    # Build tree explainers on the GPU (needs shap compiled with CUDA)
+    USE_GPU_SHAP: bool = os.getenv("USE_GPU_SHAP", "false").lower() == "true"
     
     # NOTIFICATIONS
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
+    # Connections NotificationService keeps to Redis (callers wait for a free one)
+    REDIS_POOL_SIZE: int = int(os.getenv("REDIS_POOL_SIZE", "4"))
+    # Alerts are queued and published in pipelined batches of up to REDIS_BATCH_SIZE,
+    # waiting at most REDIS_FLUSH_INTERVAL_MS for a batch to fill
+    REDIS_BATCH_SIZE: int = int(os.getenv("REDIS_BATCH_SIZE", "100"))
+    REDIS_QUEUE_SIZE: int = int(os.getenv("REDIS_QUEUE_SIZE", "1000"))
+    REDIS_FLUSH_INTERVAL_MS: float = float(os.getenv("REDIS_FLUSH_INTERVAL_MS", "5"))
+    # Seconds shutdown waits for the queued alerts to be published
+    REDIS_DRAIN_TIMEOUT: float = float(os.getenv("REDIS_DRAIN_TIMEOUT", "5"))
     SMTP_SERVER: str = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
     SMTP_USER: Optional[str] = os.getenv("SMTP_USER")
     SMTP_PASSWORD: Optional[str] = os.getenv("SMTP_PASSWORD")
+    # Logged-in SMTP sessions kept open, and so emails sent concurrently
+    SMTP_MAX_CONNECTIONS: int = int(os.getenv("SMTP_MAX_CONNECTIONS", "4"))
+    
+    # SERVER (python -m app.main); reload is for development and forces a single worker
+    SERVER_RELOAD: bool = os.getenv("SERVER_RELOAD", "true").lower() == "true"
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
     
     # LOGGING
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_ACCESS_LEVEL: str = os.getenv("LOG_ACCESS_LEVEL", "INFO")
     
-    class Config:
-        case_sensitive = True
-        env_file = ".env"
+    model_config = SettingsConfigDict(case_sensitive=True, env_file=".env")
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Build the settings once per process (env and .env are only read here)
+    """
+    return Settings()
 
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
\ No newline at end of file
@@ -4,6 +4,8 @@ from pathlib import Path
 from loguru import logger
 from app.core.config import settings
 
+_LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level} | {name}:{function}:{line} | {message}"
+
 class InterceptHandler(logging.Handler):
     def emit(self, record):
         # Get corresponding Loguru level if it exists
@@ -30,11 +32,17 @@ def setup_logging():
     # Remove all Loguru handlers
     logger.remove()
     
+    # Sinks are enqueued so writes happen on loguru's worker thread instead of the
+    # event loop; diagnose is off so tracebacks don't inspect (and log) local values
+
     # Add console handler
     logger.add(
         sys.stderr, 
-        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level} | {name}:{function}:{line} | {message}",
-        level=settings.LOG_LEVEL
+        format=_LOG_FORMAT,
+        level=settings.LOG_LEVEL,
+        enqueue=True,
+        backtrace=False,
+        diagnose=False
     )
     
     # Add file handler
@@ -45,13 +53,23 @@ def setup_logging():
         str(log_file_path),
         rotation="500 MB",
         retention="10 days",
-        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level} | {name}:{function}:{line} | {message}",
-        level=settings.LOG_LEVEL
+        format=_LOG_FORMAT,
+        level=settings.LOG_LEVEL,
+        enqueue=True,
+        backtrace=False,
+        diagnose=False
     )
     
     # Set up other loggers used by dependencies
     for name in ["uvicorn", "uvicorn.access", "fastapi"]:
         logging.getLogger(name).handlers = [InterceptHandler()]
         logging.getLogger(name).propagate = False
+    
+    # One line per request adds up under load; raise LOG_ACCESS_LEVEL to drop them
+    logging.getLogger("uvicorn.access").setLevel(settings.LOG_ACCESS_LEVEL)
+
+    # httpx logs every FHIR request at INFO; keep only its warnings and errors
+    for name in ["httpx", "httpcore"]:
+        logging.getLogger(name).setLevel(logging.WARNING)
         
     return logger
\ No newline at end of file
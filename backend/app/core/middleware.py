@@ -0,0 +1,30 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROCESS_TIME_HEADER = "X-Process-Time"
+
+class ProcessTimeMiddleware:
+    """
+    Adds X-Process-Time (seconds until the response headers are sent) to every
+    HTTP response. Plain ASGI rather than @app.middleware("http"), which wraps
+    each response body in an extra stream and task group
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+
+        async def send_with_process_time(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed_ns = time.perf_counter_ns() - start
+                MutableHeaders(scope=message).append(PROCESS_TIME_HEADER, f"{elapsed_ns / 1e9:.6f}")
+            await send(message)
+
+        await self.app(scope, receive, send_with_process_time)
@@ -0,0 +1,47 @@
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterable, AsyncIterator
+
+import orjson
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse, StreamingResponse
+
+def _orjson_default(obj: Any) -> Any:
+    """
+    Fallback serializer for types orjson doesn't handle natively
+    """
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+
+def _dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_orjson_default, option=_ORJSON_OPTIONS)
+
+class ORJSONResponse(BaseORJSONResponse):
+    """
+    JSON response rendered with orjson; datetimes are serialized natively
+    (naive values are treated as UTC) and numpy values are supported
+    """
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
+
+async def _iter_json_array(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    yield b"["
+    separator = b""
+    async for item in items:
+        yield separator + _dumps(item)
+        separator = b","
+    yield b"]"
+
+class ORJSONStreamingResponse(StreamingResponse):
+    """
+    Streams an async iterable as a JSON array, one orjson-encoded item per chunk,
+    so large lists are never materialized in memory
+    """
+    def __init__(self, items: AsyncIterable[Any], **kwargs: Any) -> None:
+        super().__init__(_iter_json_array(items), media_type="application/json", **kwargs)
@@ -0,0 +1,794 @@
+from datetime import datetime
+from itertools import chain
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Enum, String, Text, case, cast, exists, func, insert, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, joinedload, load_only, raiseload, selectinload, undefer
+
+from app.core.cache import response_cache
+from app.core.security import verify_and_update_password, verify_dummy_password
+from app.db.models import (
+    User, RoleType, Patient, ClinicalData, Alert, AlertStatus, SepsisPrediction, Feedback
+)
+from app.utils.helpers import generate_unique_id, parse_datetime
+
+# Cached /alerts/pending responses; cleared whenever an alert is created or changes status
+PENDING_ALERTS_CACHE_NAMESPACE = "pending"
+
+# Cached alert notification recipients; cleared whenever a user is created
+NOTIFICATION_RECIPIENTS_CACHE_NAMESPACE = "notify"
+NOTIFICATION_RECIPIENTS_CACHE_TTL = 60
+_RECIPIENT_FIELDS = ("id", "email", "full_name", "role", "is_active")
+
+# Cached /patients/{id} and /patients/{id}/summary responses; cleared on every
+# write to the patient or to the clinical data, predictions and alerts in its summary
+PATIENT_CACHE_NAMESPACE = "patient"
+
+def patient_summary_cache_key(patient_id: str) -> str:
+    return f"{patient_id}:summary"
+
+async def _invalidate_patient_cache(*patient_ids: str) -> None:
+    keys = []
+    for patient_id in patient_ids:
+        keys.extend((patient_id, patient_summary_cache_key(patient_id)))
+    if keys:
+        await response_cache.delete(PATIENT_CACHE_NAMESPACE, *keys)
+
+async def _insert_returning(db: AsyncSession, model: type, rows: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Bulk INSERT ... RETURNING of `rows` as `model` instances, in the same order.
+    The keys are generated here and used to restore the order: with native uuid
+    keys, SQLAlchemy's sort_by_parameter_order can't match the returned
+    sentinels to the (str) parameters
+    """
+    rows = [{"id": generate_unique_id(), **row} for row in rows]
+    result = await db.scalars(insert(model).returning(model), rows)
+    by_id = {instance.id: instance for instance in result.all()}
+    return [by_id[row["id"]] for row in rows]
+
+async def get_user(db: AsyncSession, user_id: str) -> Optional[User]:
+    """
+    Get a user by ID
+    """
+    result = await db.execute(select(User).where(User.id == user_id))
+    return result.scalars().first()
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """
+    Get a user by email address
+    """
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user_data: Dict[str, Any]) -> User:
+    """
+    Create a new user
+    """
+    user = User(**user_data)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    await response_cache.clear(NOTIFICATION_RECIPIENTS_CACHE_NAMESPACE)
+    return user
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """
+    Return the user if the email/password pair is valid
+    """
+    user = await get_user_by_email(db, email)
+    # Password hashing is CPU-bound; keep it off the event loop
+    if not user:
+        await run_in_threadpool(verify_dummy_password, password)
+        return None
+    valid, new_hash = await run_in_threadpool(
+        verify_and_update_password, password, user.hashed_password
+    )
+    if not valid:
+        return None
+    if new_hash:
+        # Legacy bcrypt hash: upgrade to argon2 now that we have the plaintext
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
+async def get_notification_recipients(db: AsyncSession) -> List[User]:
+    """
+    Get active doctors and nurses to notify about alerts, as detached User
+    objects that only carry the contact fields (the only columns selected).
+    The list is cached in Redis briefly
+    """
+    cached = await response_cache.get(NOTIFICATION_RECIPIENTS_CACHE_NAMESPACE, "doctors_nurses")
+    if cached is not None:
+        return [
+            User(**{**fields, "role": RoleType(fields["role"])})
+            for fields in orjson.loads(cached)
+        ]
+
+    result = await db.execute(
+        select(*(getattr(User, field) for field in _RECIPIENT_FIELDS)).where(
+            User.is_active == True,
+            User.role.in_((RoleType.DOCTOR, RoleType.NURSE))
+        )
+    )
+    recipients = [row._asdict() for row in result]
+
+    await response_cache.set(
+        NOTIFICATION_RECIPIENTS_CACHE_NAMESPACE, "doctors_nurses",
+        orjson.dumps(recipients),
+        expire=NOTIFICATION_RECIPIENTS_CACHE_TTL
+    )
+    return [User(**fields) for fields in recipients]
+
+@lru_cache(maxsize=None)
+def _column_attributes(model: type, exclude: FrozenSet[str]) -> Tuple[Any, ...]:
+    return tuple(getattr(model, c.key) for c in model.__table__.columns if c.key not in exclude)
+
+def _columns(model: type, exclude: Iterable[str] = (), only: Iterable[str] = ()) -> Tuple[Any, ...]:
+    """
+    Mapped column attributes of `model`: the `only` ones in that order, else all
+    of them minus `exclude` (resolved once per model and exclude set)
+    """
+    if only:
+        return tuple(getattr(model, name) for name in only)
+    return _column_attributes(model, frozenset(exclude))
+
+def _load_columns_except(model: type, exclude: Iterable[str]):
+    """
+    Loader option fetching every column of `model` except `exclude`; reading an
+    excluded column afterwards raises instead of lazy-loading it
+    """
+    return load_only(*_columns(model, exclude), raiseload=True)
+
+def _select_version(model: type):
+    """
+    (row count, last change time) of `model` rows; any insert, update or delete
+    in the selected set changes it, so it can stand in for the rows in an ETag
+    """
+    return select(func.count(), func.max(func.coalesce(model.updated_at, model.created_at)))
+
+def _normalize_patient_data(patient_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Coerce API string values into the column types asyncpg expects
+    """
+    date_of_birth = patient_data.get("date_of_birth")
+    if isinstance(date_of_birth, str):
+        patient_data = {**patient_data, "date_of_birth": parse_datetime(date_of_birth)}
+    return patient_data
+
+async def get_patient(db: AsyncSession, patient_id: str) -> Optional[Patient]:
+    """
+    Get a patient by ID
+    """
+    result = await db.execute(
+        select(Patient).options(raiseload("*")).where(Patient.id == patient_id)
+    )
+    return result.scalars().first()
+
+async def patient_exists(db: AsyncSession, patient_id: str) -> bool:
+    """
+    Check whether a patient exists without loading the row
+    """
+    result = await db.execute(select(exists().where(Patient.id == patient_id)))
+    return result.scalar()
+
+async def get_patient_by_mrn(db: AsyncSession, mrn: str) -> Optional[Patient]:
+    """
+    Get a patient by medical record number
+    """
+    result = await db.execute(
+        select(Patient).options(raiseload("*")).where(Patient.mrn == mrn)
+    )
+    return result.scalars().first()
+
+async def get_patients(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, str]] = None,
+    exclude: Iterable[str] = ()
+) -> List[Patient]:
+    """
+    Get patients with pagination, newest first. `cursor` is the
+    (created_at, id) of the last row already seen; `exclude` columns
+    (e.g. the FHIR resource JSON) are not fetched
+    """
+    stmt = select(Patient).options(raiseload("*"))
+    if exclude:
+        stmt = stmt.options(_load_columns_except(Patient, exclude))
+    if cursor:
+        stmt = stmt.where(tuple_(Patient.created_at, Patient.id) < cursor)
+    result = await db.execute(
+        stmt.order_by(Patient.created_at.desc(), Patient.id.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_patients_version(db: AsyncSession) -> Tuple[int, Optional[datetime]]:
+    """
+    Version of the patient list (see _select_version)
+    """
+    result = await db.execute(_select_version(Patient))
+    return tuple(result.one())
+
+async def get_patients_by_ids(db: AsyncSession, patient_ids: List[str]) -> Dict[str, Patient]:
+    """
+    Get several patients in one query, keyed by ID (unknown IDs are absent)
+    """
+    result = await db.execute(
+        select(Patient).options(raiseload("*")).where(Patient.id.in_(patient_ids))
+    )
+    return {patient.id: patient for patient in result.scalars()}
+
+async def create_patient(db: AsyncSession, patient_data: Dict[str, Any]) -> Patient:
+    """
+    Create a new patient
+    """
+    patient = Patient(**_normalize_patient_data(patient_data))
+    db.add(patient)
+    await db.commit()
+    await db.refresh(patient)
+    return patient
+
+async def update_patient(
+    db: AsyncSession,
+    patient_id: str,
+    patient_data: Dict[str, Any]
+) -> Optional[Patient]:
+    """
+    Update an existing patient
+    """
+    patient = await get_patient(db, patient_id)
+    if not patient:
+        return None
+
+    for key, value in _normalize_patient_data(patient_data).items():
+        setattr(patient, key, value)
+
+    await db.commit()
+    await db.refresh(patient)
+    await _invalidate_patient_cache(patient_id)
+    return patient
+
+async def get_patient_clinical_data(
+    db: AsyncSession,
+    patient_id: str,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, str]] = None,
+    exclude: Iterable[str] = (),
+    columns: Iterable[str] = ()
+) -> List[Any]:
+    """
+    Get clinical data for a patient, most recent first, as plain column rows
+    (no ORM objects are built). `cursor` is the (timestamp, id) of the last
+    row already seen; only `columns` are fetched if given, else all but `exclude`
+    """
+    stmt = select(*_columns(ClinicalData, exclude, only=columns)).where(ClinicalData.patient_id == patient_id)
+    if cursor:
+        stmt = stmt.where(tuple_(ClinicalData.timestamp, ClinicalData.id) < cursor)
+    result = await db.execute(
+        stmt.order_by(ClinicalData.timestamp.desc(), ClinicalData.id.desc()).offset(skip).limit(limit)
+    )
+    return result.all()
+
+async def get_patient_clinical_data_version(
+    db: AsyncSession, patient_id: str
+) -> Tuple[int, Optional[datetime]]:
+    """
+    Version of a patient's clinical data (see _select_version)
+    """
+    result = await db.execute(
+        _select_version(ClinicalData).where(ClinicalData.patient_id == patient_id)
+    )
+    return tuple(result.one())
+
+async def get_recent_clinical_data_for_patients(
+    db: AsyncSession,
+    patient_ids: List[str],
+    limit: int = 100,
+    columns: Iterable[str] = ()
+) -> Dict[str, List[Any]]:
+    """
+    Get the `limit` most recent clinical data records of each patient in one
+    query, keyed by patient ID and most recent first, as plain column rows of
+    `columns` (and patient_id; all columns if not given)
+    """
+    if columns:
+        columns = dict.fromkeys(("patient_id", *columns))
+    ranked = (
+        select(
+            *_columns(ClinicalData, only=columns),
+            func.row_number().over(
+                partition_by=ClinicalData.patient_id,
+                order_by=(ClinicalData.timestamp.desc(), ClinicalData.id.desc())
+            ).label("row_number")
+        )
+        .where(ClinicalData.patient_id.in_(patient_ids))
+        .subquery()
+    )
+    result = await db.execute(
+        select(*(column for column in ranked.c if column.key != "row_number"))
+        .where(ranked.c.row_number <= limit)
+        .order_by(ranked.c.patient_id, ranked.c.row_number)
+    )
+    clinical_data: Dict[str, List[Any]] = {}
+    for record in result:
+        clinical_data.setdefault(record.patient_id, []).append(record)
+    return clinical_data
+
+async def create_clinical_data(db: AsyncSession, clinical_data: Dict[str, Any]) -> ClinicalData:
+    """
+    Create a clinical data record
+    """
+    data = ClinicalData(**clinical_data)
+    db.add(data)
+    await db.commit()
+    await db.refresh(data)
+    await _invalidate_patient_cache(data.patient_id)
+    return data
+
+async def get_existing_clinical_data_ids(db: AsyncSession, fhir_resource_ids: Iterable[str]) -> Set[str]:
+    """
+    Those of the given FHIR resource IDs already stored as clinical data (one IN query)
+    """
+    fhir_resource_ids = list(fhir_resource_ids)
+    if not fhir_resource_ids:
+        return set()
+    result = await db.scalars(
+        select(ClinicalData.fhir_resource_id).where(ClinicalData.fhir_resource_id.in_(fhir_resource_ids))
+    )
+    return set(result.all())
+
+async def create_clinical_data_records(db: AsyncSession, clinical_data_list: List[Dict[str, Any]]) -> int:
+    """
+    Store several clinical data records with one bulk INSERT and one commit
+    """
+    if not clinical_data_list:
+        return 0
+    await db.execute(insert(ClinicalData), clinical_data_list)
+    await db.commit()
+    await _invalidate_patient_cache(*{clinical_data["patient_id"] for clinical_data in clinical_data_list})
+    return len(clinical_data_list)
+
+async def get_alerts(
+    db: AsyncSession,
+    status: Optional[AlertStatus] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Alert]:
+    """
+    Get alerts, newest first, with the related patient loaded in the same query
+    """
+    stmt = select(Alert).options(joinedload(Alert.patient), raiseload("*"))
+    if status:
+        stmt = stmt.where(Alert.status == status)
+    result = await db.execute(
+        stmt.order_by(Alert.created_at.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_pending_alerts(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Alert]:
+    """
+    Get pending (unacknowledged) alerts with the related patient loaded
+    """
+    return await get_alerts(db, status=AlertStatus.PENDING, skip=skip, limit=limit)
+
+# Column projection for alert rows: alert fields followed by the patient summary
+ALERT_ROW_FIELDS = (
+    "id", "patient_id", "prediction_id", "alert_type", "severity", "status",
+    "message", "created_at", "acknowledged_at", "acknowledged_by",
+)
+_PATIENT_SUMMARY_COLUMNS = (Patient.id, Patient.first_name, Patient.last_name, Patient.mrn)
+ALERT_ROW_COLUMNS = (
+    tuple(getattr(Alert, field) for field in ALERT_ROW_FIELDS) + _PATIENT_SUMMARY_COLUMNS
+)
+
+def _select_alert_rows():
+    return select(*ALERT_ROW_COLUMNS).outerjoin(Patient, Alert.patient_id == Patient.id)
+
+async def get_alert_row(db: AsyncSession, alert_id: str) -> Optional[Tuple[Any, ...]]:
+    """
+    Get a single alert as an ALERT_ROW_COLUMNS tuple
+    """
+    result = await db.execute(_select_alert_rows().where(Alert.id == alert_id))
+    return result.first()
+
+def _filter_alert_rows(
+    status: Optional[AlertStatus],
+    patient_id: Optional[str],
+    skip: int,
+    limit: int
+):
+    stmt = _select_alert_rows()
+    if status:
+        stmt = stmt.where(Alert.status == status)
+    if patient_id:
+        stmt = stmt.where(Alert.patient_id == patient_id)
+    return stmt.order_by(Alert.created_at.desc()).offset(skip).limit(limit)
+
+async def get_alert_rows(
+    db: AsyncSession,
+    status: Optional[AlertStatus] = None,
+    patient_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Tuple[Any, ...]]:
+    """
+    Get alerts, newest first, as plain tuples of ALERT_ROW_COLUMNS
+    (no ORM objects are built)
+    """
+    result = await db.execute(_filter_alert_rows(status, patient_id, skip, limit))
+    return result.all()
+
+async def stream_alert_rows(
+    db: AsyncSession,
+    status: Optional[AlertStatus] = None,
+    patient_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> AsyncIterator[Tuple[Any, ...]]:
+    """
+    Same rows as get_alert_rows, fetched through a server-side cursor
+    """
+    result = await db.stream(_filter_alert_rows(status, patient_id, skip, limit))
+    async for row in result:
+        yield row
+
+async def get_patient_alerts(
+    db: AsyncSession,
+    patient_id: str,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Alert]:
+    """
+    Get alerts for a specific patient, newest first
+    """
+    result = await db.execute(
+        select(Alert).where(
+            Alert.patient_id == patient_id
+        ).order_by(Alert.created_at.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_alert(db: AsyncSession, alert_id: str) -> Optional[Alert]:
+    """
+    Get an alert by ID with the related patient loaded
+    """
+    result = await db.execute(
+        select(Alert).options(
+            joinedload(Alert.patient), raiseload("*")
+        ).where(Alert.id == alert_id)
+    )
+    return result.scalars().first()
+
+async def create_alert(db: AsyncSession, alert_data: Dict[str, Any]) -> Alert:
+    """
+    Create a new alert
+    """
+    alert = Alert(**alert_data)
+    db.add(alert)
+    await db.commit()
+    await db.refresh(alert)
+    await response_cache.clear(PENDING_ALERTS_CACHE_NAMESPACE)
+    await _invalidate_patient_cache(alert.patient_id)
+    return alert
+
+async def create_alerts(db: AsyncSession, alerts_data: List[Dict[str, Any]]) -> List[Alert]:
+    """
+    Create several alerts with one bulk INSERT ... RETURNING, in the same
+    order as `alerts_data`
+    """
+    if not alerts_data:
+        return []
+    alerts = await _insert_returning(db, Alert, alerts_data)
+    await db.commit()
+    await response_cache.clear(PENDING_ALERTS_CACHE_NAMESPACE)
+    await _invalidate_patient_cache(*{alert.patient_id for alert in alerts})
+    return alerts
+
+async def update_alert_status(
+    db: AsyncSession,
+    alert_id: str,
+    status: AlertStatus,
+    user_id: str
+) -> Optional[Tuple[Any, ...]]:
+    """
+    Update the status of an alert and record who acknowledged it.
+    Returns the updated alert as an ALERT_ROW_COLUMNS tuple (or None if it
+    doesn't exist) from a single UPDATE ... RETURNING joined to patients
+    """
+    values = {"status": status}
+    if status != AlertStatus.PENDING:
+        # Database clock, consistent with the server_default on created_at
+        values["acknowledged_at"] = func.now()
+        values["acknowledged_by"] = user_id
+
+    # Core (not ORM) UPDATE, since ORM statements can't be nested in a CTE
+    alerts_table = Alert.__table__
+    updated = update(alerts_table).where(alerts_table.c.id == alert_id).values(**values).returning(
+        *(alerts_table.c[field] for field in ALERT_ROW_FIELDS)
+    ).cte("updated_alert")
+    result = await db.execute(
+        select(
+            *(updated.c[field] for field in ALERT_ROW_FIELDS), *_PATIENT_SUMMARY_COLUMNS
+        ).outerjoin(Patient, Patient.id == updated.c.patient_id)
+    )
+    row = result.first()
+    await db.commit()
+
+    if row is not None:
+        await response_cache.clear(PENDING_ALERTS_CACHE_NAMESPACE)
+        await _invalidate_patient_cache(row.patient_id)
+    return row
+
+async def get_prediction(db: AsyncSession, prediction_id: str) -> Optional[SepsisPrediction]:
+    """
+    Get a sepsis prediction by ID, including its explanation
+    """
+    result = await db.execute(
+        select(SepsisPrediction)
+        .options(undefer(SepsisPrediction.explanation))
+        .where(SepsisPrediction.id == prediction_id)
+    )
+    return result.scalars().first()
+
+async def get_prediction_with_patient(
+    db: AsyncSession, prediction_id: str
+) -> Optional[Tuple[SepsisPrediction, Optional[Patient]]]:
+    """
+    Get a prediction (including its explanation) and its patient in one query;
+    the patient is None if its row is missing, and its FHIR resource is not fetched
+    """
+    result = await db.execute(
+        select(SepsisPrediction, Patient)
+        .outerjoin(Patient, Patient.id == SepsisPrediction.patient_id)
+        .options(
+            undefer(SepsisPrediction.explanation),
+            _load_columns_except(Patient, ("fhir_resource",))
+        )
+        .where(SepsisPrediction.id == prediction_id)
+    )
+    return result.first()
+
+async def prediction_exists(db: AsyncSession, prediction_id: str) -> bool:
+    """
+    Check whether a prediction exists without loading the row
+    """
+    result = await db.execute(select(exists().where(SepsisPrediction.id == prediction_id)))
+    return result.scalar()
+
+async def get_patient_predictions(
+    db: AsyncSession,
+    patient_id: str,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, str]] = None
+) -> List[SepsisPrediction]:
+    """
+    Get sepsis predictions for a patient, newest first, without their
+    explanations. `cursor` is the (timestamp, id) of the last row already seen
+    """
+    stmt = select(SepsisPrediction).options(defer(SepsisPrediction.explanation, raiseload=True)).where(SepsisPrediction.patient_id == patient_id)
+    if cursor:
+        stmt = stmt.where(tuple_(SepsisPrediction.timestamp, SepsisPrediction.id) < cursor)
+    result = await db.execute(
+        stmt.order_by(SepsisPrediction.timestamp.desc(), SepsisPrediction.id.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+# Vital signs reported in a patient summary, taken from the SUMMARY_VITALS_WINDOW latest records
+SUMMARY_VITAL_SIGNS = (
+    "heart_rate", "respiratory_rate", "temperature",
+    "systolic_bp", "diastolic_bp", "oxygen_saturation",
+    "blood_glucose", "wbc_count", "platelet_count",
+    "lactate", "creatinine", "bilirubin"
+)
+SUMMARY_VITALS_WINDOW = 50
+SUMMARY_LIST_LIMIT = 10
+_EMPTY_JSON_ARRAY = literal_column("'[]'::json")
+
+def _json_value(column):
+    """
+    Enum columns hold member names in the database; emit the API value instead
+    """
+    if isinstance(column.type, Enum) and column.type.enum_class is not None:
+        return case(
+            {member.name: member.value for member in column.type.enum_class},
+            value=cast(column, String)
+        )
+    return column
+
+def _json_object(columns: Iterable[Any]):
+    """
+    json_build_object over the given columns, keyed by column name
+    """
+    return func.json_build_object(*chain.from_iterable(
+        (literal_column(f"'{column.key}'"), _json_value(column)) for column in columns
+    ))
+
+def _json_array(subquery, *order_by):
+    """
+    The rows of a subquery as an ordered JSON array ([] when it is empty)
+    """
+    array = select(
+        func.json_agg(aggregate_order_by(_json_object(subquery.c), *order_by))
+    ).scalar_subquery()
+    return func.coalesce(array, _EMPTY_JSON_ARRAY)
+
+async def get_patient_summary_json(db: AsyncSession, patient_id: str) -> Optional[str]:
+    """
+    Build a patient's summary as a JSON document in a single Postgres query,
+    or None if the patient doesn't exist. The text is returned as produced by
+    the database so it can be sent to the client without decoding
+    """
+    clinical_data = (
+        select(*_columns(ClinicalData, exclude=("fhir_resource",)))
+        .where(ClinicalData.patient_id == patient_id)
+        .order_by(ClinicalData.timestamp.desc(), ClinicalData.id.desc())
+        .limit(SUMMARY_VITALS_WINDOW)
+        .subquery()
+    )
+    recent_clinical_data = (
+        select(clinical_data)
+        .order_by(clinical_data.c.timestamp.desc(), clinical_data.c.id.desc())
+        .limit(SUMMARY_LIST_LIMIT)
+        .subquery()
+    )
+
+    # Latest non-null value of each vital sign (and when it was taken)
+    latest_vitals = []
+    for vital in SUMMARY_VITAL_SIGNS:
+        value = clinical_data.c[vital]
+        latest_vitals.extend((
+            literal_column(f"'{vital}'"),
+            func.array_agg(aggregate_order_by(value, clinical_data.c.timestamp.desc()))
+                .filter(value.isnot(None))[1],
+            literal_column(f"'{vital}_timestamp'"),
+            func.array_agg(aggregate_order_by(clinical_data.c.timestamp, clinical_data.c.timestamp.desc()))
+                .filter(value.isnot(None))[1],
+        ))
+    latest_vitals = select(
+        func.json_strip_nulls(func.json_build_object(*latest_vitals))
+    ).scalar_subquery()
+
+    predictions = (
+        select(*_columns(SepsisPrediction, exclude=("features_used", "explanation")))
+        .where(SepsisPrediction.patient_id == patient_id)
+        .order_by(SepsisPrediction.timestamp.desc(), SepsisPrediction.id.desc())
+        .limit(SUMMARY_LIST_LIMIT)
+        .subquery()
+    )
+    latest_prediction = (
+        select(*_columns(SepsisPrediction))
+        .where(SepsisPrediction.patient_id == patient_id)
+        .order_by(SepsisPrediction.timestamp.desc(), SepsisPrediction.id.desc())
+        .limit(1)
+        .subquery()
+    )
+    active_alerts = (
+        select(*_columns(Alert))
+        .where(
+            Alert.patient_id == patient_id,
+            Alert.status.in_((AlertStatus.PENDING, AlertStatus.ACKNOWLEDGED))
+        )
+        .subquery()
+    )
+
+    # Cast to text so the document comes back undecoded
+    result = await db.execute(
+        select(cast(func.json_build_object(
+            literal_column("'patient'"), _json_object(_columns(Patient, exclude=("fhir_resource",))),
+            literal_column("'latest_vitals'"), latest_vitals,
+            literal_column("'recent_clinical_data'"), _json_array(
+                recent_clinical_data,
+                recent_clinical_data.c.timestamp.desc(), recent_clinical_data.c.id.desc()
+            ),
+            literal_column("'sepsis_predictions'"), _json_array(
+                predictions, predictions.c.timestamp.desc(), predictions.c.id.desc()
+            ),
+            literal_column("'latest_prediction'"), select(
+                _json_object(latest_prediction.c)
+            ).scalar_subquery(),
+            literal_column("'active_alerts'"), _json_array(
+                active_alerts, active_alerts.c.created_at.desc()
+            ),
+            literal_column("'alert_count'"), select(func.count()).select_from(active_alerts).scalar_subquery()
+        ), Text)).where(Patient.id == patient_id)
+    )
+    return result.scalar()
+
+async def create_sepsis_prediction(
+    db: AsyncSession,
+    prediction_data: Dict[str, Any]
+) -> SepsisPrediction:
+    """
+    Store a sepsis prediction
+    """
+    prediction = SepsisPrediction(**prediction_data)
+    db.add(prediction)
+    await db.commit()
+    await db.refresh(prediction)
+    await _invalidate_patient_cache(prediction.patient_id)
+    return prediction
+
+async def create_sepsis_predictions(
+    db: AsyncSession,
+    predictions_data: List[Dict[str, Any]]
+) -> List[SepsisPrediction]:
+    """
+    Store several sepsis predictions with one bulk INSERT ... RETURNING,
+    in the same order as `predictions_data`
+    """
+    if not predictions_data:
+        return []
+    predictions = await _insert_returning(db, SepsisPrediction, predictions_data)
+    await db.commit()
+    await _invalidate_patient_cache(*{prediction.patient_id for prediction in predictions})
+    return predictions
+
+async def create_feedback(db: AsyncSession, feedback_data: Dict[str, Any]) -> Feedback:
+    """
+    Store feedback on a prediction
+    """
+    feedback = Feedback(**feedback_data)
+    db.add(feedback)
+    await db.commit()
+    await db.refresh(feedback)
+    return feedback
+
+async def get_feedback_for_prediction(db: AsyncSession, prediction_id: str) -> List[Feedback]:
+    """
+    Get all feedback for a prediction; the submitting users are batch-loaded
+    with a single IN query rather than one lookup per row
+    """
+    result = await db.execute(
+        select(Feedback).options(selectinload(Feedback.user)).where(
+            Feedback.prediction_id == prediction_id
+        ).order_by(Feedback.created_at.desc())
+    )
+    return result.scalars().all()
+
+async def get_user_feedback(
+    db: AsyncSession,
+    user_id: str,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Feedback]:
+    """
+    Get feedback submitted by a user, newest first
+    """
+    result = await db.execute(
+        select(Feedback).where(
+            Feedback.user_id == user_id
+        ).order_by(Feedback.created_at.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+async def stream_patient_feedback_rows(
+    db: AsyncSession,
+    patient_id: str,
+    skip: int = 0,
+    limit: int = 100
+) -> AsyncIterator[Any]:
+    """
+    Stream feedback on a patient's predictions, newest first, through a
+    server-side cursor. Rows carry the feedback columns plus user_name
+    """
+    result = await db.stream(
+        select(
+            Feedback.id, Feedback.prediction_id, Feedback.user_id, Feedback.feedback_type,
+            Feedback.comments, Feedback.created_at, User.full_name.label("user_name")
+        ).join(
+            SepsisPrediction, Feedback.prediction_id == SepsisPrediction.id
+        ).outerjoin(
+            User, Feedback.user_id == User.id
+        ).where(
+            SepsisPrediction.patient_id == patient_id
+        ).order_by(Feedback.created_at.desc()).offset(skip).limit(limit)
+    )
+    async for row in result:
+        yield row
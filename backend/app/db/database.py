@@ -1,20 +1,34 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
 from app.core.config import settings
 
-engine = create_engine(str(settings.DATABASE_URI), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# PgBouncer in transaction mode hands each transaction a different server
+# connection, so named prepared statements can't be cached client-side
+connect_args = (
+    {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    if settings.DB_USE_PGBOUNCER else {}
+)
+
+engine = create_async_engine(
+    str(settings.DATABASE_URI),
+    connect_args=connect_args,
+    pool_size=settings.DB_POOL_SIZE,
+    # No overflow: each asyncpg connection carries its own prepared-statement cache
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    # Reuse the most recently returned connection so hot connections stay warm
+    pool_use_lifo=True,
+)
+# expire_on_commit=False: attributes can't be lazily re-fetched under asyncio
+AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
 
-def get_db():
+async def get_db():
     """
-    Dependency function that yields db sessions
+    Dependency function that yields async db sessions
     """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
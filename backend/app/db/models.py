@@ -1,11 +1,28 @@
 import enum
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Text, Enum, JSON
-from sqlalchemy.orm import relationship
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Tuple
+from sqlalchemy import DDL, Boolean, Column, ForeignKey, Index, Integer, String, Float, DateTime, Text, Enum, JSON, Uuid, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
-import uuid
 from datetime import datetime
 
 from app.db.database import Base
+from app.utils.helpers import generate_unique_id
+
+# Keys generated by the app are native uuid columns (16 bytes) in Postgres but stay
+# plain strings in Python. Patient IDs are FHIR resource IDs and remain String
+GeneratedId = Uuid(as_uuid=False)
+
+# Trigram operator classes for the patient search indexes below
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+def _trigram_index(name: str, column: str) -> Index:
+    """
+    GIN trigram index, usable by ILIKE '%term%' on `column`
+    """
+    return Index(name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"})
 
 class RoleType(str, enum.Enum):
     ADMIN = "admin"
@@ -15,7 +32,7 @@ class RoleType(str, enum.Enum):
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GeneratedId, primary_key=True, index=True, default=generate_unique_id)
     email = Column(String, unique=True, index=True, nullable=False)
     full_name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
@@ -30,6 +47,11 @@ class User(Base):
     predictions = relationship("SepsisPrediction", back_populates="user")
     feedback = relationship("Feedback", back_populates="user")
 
+    __table_args__ = (
+        # Notification recipient lookups (active users by role)
+        Index("ix_users_active_role", "is_active", "role", postgresql_where=is_active),
+    )
+
 class Patient(Base):
     __tablename__ = "patients"
 
@@ -51,10 +73,19 @@ class Patient(Base):
     predictions = relationship("SepsisPrediction", back_populates="patient")
     alerts = relationship("Alert", back_populates="patient")
 
+    __table_args__ = (
+        # Keyset pagination of the patient list (newest first)
+        Index("ix_patients_created_id", created_at.desc(), id.desc()),
+        # Substring search on names and MRN (PatientService.search_patients)
+        _trigram_index("ix_patients_first_name_trgm", "first_name"),
+        _trigram_index("ix_patients_last_name_trgm", "last_name"),
+        _trigram_index("ix_patients_mrn_trgm", "mrn"),
+    )
+
 class ClinicalData(Base):
     __tablename__ = "clinical_data"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GeneratedId, primary_key=True, index=True, default=generate_unique_id)
     patient_id = Column(String, ForeignKey("patients.id"))
     fhir_resource_id = Column(String, index=True, nullable=True)
     fhir_resource_type = Column(String, nullable=True)
@@ -81,6 +112,11 @@ class ClinicalData(Base):
     # Relationships
     patient = relationship("Patient", back_populates="clinical_data")
 
+    __table_args__ = (
+        # Keyset pagination of a patient's observations (most recent first)
+        Index("ix_clinical_data_patient_timestamp_id", "patient_id", timestamp.desc(), id.desc()),
+    )
+
 class AlertStatus(str, enum.Enum):
     PENDING = "pending"
     ACKNOWLEDGED = "acknowledged"
@@ -90,32 +126,39 @@ class AlertStatus(str, enum.Enum):
 class Alert(Base):
     __tablename__ = "alerts"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GeneratedId, primary_key=True, index=True, default=generate_unique_id)
     patient_id = Column(String, ForeignKey("patients.id"))
-    prediction_id = Column(String, ForeignKey("sepsis_predictions.id"))
+    prediction_id = Column(GeneratedId, ForeignKey("sepsis_predictions.id"))
     alert_type = Column(String, nullable=False)
     severity = Column(Integer, nullable=False)  # 1-5 scale, 5 being most severe
     status = Column(Enum(AlertStatus), default=AlertStatus.PENDING)
     message = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     acknowledged_at = Column(DateTime(timezone=True), nullable=True)
-    acknowledged_by = Column(String, ForeignKey("users.id"), nullable=True)
+    acknowledged_by = Column(GeneratedId, ForeignKey("users.id"), nullable=True)
     
     # Relationships
-    patient = relationship("Patient", back_populates="alerts")
+    patient = relationship("Patient", back_populates="alerts", lazy="raise")
     prediction = relationship("SepsisPrediction", back_populates="alerts")
 
+    __table_args__ = (
+        # Alert listings filter by status or patient and sort newest first
+        Index("ix_alerts_status_created_desc", "status", created_at.desc()),
+        Index("ix_alerts_patient_created_desc", "patient_id", created_at.desc()),
+    )
+
 class SepsisPrediction(Base):
     __tablename__ = "sepsis_predictions"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GeneratedId, primary_key=True, index=True, default=generate_unique_id)
     patient_id = Column(String, ForeignKey("patients.id"))
-    user_id = Column(String, ForeignKey("users.id"), nullable=True)  # User who requested prediction
+    user_id = Column(GeneratedId, ForeignKey("users.id"), nullable=True)  # User who requested prediction
     probability = Column(Float, nullable=False)
     is_sepsis_risk = Column(Boolean, nullable=False)
-    features_used = Column(JSON, nullable=True)
+    features_used = Column(JSONB, nullable=True)
     model_version = Column(String, nullable=False)
-    explanation = Column(JSON, nullable=True)  # SHAP values or other explanation data
+    # SHAP values or other explanation data; only loaded when asked for (undefer)
+    explanation = deferred(Column(JSONB, nullable=True))
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -124,6 +167,11 @@ class SepsisPrediction(Base):
     alerts = relationship("Alert", back_populates="prediction")
     feedback = relationship("Feedback", back_populates="prediction")
 
+    __table_args__ = (
+        # Keyset pagination of a patient's prediction history (newest first)
+        Index("ix_sepsis_predictions_patient_timestamp_id", "patient_id", timestamp.desc(), id.desc()),
+    )
+
 class FeedbackType(str, enum.Enum):
     CORRECT = "correct"
     FALSE_POSITIVE = "false_positive"
@@ -133,13 +181,46 @@ class FeedbackType(str, enum.Enum):
 class Feedback(Base):
     __tablename__ = "feedback"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
-    prediction_id = Column(String, ForeignKey("sepsis_predictions.id"))
-    user_id = Column(String, ForeignKey("users.id"))
+    id = Column(GeneratedId, primary_key=True, index=True, default=generate_unique_id)
+    prediction_id = Column(GeneratedId, ForeignKey("sepsis_predictions.id"))
+    user_id = Column(GeneratedId, ForeignKey("users.id"))
     feedback_type = Column(Enum(FeedbackType), nullable=False)
     comments = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     prediction = relationship("SepsisPrediction", back_populates="feedback")
-    user = relationship("User", back_populates="feedback")
\ No newline at end of file
+    user = relationship("User", back_populates="feedback")
+
+    __table_args__ = (
+        # Feedback listings by prediction or by submitting user, newest first
+        Index("ix_feedback_prediction_created_desc", "prediction_id", created_at.desc()),
+        Index("ix_feedback_user_created_desc", "user_id", created_at.desc()),
+    )
+
+@lru_cache(maxsize=None)
+def _column_reader(model: type, exclude: FrozenSet[str]) -> Tuple[Tuple[str, ...], Callable]:
+    """
+    Build (column keys, tuple getter) for a model once instead of walking
+    __table__.columns on every serialization
+    """
+    keys = tuple(c.key for c in model.__table__.columns if c.key not in exclude)
+    getter = attrgetter(*keys)
+    if len(keys) == 1:
+        return keys, lambda instance: (getter(instance),)
+    return keys, getter
+
+def model_to_dict(instance: Any, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Column values of a model instance as a dict
+    """
+    keys, getter = _column_reader(type(instance), frozenset(exclude))
+    return dict(zip(keys, getter(instance)))
+
+def model_serializer(model: type, exclude: Iterable[str] = ()) -> Callable[[Any], Dict[str, Any]]:
+    """
+    model_to_dict fixed to one model and exclude set, resolved up front; bind it
+    at module level for per-row loops
+    """
+    keys, getter = _column_reader(model, frozenset(exclude))
+    return lambda instance: dict(zip(keys, getter(instance)))
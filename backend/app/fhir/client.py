@@ -1,12 +1,69 @@
-import requests
-from typing import Dict, List, Optional, Any, Union
-import json
-from requests.auth import HTTPBasicAuth
+import asyncio
+import hashlib
+import time
+import httpx
+import orjson
+from typing import Dict, List, Optional, Any, Tuple, Union
 from loguru import logger
-from datetime import datetime, timedelta
 
+from app.core.cache import response_cache
 from app.core.config import settings
 
+# One pooled async client per process; keep-alive avoids a TCP+TLS handshake per call
+FHIR_TIMEOUT = 30.0
+FHIR_LIMITS = httpx.Limits(max_keepalive_connections=50, max_connections=100)
+# Transient gateway errors are retried with exponential backoff (GETs only, so
+# creates are never repeated); connection failures are retried by the transport
+FHIR_RETRY_STATUSES = frozenset({502, 503, 504})
+FHIR_MAX_RETRIES = 3
+FHIR_RETRY_BACKOFF = 0.3
+
+# OAuth tokens shared by every FHIRClient in the process: (token, time.monotonic()
+# deadline), keyed by a hash of (token URL, client ID, client secret)
+_TOKEN_CACHE: Dict[str, Tuple[str, float]] = {}
+# One lock per key so a cold cache triggers one token request, not one per caller
+# (created on first use, inside the running event loop)
+_TOKEN_LOCKS: Dict[str, asyncio.Lock] = {}
+# Stop using a token this many seconds before the server says it expires
+TOKEN_EXPIRY_BUFFER = 60.0
+
+_FHIR_JSON_HEADERS = {"Content-Type": "application/fhir+json"}
+
+# Ask for compressed bundles; httpx decodes br only when a brotli package is installed
+try:
+    import brotli  # noqa: F401
+    FHIR_ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    FHIR_ACCEPT_ENCODING = "gzip, deflate"
+
+# Multiplex concurrent requests over one HTTP/2 connection per host when the h2
+# package is installed (httpx negotiates it through ALPN, else uses HTTP/1.1)
+try:
+    import h2  # noqa: F401
+    FHIR_HTTP2 = True
+except ImportError:
+    FHIR_HTTP2 = False
+
+# Observation elements FHIRParser reads (searches return only these, plus the
+# mandatory ones); other searches drop just the narrative with _summary=data
+OBSERVATION_ELEMENTS = ",".join((
+    "id", "status", "code", "subject", "effectiveDateTime", "issued",
+    "valueQuantity", "valueCodeableConcept", "valueString", "valueBoolean",
+    "valueInteger", "valueRange", "valueRatio",
+))
+FHIR_SUMMARY = "data"
+
+# Raw FHIR Patient reads, cached briefly so repeated syncs don't refetch them
+FHIR_PATIENT_CACHE_NAMESPACE = "fhir_patient"
+FHIR_PATIENT_CACHE_TTL = 60
+
+def _decode(response: httpx.Response) -> Any:
+    """
+    Parse a JSON response body with orjson, straight from the raw bytes
+    (response.json() decodes to str first, then runs the stdlib parser)
+    """
+    return orjson.loads(response.content)
+
 class FHIRClient:
     def __init__(
         self,
@@ -17,33 +74,78 @@ class FHIRClient:
         self.base_url = base_url
         self.client_id = client_id
         self.client_secret = client_secret
-        self.auth_token = None
-        self.token_expiry = None
+        self.token_url = f"{base_url}/token"
+        self._token_cache_key = hashlib.sha256(
+            f"{self.token_url}|{client_id}|{client_secret}".encode()
+        ).hexdigest()
+        self.client: Optional[httpx.AsyncClient] = None
+        # Token currently set as the client's default Authorization header
+        self._client_token: Optional[str] = None
     
-    def _get_auth_header(self) -> Dict[str, str]:
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-        
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Create the HTTP client on first use (and again after close)
+        """
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Content-Type": "application/json",
+                    "Accept": "application/json",
+                    "Accept-Encoding": FHIR_ACCEPT_ENCODING,
+                },
+                timeout=FHIR_TIMEOUT,
+                transport=httpx.AsyncHTTPTransport(
+                    retries=FHIR_MAX_RETRIES, limits=FHIR_LIMITS, http2=FHIR_HTTP2
+                ),
+            )
+            self._client_token = None
+        return self.client
+    
+    async def close(self) -> None:
+        """
+        Close pooled connections
+        """
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+    
+    async def _ensure_auth(self) -> None:
+        """
+        Make the client's default headers carry a current bearer token; they are
+        only rewritten when the (shared) token changes
+        """
         # If OAuth2 authentication is configured
         if self.client_id and self.client_secret:
-            # Check if we need to refresh the token
-            if not self.auth_token or not self.token_expiry or datetime.now() >= self.token_expiry:
-                self._refresh_auth_token()
-            
-            headers["Authorization"] = f"Bearer {self.auth_token}"
-        
-        return headers
+            token = await self._get_auth_token()
+            if token != self._client_token:
+                self._get_client().headers["Authorization"] = f"Bearer {token}"
+                self._client_token = token
     
-    def _refresh_auth_token(self) -> None:
+    async def _get_auth_token(self) -> str:
         """
-        Get OAuth2 token for FHIR API access
+        Cached OAuth2 token, fetched again once it is within TOKEN_EXPIRY_BUFFER of expiring
+        """
+        key = self._token_cache_key
+        cached = _TOKEN_CACHE.get(key)
+        if cached is None or time.monotonic() >= cached[1]:
+            lock = _TOKEN_LOCKS.get(key)
+            if lock is None:
+                lock = _TOKEN_LOCKS[key] = asyncio.Lock()
+            async with lock:
+                # Another request may have refreshed it while we waited
+                cached = _TOKEN_CACHE.get(key)
+                if cached is None or time.monotonic() >= cached[1]:
+                    cached = await self._refresh_auth_token()
+        return cached[0]
+    
+    async def _refresh_auth_token(self) -> Tuple[str, float]:
+        """
+        Get OAuth2 token for FHIR API access and store it in the shared cache
         """
         try:
-            token_url = f"{self.base_url}/token"
-            response = requests.post(
-                token_url,
+            response = await self._get_client().post(
+                self.token_url,
                 data={
                     "grant_type": "client_credentials",
                     "client_id": self.client_id,
@@ -52,47 +154,98 @@ class FHIRClient:
                 headers={"Content-Type": "application/x-www-form-urlencoded"}
             )
             response.raise_for_status()
-            token_data = response.json()
-            self.auth_token = token_data["access_token"]
-            expires_in = token_data.get("expires_in", 3600)  # Default to 1 hour
-            self.token_expiry = datetime.now() + timedelta(seconds=expires_in)
+            token_data = _decode(response)
+            lifetime = float(token_data.get("expires_in", 3600))  # Default to 1 hour
+            # Very short-lived tokens keep at least half their lifetime
+            use_until = time.monotonic() + max(lifetime - TOKEN_EXPIRY_BUFFER, lifetime / 2)
+            cached = _TOKEN_CACHE[self._token_cache_key] = (token_data["access_token"], use_until)
+            return cached
         except Exception as e:
-            logger.error(f"Failed to get auth token: {str(e)}")
+            logger.error("Failed to get auth token: {}", e)
             raise e
     
-    def get_patient(self, patient_id: str) -> Dict[str, Any]:
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET a FHIR resource or bundle as JSON
+        """
+        return _decode(await self._get_response(path, params))
+    
+    async def _get_response(self, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """
+        GET a FHIR URL, retrying transient gateway errors; raises on error statuses
+        """
+        for attempt in range(FHIR_MAX_RETRIES + 1):
+            await self._ensure_auth()
+            response = await self._get_client().get(path, params=params)
+            if response.status_code not in FHIR_RETRY_STATUSES or attempt == FHIR_MAX_RETRIES:
+                break
+            await asyncio.sleep(FHIR_RETRY_BACKOFF * 2 ** attempt)
+        response.raise_for_status()
+        return response
+    
+    async def _post(self, path: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST a FHIR resource, serialized with orjson
+        """
+        await self._ensure_auth()
+        response = await self._get_client().post(path, content=orjson.dumps(data), headers=_FHIR_JSON_HEADERS)
+        response.raise_for_status()
+        return _decode(response)
+    
+    def _patient_cache_key(self, patient_id: str) -> str:
+        return f"{self.base_url}|{patient_id}"
+    
+    async def invalidate_patient(self, patient_id: str) -> None:
+        """
+        Drop a cached Patient read (after the resource changed on the server)
         """
-        Retrieve a specific patient by ID
+        await response_cache.delete(FHIR_PATIENT_CACHE_NAMESPACE, self._patient_cache_key(patient_id))
+    
+    async def get_patient(self, patient_id: str) -> Dict[str, Any]:
         """
-        url = f"{self.base_url}/Patient/{patient_id}"
+        Retrieve a specific patient by ID; reads are cached for
+        FHIR_PATIENT_CACHE_TTL seconds and each caller gets its own decoded copy
+        """
+        cache_key = self._patient_cache_key(patient_id)
+        cached = await response_cache.get(FHIR_PATIENT_CACHE_NAMESPACE, cache_key)
+        if cached is not None:
+            return orjson.loads(cached)
+        
+        path = f"/Patient/{patient_id}"
         try:
-            response = requests.get(url, headers=self._get_auth_header())
-            response.raise_for_status()
-            return response.json()
+            response = await self._get_response(path)
+            await response_cache.set(
+                FHIR_PATIENT_CACHE_NAMESPACE, cache_key, response.content, expire=FHIR_PATIENT_CACHE_TTL
+            )
+            return _decode(response)
         except Exception as e:
-            logger.error(f"Failed to get patient {patient_id}: {str(e)}")
+            logger.error("Failed to get patient {}: {}", patient_id, e)
             raise e
     
-    def search_patients(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def search_patients(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Search for patients based on parameters
         """
-        url = f"{self.base_url}/Patient"
+        path = "/Patient"
         try:
-            response = requests.get(url, params=params, headers=self._get_auth_header())
-            response.raise_for_status()
-            result = response.json()
+            result = await self._get(path, params=params)
             return result.get("entry", [])
         except Exception as e:
-            logger.error(f"Failed to search patients: {str(e)}")
+            logger.error("Failed to search patients: {}", e)
             raise e
     
-    def get_patient_observations(self, patient_id: str, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def get_patient_observations(
+        self,
+        patient_id: str,
+        category: Optional[str] = None,
+        elements: Optional[str] = OBSERVATION_ELEMENTS,
+    ) -> List[Dict[str, Any]]:
         """
         Get all observations for a patient
         Optional category filter: vital-signs, laboratory, etc.
+        Only `elements` are returned (pass None for complete resources)
         """
-        url = f"{self.base_url}/Observation"
+        path = "/Observation"
         params = {
             "patient": patient_id,
             "_sort": "-date",
@@ -101,107 +254,142 @@ class FHIRClient:
         
         if category:
             params["category"] = category
+        if elements:
+            params["_elements"] = elements
         
         try:
-            response = requests.get(url, params=params, headers=self._get_auth_header())
-            response.raise_for_status()
-            result = response.json()
+            result = await self._get(path, params=params)
             return result.get("entry", [])
         except Exception as e:
-            logger.error(f"Failed to get observations for patient {patient_id}: {str(e)}")
+            logger.error("Failed to get observations for patient {}: {}", patient_id, e)
             raise e
     
-    def get_patient_conditions(self, patient_id: str) -> List[Dict[str, Any]]:
+    async def get_patient_conditions(self, patient_id: str) -> List[Dict[str, Any]]:
         """
         Get all conditions (diagnoses) for a patient
         """
-        url = f"{self.base_url}/Condition"
+        path = "/Condition"
         params = {
             "patient": patient_id,
             "_sort": "-recorded-date",
             "_count": 100,
+            "_summary": FHIR_SUMMARY,
         }
         
         try:
-            response = requests.get(url, params=params, headers=self._get_auth_header())
-            response.raise_for_status()
-            result = response.json()
+            result = await self._get(path, params=params)
             return result.get("entry", [])
         except Exception as e:
-            logger.error(f"Failed to get conditions for patient {patient_id}: {str(e)}")
+            logger.error("Failed to get conditions for patient {}: {}", patient_id, e)
             raise e
     
-    def get_patient_medications(self, patient_id: str) -> List[Dict[str, Any]]:
+    async def get_patient_medications(self, patient_id: str) -> List[Dict[str, Any]]:
         """
         Get all medications for a patient
         """
-        url = f"{self.base_url}/MedicationRequest"
+        path = "/MedicationRequest"
         params = {
             "patient": patient_id,
             "_sort": "-authored",
             "_count": 100,
+            "_summary": FHIR_SUMMARY,
         }
         
         try:
-            response = requests.get(url, params=params, headers=self._get_auth_header())
-            response = requests.get(url, params=params, headers=self._get_auth_header())
-            response.raise_for_status()
-            result = response.json()
+            result = await self._get(path, params=params)
             return result.get("entry", [])
         except Exception as e:
-            logger.error(f"Failed to get medications for patient {patient_id}: {str(e)}")
+            logger.error("Failed to get medications for patient {}: {}", patient_id, e)
             raise e
     
-    def get_patient_encounters(self, patient_id: str) -> List[Dict[str, Any]]:
+    async def get_patient_encounters(self, patient_id: str) -> List[Dict[str, Any]]:
         """
         Get all encounters for a patient
         """
-        url = f"{self.base_url}/Encounter"
+        path = "/Encounter"
         params = {
             "patient": patient_id,
             "_sort": "-date",
             "_count": 100,
+            "_summary": FHIR_SUMMARY,
         }
         
         try:
-            response = requests.get(url, params=params, headers=self._get_auth_header())
-            response.raise_for_status()
-            result = response.json()
+            result = await self._get(path, params=params)
             return result.get("entry", [])
         except Exception as e:
-            logger.error(f"Failed to get encounters for patient {patient_id}: {str(e)}")
+            logger.error("Failed to get encounters for patient {}: {}", patient_id, e)
             raise e
     
-    def create_patient(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_patient_bundle(self, patient_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Fetch a patient's observations, conditions, medications and encounters concurrently
+        """
+        observations, conditions, medications, encounters = await asyncio.gather(
+            self.get_patient_observations(patient_id),
+            self.get_patient_conditions(patient_id),
+            self.get_patient_medications(patient_id),
+            self.get_patient_encounters(patient_id),
+        )
+        return {
+            "observations": observations,
+            "conditions": conditions,
+            "medications": medications,
+            "encounters": encounters,
+        }
+    
+    async def create_patient(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a new patient record
         """
-        url = f"{self.base_url}/Patient"
+        path = "/Patient"
         try:
-            response = requests.post(
-                url,
-                json=patient_data,
-                headers=self._get_auth_header()
-            )
-            response.raise_for_status()
-            return response.json()
+            created = await self._post(path, patient_data)
+            if created.get("id"):
+                await self.invalidate_patient(created["id"])
+            return created
         except Exception as e:
-            logger.error(f"Failed to create patient: {str(e)}")
+            logger.error("Failed to create patient: {}", e)
             raise e
 
-    def create_observation(self, observation_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_observation(self, observation_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a new observation
         """
-        url = f"{self.base_url}/Observation"
+        path = "/Observation"
         try:
-            response = requests.post(
-                url,
-                json=observation_data,
-                headers=self._get_auth_header()
-            )
-            response.raise_for_status()
-            return response.json()
+            return await self._post(path, observation_data)
+        except Exception as e:
+            logger.error("Failed to create observation: {}", e)
+            raise e
+    
+    async def create_bundle(self, resources: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Create many resources in one round-trip as a FHIR transaction Bundle
+        POSTed to the server base; returns the transaction-response Bundle
+        """
+        bundle = {
+            "resourceType": "Bundle",
+            "type": "transaction",
+            "entry": [
+                {"resource": resource, "request": {"method": "POST", "url": resource["resourceType"]}}
+                for resource in resources
+            ],
+        }
+        try:
+            return await self._post("", bundle)
         except Exception as e:
-            logger.error(f"Failed to create observation: {str(e)}")
-            raise e
\ No newline at end of file
+            logger.error("Failed to create bundle of {} resources: {}", len(resources), e)
+            raise e
+    
+    async def create_observations(self, observations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Create a batch of observations (e.g. a stream of vitals) in a single
+        transaction; returns the response entries in request order
+        """
+        if not observations:
+            return []
+        result = await self.create_bundle(observations)
+        return result.get("entry", [])
+
+fhir_client = FHIRClient()
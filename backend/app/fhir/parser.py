@@ -1,8 +1,101 @@
-from typing import Dict, List, Optional, Any, Union, Tuple
-from datetime import datetime
+from typing import Any, Callable, Dict, List, Match, Optional, Tuple, Union
+from datetime import datetime, timezone
 import re
+import numpy as np
+import pandas as pd
 from loguru import logger
 
+# ClinicalData column for each supported LOINC observation code
+LOINC_FIELDS: Dict[str, str] = {
+    "8867-4": "heart_rate",
+    "9279-1": "respiratory_rate",
+    "8310-5": "temperature",
+    "8480-6": "systolic_bp",
+    "8462-4": "diastolic_bp",
+    "2708-6": "oxygen_saturation",
+    "2339-0": "blood_glucose",
+    "6690-2": "wbc_count",
+    "777-3": "platelet_count",
+    "2524-7": "lactate",
+    "2160-0": "creatinine",
+    "1975-2": "bilirubin",
+}
+
+# Fallback for other codes: keyword in the coding's display name -> column
+DISPLAY_FIELDS: Dict[str, str] = {
+    "heart rate": "heart_rate",
+    "respiratory rate": "respiratory_rate",
+    "temperature": "temperature",
+    "systolic": "systolic_bp",
+    "diastolic": "diastolic_bp",
+    "oxygen": "oxygen_saturation",
+    "glucose": "blood_glucose",
+    "white blood cell": "wbc_count",
+    "wbc": "wbc_count",
+    "platelet": "platelet_count",
+    "lactate": "lactate",
+    "creatinine": "creatinine",
+    "bilirubin": "bilirubin",
+}
+DISPLAY_FIELD_RE = re.compile("|".join(map(re.escape, DISPLAY_FIELDS)), re.IGNORECASE)
+
+# Columns of parse_observations_bulk, in ClinicalData order
+CLINICAL_FIELDS: List[str] = list(LOINC_FIELDS.values())
+
+def _parse_instant(value: str) -> datetime:
+    """
+    FHIR dateTime/instant string -> datetime with the C-implemented fromisoformat;
+    Python 3.9's version rejects a "Z" suffix, so only that is rewritten
+    """
+    if value[-1:] == "Z":
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+def _numeric_value(observation_resource: Dict[str, Any]) -> float:
+    """
+    valueQuantity / valueInteger of an observation as a float, NaN if absent or not numeric
+    """
+    value = observation_resource.get("valueQuantity", {}).get("value")
+    if value is None:
+        value = observation_resource.get("valueInteger")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _quantity_value(quantity: Dict[str, Any]) -> Any:
+    return quantity.get("value")
+
+def _concept_value(concept: Dict[str, Any]) -> Any:
+    coding: Dict[str, Any] = concept.get("coding", [{}])[0]
+    return coding.get("display") or coding.get("code")
+
+def _primitive_value(value: Any) -> Any:
+    return value
+
+def _range_value(value_range: Dict[str, Any]) -> Any:
+    low: Any = value_range.get("low", {}).get("value")
+    high: Any = value_range.get("high", {}).get("value")
+    return f"{low}-{high}" if low and high else (low or high)
+
+def _ratio_value(ratio: Dict[str, Any]) -> Any:
+    numerator: Any = ratio.get("numerator", {}).get("value")
+    denominator: Any = ratio.get("denominator", {}).get("value")
+    if numerator is not None and denominator is not None and denominator != 0:
+        return numerator / denominator
+    return None
+
+# Observation value[x] keys in lookup order, with the function reading each one
+_VALUE_HANDLERS: Tuple[Tuple[str, Callable[[Any], Any]], ...] = (
+    ("valueQuantity", _quantity_value),
+    ("valueCodeableConcept", _concept_value),
+    ("valueString", _primitive_value),
+    ("valueBoolean", _primitive_value),
+    ("valueInteger", _primitive_value),
+    ("valueRange", _range_value),
+    ("valueRatio", _ratio_value),
+)
+
 class FHIRParser:
     @staticmethod
     def parse_patient(patient_resource: Dict[str, Any]) -> Dict[str, Any]:
@@ -10,35 +103,35 @@ class FHIRParser:
         Parse FHIR Patient resource into a simplified structure
         """
         try:
-            patient_id = patient_resource.get("id")
+            patient_id: Optional[str] = patient_resource.get("id")
             
             # Extract name
-            name = patient_resource.get("name", [{}])[0]
-            first_name = name.get("given", [""])[0] if name.get("given") else ""
-            last_name = name.get("family", "")
+            name: Dict[str, Any] = patient_resource.get("name", [{}])[0]
+            first_name: str = name.get("given", [""])[0] if name.get("given") else ""
+            last_name: str = name.get("family", "")
             
             # Extract identifiers (like MRN)
-            identifiers = patient_resource.get("identifier", [])
-            mrn = None
+            identifiers: List[Dict[str, Any]] = patient_resource.get("identifier", [])
+            mrn: Optional[str] = None
             for identifier in identifiers:
                 if identifier.get("type", {}).get("coding", [{}])[0].get("code") == "MR":
                     mrn = identifier.get("value")
                     break
             
             # Extract gender and DOB
-            gender = patient_resource.get("gender")
-            dob_str = patient_resource.get("birthDate")
-            date_of_birth = None
+            gender: Optional[str] = patient_resource.get("gender")
+            dob_str: Optional[str] = patient_resource.get("birthDate")
+            date_of_birth: Optional[datetime] = None
             if dob_str:
                 try:
-                    date_of_birth = datetime.strptime(dob_str, "%Y-%m-%d")
+                    date_of_birth = datetime.fromisoformat(dob_str)
                 except ValueError:
-                    logger.warning(f"Could not parse birthDate: {dob_str}")
+                    logger.warning("Could not parse birthDate: {}", dob_str)
             
             # Extract contact info
-            telecom = patient_resource.get("telecom", [])
-            phone_number = None
-            email = None
+            telecom: List[Dict[str, Any]] = patient_resource.get("telecom", [])
+            phone_number: Optional[str] = None
+            email: Optional[str] = None
             for contact in telecom:
                 if contact.get("system") == "phone":
                     phone_number = contact.get("value")
@@ -46,33 +139,17 @@ class FHIRParser:
                     email = contact.get("value")
             
             # Extract address
-            addresses = patient_resource.get("address", [])
-            address = None
+            addresses: List[Dict[str, Any]] = patient_resource.get("address", [])
+            address: Optional[str] = None
             if addresses:
-                address_parts = []
-                address_obj = addresses[0]
-                
-                line = address_obj.get("line", [])
-                if line:
-                    address_parts.extend(line)
-                
-                city = address_obj.get("city")
-                if city:
-                    address_parts.append(city)
-                
-                state = address_obj.get("state")
-                if state:
-                    address_parts.append(state)
-                
-                postal_code = address_obj.get("postalCode")
-                if postal_code:
-                    address_parts.append(postal_code)
-                
-                country = address_obj.get("country")
-                if country:
-                    address_parts.append(country)
-                
-                address = ", ".join(address_parts)
+                address_obj: Dict[str, Any] = addresses[0]
+                address = ", ".join(filter(None, (
+                    *(address_obj.get("line") or ()),
+                    address_obj.get("city"),
+                    address_obj.get("state"),
+                    address_obj.get("postalCode"),
+                    address_obj.get("country"),
+                )))
             
             return {
                 "id": patient_id,
@@ -87,7 +164,7 @@ class FHIRParser:
                 "address": address
             }
         except Exception as e:
-            logger.error(f"Error parsing patient resource: {str(e)}")
+            logger.error("Error parsing patient resource: {}", e)
             # Return a minimal valid patient object
             return {
                 "id": patient_resource.get("id", "unknown"),
@@ -96,6 +173,44 @@ class FHIRParser:
                 "last_name": "Patient"
             }
     
+    @staticmethod
+    def parse_observations_bulk(observation_resources: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Numeric vital signs and lab values of many Observation resources as one
+        frame: a row per (UTC) timestamp, a column per CLINICAL_FIELDS entry.
+        Codes are mapped as in parse_observation, but column-wise; observations
+        without a usable timestamp, code or numeric value are dropped
+        """
+        codings = [
+            (resource.get("code", {}).get("coding") or [{}])[0]
+            for resource in observation_resources
+        ]
+        frame = pd.DataFrame({
+            "code": pd.Series([coding.get("code") for coding in codings], dtype=object),
+            "display": pd.Series([coding.get("display") for coding in codings], dtype=object),
+            "timestamp": pd.to_datetime(
+                [resource.get("effectiveDateTime") or resource.get("issued") for resource in observation_resources],
+                utc=True, format="ISO8601", errors="coerce"
+            ),
+            "value": np.fromiter(
+                map(_numeric_value, observation_resources), dtype=np.float64, count=len(observation_resources)
+            ),
+        })
+        
+        # LOINC code first, then the display-name keywords (only for coded observations)
+        by_display = (
+            frame["display"].str.extract(f"({DISPLAY_FIELD_RE.pattern})", flags=re.IGNORECASE)[0]
+            .str.lower().map(DISPLAY_FIELDS)
+        )
+        frame["field"] = frame["code"].map(LOINC_FIELDS).fillna(by_display).where(frame["code"].notna())
+        frame = frame.dropna(subset=["timestamp", "field", "value"])
+        
+        return (
+            frame.pivot_table(index="timestamp", columns="field", values="value", aggfunc="last")
+            .reindex(columns=CLINICAL_FIELDS)
+            .rename_axis(columns=None)
+        )
+    
     @staticmethod
     def parse_observation(observation_resource: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -103,68 +218,39 @@ class FHIRParser:
         """
         try:
             # Extract basic details
-            observation_id = observation_resource.get("id")
-            patient_id = observation_resource.get("subject", {}).get("reference", "").replace("Patient/", "")
+            observation_id: Optional[str] = observation_resource.get("id")
+            patient_id: str = observation_resource.get("subject", {}).get("reference", "").removeprefix("Patient/")
             
             # Extract timestamp
-            effective_datetime = observation_resource.get("effectiveDateTime") or observation_resource.get("issued")
-            timestamp = None
+            effective_datetime: Optional[str] = (
+                observation_resource.get("effectiveDateTime") or observation_resource.get("issued")
+            )
+            timestamp: datetime
             if effective_datetime:
                 try:
-                    timestamp = datetime.fromisoformat(effective_datetime.replace("Z", "+00:00"))
+                    timestamp = _parse_instant(effective_datetime)
                 except (ValueError, TypeError):
-                    logger.warning(f"Could not parse datetime: {effective_datetime}")
-                    timestamp = datetime.now()
+                    logger.warning("Could not parse datetime: {}", effective_datetime)
+                    timestamp = datetime.now(timezone.utc)
             else:
-                timestamp = datetime.now()
+                timestamp = datetime.now(timezone.utc)
             
             # Extract code and display name
-            code = observation_resource.get("code", {})
-            coding = code.get("coding", [{}])[0]
-            code_value = coding.get("code")
-            code_display = coding.get("display")
+            code: Dict[str, Any] = observation_resource.get("code", {})
+            coding: Dict[str, Any] = code.get("coding", [{}])[0]
+            code_value: Optional[str] = coding.get("code")
+            code_display: Optional[str] = coding.get("display")
             
-            # Extract value
-            value = None
-            value_type = None
-            
-            if "valueQuantity" in observation_resource:
-                value_quantity = observation_resource.get("valueQuantity", {})
-                value = value_quantity.get("value")
-                value_type = "quantity"
-                unit = value_quantity.get("unit")
-            elif "valueCodeableConcept" in observation_resource:
-                value_codeable = observation_resource.get("valueCodeableConcept", {})
-                value_coding = value_codeable.get("coding", [{}])[0]
-                value = value_coding.get("display") or value_coding.get("code")
-                value_type = "concept"
-            elif "valueString" in observation_resource:
-                value = observation_resource.get("valueString")
-                value_type = "string"
-            elif "valueBoolean" in observation_resource:
-                value = observation_resource.get("valueBoolean")
-                value_type = "boolean"
-            elif "valueInteger" in observation_resource:
-                value = observation_resource.get("valueInteger")
-                value_type = "integer"
-            elif "valueRange" in observation_resource:
-                value_range = observation_resource.get("valueRange", {})
-                low = value_range.get("low", {}).get("value")
-                high = value_range.get("high", {}).get("value")
-                value = f"{low}-{high}" if low and high else (low or high)
-                value_type = "range"
-            elif "valueRatio" in observation_resource:
-                value_ratio = observation_resource.get("valueRatio", {})
-                numerator = value_ratio.get("numerator", {}).get("value")
-                denominator = value_ratio.get("denominator", {}).get("value")
-                if numerator is not None and denominator is not None and denominator != 0:
-                    value = numerator / denominator
-                else:
-                    value = None
-                value_type = "ratio"
+            # Extract value from the first value[x] element present
+            value: Any = None
+            for value_key, value_handler in _VALUE_HANDLERS:
+                value_element: Any = observation_resource.get(value_key)
+                if value_element is not None:
+                    value = value_handler(value_element)
+                    break
             
             # Map common vital signs and lab values to standardized fields
-            clinical_data = {
+            clinical_data: Dict[str, Any] = {
                 "patient_id": patient_id,
                 "fhir_resource_id": observation_id,
                 "fhir_resource_type": "Observation",
@@ -172,65 +258,24 @@ class FHIRParser:
                 "timestamp": timestamp
             }
             
-            # Map specific vital signs and lab values based on LOINC or SNOMED codes
+            # Map specific vital signs and lab values: LOINC code first, then display name
             if code_value:
-                # Heart rate (LOINC: 8867-4)
-                if code_value == "8867-4" or "heart rate" in (code_display or "").lower():
-                    clinical_data["heart_rate"] = float(value) if value is not None else None
-                
-                # Respiratory rate (LOINC: 9279-1)
-                elif code_value == "9279-1" or "respiratory rate" in (code_display or "").lower():
-                    clinical_data["respiratory_rate"] = float(value) if value is not None else None
-                
-                # Body temperature (LOINC: 8310-5)
-                elif code_value == "8310-5" or "temperature" in (code_display or "").lower():
-                    clinical_data["temperature"] = float(value) if value is not None else None
-                
-                # Systolic blood pressure (LOINC: 8480-6)
-                elif code_value == "8480-6" or "systolic" in (code_display or "").lower():
-                    clinical_data["systolic_bp"] = float(value) if value is not None else None
-                
-                # Diastolic blood pressure (LOINC: 8462-4)
-                elif code_value == "8462-4" or "diastolic" in (code_display or "").lower():
-                    clinical_data["diastolic_bp"] = float(value) if value is not None else None
-                
-                # Oxygen saturation (LOINC: 2708-6)
-                elif code_value == "2708-6" or "oxygen" in (code_display or "").lower():
-                    clinical_data["oxygen_saturation"] = float(value) if value is not None else None
-                
-                # Blood glucose (LOINC: 2339-0)
-                elif code_value == "2339-0" or "glucose" in (code_display or "").lower():
-                    clinical_data["blood_glucose"] = float(value) if value is not None else None
-                
-                # WBC count (LOINC: 6690-2)
-                elif code_value == "6690-2" or "white blood cell" in (code_display or "").lower() or "wbc" in (code_display or "").lower():
-                    clinical_data["wbc_count"] = float(value) if value is not None else None
-                
-                # Platelet count (LOINC: 777-3)
-                elif code_value == "777-3" or "platelet" in (code_display or "").lower():
-                    clinical_data["platelet_count"] = float(value) if value is not None else None
-                
-                # Lactate (LOINC: 2524-7)
-                elif code_value == "2524-7" or "lactate" in (code_display or "").lower():
-                    clinical_data["lactate"] = float(value) if value is not None else None
-                
-                # Creatinine (LOINC: 2160-0)
-                elif code_value == "2160-0" or "creatinine" in (code_display or "").lower():
-                    clinical_data["creatinine"] = float(value) if value is not None else None
-                
-                # Bilirubin (LOINC: 1975-2)
-                elif code_value == "1975-2" or "bilirubin" in (code_display or "").lower():
-                    clinical_data["bilirubin"] = float(value) if value is not None else None
+                field: Optional[str] = LOINC_FIELDS.get(code_value)
+                if field is None:
+                    match: Optional[Match[str]] = DISPLAY_FIELD_RE.search(code_display or "")
+                    field = DISPLAY_FIELDS[match.group(0).lower()] if match else None
+                if field is not None:
+                    clinical_data[field] = float(value) if value is not None else None
             
             return clinical_data
             
         except Exception as e:
-            logger.error(f"Error parsing observation resource: {str(e)}")
+            logger.error("Error parsing observation resource: {}", e)
             # Return minimal valid clinical data
             return {
-                "patient_id": observation_resource.get("subject", {}).get("reference", "").replace("Patient/", ""),
+                "patient_id": observation_resource.get("subject", {}).get("reference", "").removeprefix("Patient/"),
                 "fhir_resource_id": observation_resource.get("id", "unknown"),
                 "fhir_resource_type": "Observation",
                 "fhir_resource": observation_resource,
-                "timestamp": datetime.now()
+                "timestamp": datetime.now(timezone.utc)
             }
\ No newline at end of file
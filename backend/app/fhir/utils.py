@@ -3,6 +3,31 @@ from datetime import datetime
 import os
 import json
 
+# Constant parts of the resources built below, shared by reference rather than
+# rebuilt per call; callers serialize the resources and must not mutate them
+_MRN_IDENTIFIER_TYPE: Dict[str, Any] = {
+    "coding": [
+        {
+            "system": "http://terminology.hl7.org/CodeSystem/v2-0203",
+            "code": "MR",
+            "display": "Medical Record Number"
+        }
+    ],
+    "text": "Medical Record Number"
+}
+
+_VITAL_SIGNS_CATEGORY: List[Dict[str, Any]] = [
+    {
+        "coding": [
+            {
+                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                "code": "vital-signs",
+                "display": "Vital Signs"
+            }
+        ]
+    }
+]
+
 def create_patient_resource(
     first_name: str,
     last_name: str,
@@ -38,16 +63,7 @@ def create_patient_resource(
         patient["identifier"] = [
             {
                 "use": "official",
-                "type": {
-                    "coding": [
-                        {
-                            "system": "http://terminology.hl7.org/CodeSystem/v2-0203",
-                            "code": "MR",
-                            "display": "Medical Record Number"
-                        }
-                    ],
-                    "text": "Medical Record Number"
-                },
+                "type": _MRN_IDENTIFIER_TYPE,
                 "value": mrn
             }
         ]
@@ -87,17 +103,7 @@ def create_observation_resource(
     observation = {
         "resourceType": "Observation",
         "status": "final",
-        "category": [
-            {
-                "coding": [
-                    {
-                        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                        "code": "vital-signs",
-                        "display": "Vital Signs"
-                    }
-                ]
-            }
-        ],
+        "category": _VITAL_SIGNS_CATEGORY,
         "code": {
             "coding": [
                 {
@@ -128,8 +134,6 @@ def fhir_reference_to_id(reference: Optional[str]) -> Optional[str]:
     if not reference:
         return None
     
-    parts = reference.split('/')
-    if len(parts) >= 2:
-        return parts[-1]
-    
-    return reference
\ No newline at end of file
+    # Slice after the last "/" instead of building a list with split()
+    idx = reference.rfind('/')
+    return reference[idx + 1:] if idx >= 0 else reference
\ No newline at end of file
@@ -1,25 +1,28 @@
-import time
 from pathlib import Path
 import logging
 
 from fastapi import FastAPI, Request, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.exceptions import RequestValidationError
 import uvicorn
 
 from app.api import auth, patients, predictions, alerts, feedback
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.core.cache import response_cache
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.middleware import ProcessTimeMiddleware
+from app.core.responses import ORJSONResponse
 from app.db.database import engine, Base
+from app.fhir.client import fhir_client
+from app.services.notification import notification_service
 
 # Setup application logger
 logger = setup_logging()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 # Create FastAPI application
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -28,6 +31,7 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=f"{settings.API_V1_STR}/docs",
     redoc_url=f"{settings.API_V1_STR}/redoc",
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -37,16 +41,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset pagination cursor and list ETag for clients handling them in JS
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
-# Add request processing time middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+# Compress larger responses (alert/feedback lists repeat a lot of text)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+@app.on_event("startup")
+async def startup():
+    """
+    Create database tables and connect to Redis for alert notifications
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await notification_service.connect()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Close pooled database, cache and FHIR connections and flush queued alerts
+    and log messages
+    """
+    await engine.dispose()
+    await response_cache.disconnect()
+    await notification_service.disconnect()
+    await fhir_client.close()
+    await logger.complete()
+
+# Add request processing time header (outermost, so it covers the other middleware)
+app.add_middleware(ProcessTimeMiddleware)
 
 # Custom validation error handler
 @app.exception_handler(RequestValidationError)
@@ -99,4 +123,12 @@ def health_check():
     return {"status": "healthy"}
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=settings.SERVER_RELOAD,
+        workers=None if settings.SERVER_RELOAD else settings.SERVER_WORKERS,
+        loop="uvloop",
+        http="httptools",
+    )
\ No newline at end of file
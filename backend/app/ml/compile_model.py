@@ -0,0 +1,42 @@
+import argparse
+from pathlib import Path
+import joblib
+from loguru import logger
+import tl2cgen
+import treelite
+
+from app.core.config import settings
+
+def _to_treelite(model) -> "treelite.Model":
+    """
+    Import a trained XGBoost, LightGBM or scikit-learn tree ensemble into Treelite
+    """
+    if hasattr(model, "get_booster"):
+        return treelite.frontend.from_xgboost(model.get_booster())
+    if hasattr(model, "booster_"):
+        return treelite.frontend.from_lightgbm(model.booster_)
+    return treelite.sklearn.import_model(model)
+
+def compile_model(model_path: str, libpath: str, parallel_comp: int = 4) -> str:
+    """
+    Compile the pickled model at model_path into a native predictor library;
+    point MODEL_PATH at the result (the .pkl beside it stays the fallback)
+    """
+    model = joblib.load(model_path)
+    tl2cgen.export_lib(
+        _to_treelite(model),
+        toolchain="gcc",
+        libpath=libpath,
+        params={"parallel_comp": parallel_comp},
+    )
+    logger.info(f"Compiled {model_path} to {libpath}")
+    return libpath
+
+if __name__ == "__main__":
+    default_model_path = str(Path(settings.MODEL_PATH).with_suffix(".pkl"))
+    parser = argparse.ArgumentParser(description="Compile the sepsis model with tl2cgen")
+    parser.add_argument("model_path", nargs="?", default=default_model_path)
+    parser.add_argument("libpath", nargs="?", default=str(Path(default_model_path).with_suffix(".so")))
+    parser.add_argument("--parallel-comp", type=int, default=4)
+    args = parser.parse_args()
+    compile_model(args.model_path, args.libpath, args.parallel_comp)
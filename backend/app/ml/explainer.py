@@ -1,58 +1,257 @@
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import io
 import base64
+from html import escape
 from loguru import logger
-import joblib
 import shap
 
+from app.core.config import settings
+from app.ml.serialization import dump_with_buffers
+
+# Optional: FastTreeSHAP computes the same tree SHAP values several times faster
+try:
+    import fasttreeshap
+except ImportError:
+    fasttreeshap = None
+
+# Rows of background data summarized for the model-agnostic KernelExplainer
+KERNEL_BACKGROUND_SAMPLES = 50
+# Feature frames whose SHAP values are kept, so an explanation and its plots
+# share one computation
+SHAP_CACHE_SIZE = 128
+
+# SVG plots: contributions drawn individually (the rest are summed into one
+# row), SHAP's colors for pushing the prediction up / down, and layout in pixels
+SVG_MAX_FEATURES = 10
+SVG_POSITIVE_COLOR = "#ff0051"
+SVG_NEGATIVE_COLOR = "#008bfb"
+SVG_WIDTH = 640
+SVG_LABEL_WIDTH = 220
+SVG_ROW_HEIGHT = 26
+_SVG_OPEN = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+    'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="12">'
+)
+
+def _gpu_tree_available() -> bool:
+    """
+    Whether shap was built with its CUDA extension; GPUTreeExplainer can be
+    created without it but fails on the first shap_values call
+    """
+    try:
+        from shap import _cext_gpu  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _svg_data_uri(svg: str) -> str:
+    return f"data:image/svg+xml;base64,{base64.b64encode(svg.encode('utf-8')).decode('ascii')}"
+
+def _top_contributions(
+    shap_values: np.ndarray, feature_values: pd.Series, max_features: int = SVG_MAX_FEATURES
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Labels ("name = value") and SHAP values of the largest contributions, largest
+    first; anything past max_features is summed into an "other features" entry
+    """
+    order = np.argsort(-np.abs(shap_values), kind="stable")
+    shown, rest = order[:max_features], order[max_features:]
+    labels = [f"{feature_values.index[i]} = {feature_values.iloc[i]:.4g}" for i in shown]
+    values = shap_values[shown]
+    if len(rest):
+        labels.append(f"{len(rest)} other features")
+        values = np.append(values, shap_values[rest].sum())
+    return labels, values
+
+def _x_scale(low: float, high: float, left: float, right: float):
+    """
+    Map data coordinates in [low, high] onto pixels in [left, right]
+    """
+    span = (high - low) or 1.0
+    return lambda value: left + (value - low) / span * (right - left)
+
+def _render_waterfall_svg(base_value: float, shap_values: np.ndarray, feature_values: pd.Series) -> str:
+    """
+    Waterfall plot as an SVG document: one bar per contribution, stacked from
+    the base value E[f(x)] (bottom) up to the prediction f(x) (top)
+    """
+    labels, values = _top_contributions(shap_values, feature_values)
+    # Bars are accumulated bottom-up (smallest contribution first)
+    ends = base_value + np.cumsum(values[::-1])[::-1]
+    starts = ends - values
+    x = _x_scale(
+        min(base_value, starts.min(), ends.min()), max(base_value, starts.max(), ends.max()),
+        SVG_LABEL_WIDTH, SVG_WIDTH - 60
+    )
+    
+    height = SVG_ROW_HEIGHT * (len(values) + 2)
+    parts = [_SVG_OPEN.format(width=SVG_WIDTH, height=height)]
+    parts.append(f'<text x="{x(ends[0]):.1f}" y="16" text-anchor="middle">f(x) = {ends[0]:.3f}</text>')
+    for row, (label, value, start, end) in enumerate(zip(labels, values, starts, ends), start=1):
+        y = row * SVG_ROW_HEIGHT
+        left, right = sorted((x(start), x(end)))
+        color = SVG_POSITIVE_COLOR if value >= 0 else SVG_NEGATIVE_COLOR
+        parts.append(f'<text x="{SVG_LABEL_WIDTH - 8}" y="{y + 17}" text-anchor="end">{escape(label)}</text>')
+        parts.append(
+            f'<rect x="{left:.1f}" y="{y + 4}" width="{max(right - left, 1.0):.1f}" '
+            f'height="{SVG_ROW_HEIGHT - 8}" fill="{color}"/>'
+        )
+        parts.append(f'<text x="{right + 4:.1f}" y="{y + 17}" fill="{color}">{value:+.3f}</text>')
+    parts.append(
+        f'<text x="{x(base_value):.1f}" y="{height - 8}" text-anchor="middle">E[f(x)] = {base_value:.3f}</text>'
+    )
+    parts.append("</svg>")
+    return "".join(parts)
+
+def _render_force_svg(base_value: float, shap_values: np.ndarray, feature_values: pd.Series) -> str:
+    """
+    Force plot as an SVG document: contributions pushing the prediction up meet
+    those pushing it down at f(x), with the base value marked on the same axis
+    """
+    labels, values = _top_contributions(shap_values, feature_values)
+    prediction = base_value + float(shap_values.sum())
+    positive, negative = values > 0, values < 0
+    # Positive segments end at f(x) from the left, negative ones start there
+    pos_widths, neg_widths = values[positive], -values[negative]
+    pos_ends = prediction - np.concatenate(([0.0], np.cumsum(pos_widths)[:-1]))
+    neg_starts = prediction + np.concatenate(([0.0], np.cumsum(neg_widths)[:-1]))
+    low = min(base_value, prediction - pos_widths.sum())
+    high = max(base_value, prediction + neg_widths.sum())
+    x = _x_scale(low, high, 20, SVG_WIDTH - 20)
+    
+    bar_y, bar_height = 40, 24
+    parts = [_SVG_OPEN.format(width=SVG_WIDTH, height=120)]
+    segments = [
+        (label, end - width, end, SVG_POSITIVE_COLOR)
+        for label, width, end in zip(np.array(labels)[positive], pos_widths, pos_ends)
+    ] + [
+        (label, start, start + width, SVG_NEGATIVE_COLOR)
+        for label, width, start in zip(np.array(labels)[negative], neg_widths, neg_starts)
+    ]
+    for label, start, end, color in segments:
+        left, right = x(start), x(end)
+        parts.append(
+            f'<rect x="{left:.1f}" y="{bar_y}" width="{max(right - left, 1.0):.1f}" height="{bar_height}" '
+            f'fill="{color}" stroke="#fff"><title>{escape(label)}</title></rect>'
+        )
+        if right - left >= 60:
+            parts.append(
+                f'<text x="{(left + right) / 2:.1f}" y="{bar_y + bar_height + 16}" text-anchor="middle" '
+                f'font-size="10">{escape(label)}</text>'
+            )
+    parts.append(
+        f'<text x="{x(prediction):.1f}" y="{bar_y - 10}" text-anchor="middle" font-weight="bold">'
+        f'f(x) = {prediction:.3f}</text>'
+    )
+    parts.append(
+        f'<line x1="{x(base_value):.1f}" x2="{x(base_value):.1f}" y1="{bar_y - 4}" y2="{bar_y + bar_height + 4}" '
+        f'stroke="#666" stroke-dasharray="3,2"/>'
+        f'<text x="{x(base_value):.1f}" y="{bar_y + bar_height + 32}" text-anchor="middle" fill="#666">'
+        f'base value = {base_value:.3f}</text>'
+    )
+    parts.append("</svg>")
+    return "".join(parts)
+
 class SepsisExplainer:
-    def __init__(self, model, feature_names: List[str]):
+    def __init__(self, model, feature_names: List[str], background_data: Optional[pd.DataFrame] = None):
         """
-        Initialize the explainer with a trained model and feature names
+        Initialize the explainer with a trained model and feature names;
+        background_data (e.g. training rows) is only used by the linear and kernel
+        explainers, which otherwise fall back to a single all-zero row
         """
         self.model = model
         self.feature_names = feature_names
+        self.background_data = background_data
         self.explainer = self._create_explainer()
+        self._cached_shap_values = lru_cache(maxsize=SHAP_CACHE_SIZE)(self._compute_shap_values)
     
     def _create_explainer(self):
         """
-        Create a SHAP explainer for the model
+        Create a SHAP explainer for the model: a tree explainer whenever SHAP can
+        walk the model's trees (on the GPU with USE_GPU_SHAP), then linear, then
+        the (slow) kernel explainer
         """
+        # Tree ensembles (XGBoost, LightGBM, scikit-learn forests/boosting) are
+        # detected by the explainers themselves, which raise for anything else
+        if settings.USE_GPU_SHAP:
+            if _gpu_tree_available():
+                try:
+                    # Takes the same numpy/DataFrame input; copies it to the device itself
+                    return shap.explainers.GPUTree(self.model)
+                except Exception as e:
+                    logger.debug("GPUTreeExplainer cannot explain {}: {}", type(self.model).__name__, e)
+            else:
+                logger.warning("USE_GPU_SHAP is set but shap was built without CUDA; using the CPU explainer")
+        if fasttreeshap is not None:
+            try:
+                return fasttreeshap.TreeExplainer(self.model, algorithm="auto", n_jobs=-1)
+            except Exception as e:
+                logger.debug("FastTreeSHAP cannot explain {}: {}", type(self.model).__name__, e)
         try:
-            # Create a background dataset for the explainer
-            # Use zeros as a simple default
-            background_data = pd.DataFrame(np.zeros((1, len(self.feature_names))), columns=self.feature_names)
-            
-            # Determine the type of model and create appropriate explainer
-            model_type = str(type(self.model).__name__).lower()
+            return shap.TreeExplainer(self.model)
+        except Exception as e:
+            logger.debug("TreeExplainer cannot explain {}: {}", type(self.model).__name__, e)
+        
+        try:
+            if self.background_data is not None:
+                background_data = self.background_data[self.feature_names]
+            else:
+                background_data = pd.DataFrame(np.zeros((1, len(self.feature_names))), columns=self.feature_names)
             
-            if "xgb" in model_type:
-                # XGBoost model
-                return shap.TreeExplainer(self.model)
-            elif "lightgbm" in model_type:
-                # LightGBM model
-                return shap.TreeExplainer(self.model)
-            elif "random" in model_type and "forest" in model_type:
-                # Random Forest model
-                return shap.TreeExplainer(self.model)
-            elif "linear" in model_type or "logistic" in model_type:
+            if hasattr(self.model, "coef_"):
                 # Linear/Logistic model
                 return shap.LinearExplainer(self.model, background_data)
-            else:
-                # Default to Kernel explainer for other models
-                # This is slower but works with any model
-                return shap.KernelExplainer(
-                    lambda x: self.model.predict_proba(x)[:, 1], 
-                    background_data
-                )
+            
+            # Default to Kernel explainer for other models
+            # This is slower but works with any model
+            if len(background_data) > KERNEL_BACKGROUND_SAMPLES:
+                background_data = shap.sample(background_data, KERNEL_BACKGROUND_SAMPLES)
+            return shap.KernelExplainer(
+                lambda x: self.model.predict_proba(x)[:, 1], 
+                background_data
+            )
         
         except Exception as e:
             logger.error(f"Failed to create explainer: {str(e)}")
             return None
     
+    def _compute_shap_values(self, columns: Tuple[str, ...], shape: Tuple[int, ...], data: bytes) -> Tuple[np.ndarray, Any]:
+        """
+        Positive-class SHAP values and base value of a feature frame given as
+        hashable parts
+        """
+        features_df = pd.DataFrame(np.frombuffer(data).reshape(shape), columns=list(columns))
+        shap_values = self.explainer.shap_values(features_df)
+        
+        # Handle different return types from different explainers
+        if isinstance(shap_values, list):
+            # For tree-based models, it returns a list with values for each class
+            shap_values = shap_values[1] if len(shap_values) > 1 else shap_values[0]
+        
+        shap_values = np.asarray(shap_values)
+        shap_values.setflags(write=False)
+        
+        # Get expected value (base value); read after shap_values(), which is
+        # where tree explainers settle it
+        if hasattr(self.explainer, 'expected_value'):
+            expected_value = self.explainer.expected_value
+            base_value = expected_value[1] if isinstance(expected_value, list) else expected_value
+        else:
+            base_value = 0.5  # Default for binary classification
+        return shap_values, base_value
+    
+    def _shap_values(self, features_df: pd.DataFrame) -> Tuple[np.ndarray, Any]:
+        """
+        Positive-class SHAP values and base value of features_df, memoized on its
+        contents
+        """
+        values = np.ascontiguousarray(features_df.to_numpy(dtype=np.float64))
+        return self._cached_shap_values(tuple(features_df.columns), values.shape, values.tobytes())
+    
     def explain_prediction(self, features_df: pd.DataFrame) -> Dict[str, Any]:
         """
         Generate explanation for a prediction
@@ -63,23 +262,7 @@ class SepsisExplainer:
         
         try:
             # Calculate SHAP values
-            shap_values = self.explainer.shap_values(features_df)
-            
-            # Handle different return types from different explainers
-            if isinstance(shap_values, list):
-                # For tree-based models, it returns a list with values for each class
-                values = shap_values[1] if len(shap_values) > 1 else shap_values[0]
-            else:
-                values = shap_values
-            
-            # Get expected value (base value)
-            if hasattr(self.explainer, 'expected_value'):
-                if isinstance(self.explainer.expected_value, list):
-                    base_value = self.explainer.expected_value[1]
-                else:
-                    base_value = self.explainer.expected_value
-            else:
-                base_value = 0.5  # Default for binary classification
+            values, base_value = self._shap_values(features_df)
             
             # Create explanation
             explanation = {
@@ -94,9 +277,10 @@ class SepsisExplainer:
             logger.error(f"Error generating explanation: {str(e)}")
             return {}
     
-    def generate_force_plot_image(self, features_df: pd.DataFrame) -> Optional[str]:
+    def generate_force_plot_image(self, features_df: pd.DataFrame, image_format: str = "svg") -> Optional[str]:
         """
-        Generate a SHAP force plot as a base64 encoded image
+        Generate a SHAP force plot as a base64 encoded image: SVG built directly
+        from the SHAP values, or image_format="png" for the matplotlib rendering
         """
         if self.explainer is None:
             logger.warning("No explainer available")
@@ -104,15 +288,9 @@ class SepsisExplainer:
         
         try:
             # Calculate SHAP values
-            shap_values = self.explainer.shap_values(features_df)
-            
-            # For tree-based models, it returns a list with values for each class
-            if isinstance(shap_values, list) and len(shap_values) > 1:
-                values = shap_values[1]  # Values for positive class
-                expected_value = self.explainer.expected_value[1]
-            else:
-                values = shap_values
-                expected_value = self.explainer.expected_value
+            values, expected_value = self._shap_values(features_df)
+            if image_format != "png":
+                return _svg_data_uri(_render_force_svg(float(expected_value), values[0], features_df.iloc[0]))
             
             # Create force plot
             plt.figure(figsize=(10, 3))
@@ -140,9 +318,10 @@ class SepsisExplainer:
             logger.error(f"Error generating force plot: {str(e)}")
             return None
     
-    def generate_waterfall_plot_image(self, features_df: pd.DataFrame) -> Optional[str]:
+    def generate_waterfall_plot_image(self, features_df: pd.DataFrame, image_format: str = "svg") -> Optional[str]:
         """
-        Generate a SHAP waterfall plot as a base64 encoded image
+        Generate a SHAP waterfall plot as a base64 encoded image: SVG built directly
+        from the SHAP values, or image_format="png" for the matplotlib rendering
         """
         if self.explainer is None:
             logger.warning("No explainer available")
@@ -150,18 +329,14 @@ class SepsisExplainer:
         
         try:
             # Calculate SHAP values
-            shap_values = self.explainer.shap_values(features_df)
-            
-            # Handle different return types from different explainers
-            if isinstance(shap_values, list) and len(shap_values) > 1:
-                values = shap_values[1]  # Values for positive class
-            else:
-                values = shap_values
+            values, expected_value = self._shap_values(features_df)
+            if image_format != "png":
+                return _svg_data_uri(_render_waterfall_svg(float(expected_value), values[0], features_df.iloc[0]))
             
             # Create waterfall plot
             plt.figure(figsize=(10, 6))
             shap.plots._waterfall.waterfall_legacy(
-                self.explainer.expected_value[1] if isinstance(self.explainer.expected_value, list) else self.explainer.expected_value,
+                expected_value,
                 values[0],
                 features_df.iloc[0],
                 show=False
@@ -185,10 +360,10 @@ class SepsisExplainer:
     
     def save_explainer(self, path: str) -> bool:
         """
-        Save the explainer to disk
+        Save the explainer to disk (tree tables written raw, see dump_with_buffers)
         """
         try:
-            joblib.dump(self.explainer, path)
+            dump_with_buffers(self.explainer, path)
             logger.info(f"Explainer saved to {path}")
             return True
         except Exception as e:
@@ -1,94 +1,94 @@
-from typing import Dict, List, Any, Optional
-import pandas as pd
+from typing import Dict, List, Any, Mapping, Optional, Sequence
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from loguru import logger
+from numba import njit
+
+# Most recent values taken from the latest record
+VITAL_FEATURES = (
+    "heart_rate",
+    "respiratory_rate",
+    "temperature",
+    "systolic_bp",
+    "diastolic_bp",
+    "oxygen_saturation",
+    "blood_glucose",
+    "wbc_count",
+    "platelet_count",
+    "lactate",
+    "creatinine",
+    "bilirubin",
+)
+
+# Parameters whose slope over the trend window becomes a "<name>_trend" feature
+TREND_FEATURES = (
+    "heart_rate",
+    "respiratory_rate",
+    "temperature",
+    "systolic_bp",
+    "wbc_count",
+    "lactate",
+)
+TREND_WINDOW_HOURS = 24.0
+
+# Clinical data columns extract_features_from_clinical_data reads (what callers
+# need to fetch)
+FEATURE_SOURCE_COLUMNS = ("timestamp",) + VITAL_FEATURES
+
+# Epochs for naive (taken as UTC) and aware timestamps
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_UTC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_HOUR = timedelta(hours=1)
+
+def _timestamp_hours(timestamp: Any) -> float:
+    """
+    Record timestamp as hours since the epoch (naive datetimes are taken as UTC),
+    NaN when missing
+    """
+    if timestamp is None:
+        return np.nan
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    # Timedelta arithmetic, without building a tz-aware copy of naive timestamps
+    return (timestamp - (_NAIVE_EPOCH if timestamp.tzinfo is None else _UTC_EPOCH)) / _ONE_HOUR
 
 def extract_features_from_clinical_data(
-    clinical_data_list: List[Dict[str, Any]]
+    clinical_data_list: Sequence[Mapping[str, Any]]
 ) -> Dict[str, Any]:
     """
-    Extract features from a list of clinical data records
+    Extract features from a list of clinical data records (dicts or DB row mappings)
     Prioritizes the most recent values but also calculates trends
     """
     if not clinical_data_list:
         logger.warning("No clinical data provided for feature extraction")
         return {}
     
-    # Sort clinical data by timestamp (most recent first)
-    sorted_data = sorted(
-        clinical_data_list, 
-        key=lambda x: x.get("timestamp", datetime.min), 
-        reverse=True
+    hours = np.fromiter(
+        (_timestamp_hours(record.get("timestamp")) for record in clinical_data_list),
+        dtype=np.float64, count=len(clinical_data_list)
     )
+    has_timestamp = ~np.isnan(hours)
     
-    # Get the most recent record
-    most_recent = sorted_data[0]
+    # Get the most recent record (the first one if none has a timestamp)
+    most_recent = clinical_data_list[int(np.nanargmax(hours)) if has_timestamp.any() else 0]
     
     # Initialize feature dictionary with the most recent values
-    features = {
-        "heart_rate": most_recent.get("heart_rate"),
-        "respiratory_rate": most_recent.get("respiratory_rate"),
-        "temperature": most_recent.get("temperature"),
-        "systolic_bp": most_recent.get("systolic_bp"),
-        "diastolic_bp": most_recent.get("diastolic_bp"),
-        "oxygen_saturation": most_recent.get("oxygen_saturation"),
-        "blood_glucose": most_recent.get("blood_glucose"),
-        "wbc_count": most_recent.get("wbc_count"),
-        "platelet_count": most_recent.get("platelet_count"),
-        "lactate": most_recent.get("lactate"),
-        "creatinine": most_recent.get("creatinine"),
-        "bilirubin": most_recent.get("bilirubin")
-    }
+    features = {feature: most_recent.get(feature) for feature in VITAL_FEATURES}
     
-    # Calculate trends if we have more than one record
-    if len(sorted_data) > 1:
-        # Convert to DataFrame for easier manipulation
-        df = pd.DataFrame(sorted_data)
-        
-        # Ensure timestamp is datetime type
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        
-        # Sort by timestamp (oldest first for trend calculation)
-        df = df.sort_values("timestamp")
-        
-        # Calculate trends for key vital signs using last 24 hours of data if available
-        now = df["timestamp"].max()
-        last_24h = now - timedelta(hours=24)
-        recent_df = df[df["timestamp"] >= last_24h]
-        
-        # Only calculate trends if we have multiple readings in the last 24 hours
-        if len(recent_df) > 1:
+    # Calculate trends using the last 24 hours of data, if there are multiple readings
+    if has_timestamp.sum() > 1:
+        recent = np.flatnonzero(hours >= np.nanmax(hours) - TREND_WINDOW_HOURS)
+        if len(recent) > 1:
             try:
-                # Heart rate trend
-                if not recent_df["heart_rate"].isna().all():
-                    hr_trend = calculate_trend(recent_df, "heart_rate")
-                    features["heart_rate_trend"] = hr_trend
-                
-                # Respiratory rate trend
-                if not recent_df["respiratory_rate"].isna().all():
-                    rr_trend = calculate_trend(recent_df, "respiratory_rate")
-                    features["respiratory_rate_trend"] = rr_trend
-                
-                # Temperature trend
-                if not recent_df["temperature"].isna().all():
-                    temp_trend = calculate_trend(recent_df, "temperature")
-                    features["temperature_trend"] = temp_trend
-                
-                # Blood pressure trends
-                if not recent_df["systolic_bp"].isna().all():
-                    sys_trend = calculate_trend(recent_df, "systolic_bp")
-                    features["systolic_bp_trend"] = sys_trend
-                
-                # Calculate WBC trend
-                if not recent_df["wbc_count"].isna().all():
-                    wbc_trend = calculate_trend(recent_df, "wbc_count")
-                    features["wbc_count_trend"] = wbc_trend
-                
-                # Calculate lactate trend
-                if not recent_df["lactate"].isna().all():
-                    lactate_trend = calculate_trend(recent_df, "lactate")
-                    features["lactate_trend"] = lactate_trend
+                values = np.array(
+                    [[clinical_data_list[i].get(feature) for feature in TREND_FEATURES] for i in recent],
+                    dtype=np.float64
+                )
+                trends = calculate_trends(hours[recent], values)
+                # Parameters never measured in the window get no trend feature
+                for feature, trend, measured in zip(TREND_FEATURES, trends, ~np.isnan(values).all(axis=0)):
+                    if measured:
+                        features[f"{feature}_trend"] = float(trend)
             except Exception as e:
                 logger.error(f"Error calculating trends: {str(e)}")
     
@@ -133,163 +133,51 @@ def extract_features_from_clinical_data(
     
     return features
 
-def calculate_trend(df: pd.DataFrame, column: str) -> float:
+# Compiled once at import (explicit signature) and cached on disk, so no request
+# pays the JIT. No fastmath: NaN checks mark the missing readings
+@njit("float64[:](float64[:], float64[:, :])", cache=True)
+def _trend_slopes(hours, values):
+    n_rows, n_columns = values.shape
+    origin = hours.min()
+    slopes = np.zeros(n_columns)
+    for column in range(n_columns):
+        count = 0
+        t_sum = 0.0
+        y_sum = 0.0
+        t_min = np.inf
+        t_max = -np.inf
+        for row in range(n_rows):
+            y = values[row, column]
+            if not np.isnan(y):
+                # Hours since the first reading keep the sums well conditioned
+                t = hours[row] - origin
+                count += 1
+                t_sum += t
+                y_sum += y
+                t_min = min(t_min, t)
+                t_max = max(t_max, t)
+        if count < 2 or t_max <= t_min:
+            continue
+        t_mean = t_sum / count
+        y_mean = y_sum / count
+        ty = 0.0
+        tt = 0.0
+        for row in range(n_rows):
+            y = values[row, column]
+            if not np.isnan(y):
+                t_centered = hours[row] - origin - t_mean
+                ty += t_centered * (y - y_mean)
+                tt += t_centered * t_centered
+        slopes[column] = ty / tt
+    return slopes
+
+def calculate_trends(hours: np.ndarray, values: np.ndarray) -> np.ndarray:
     """
-    Calculate the trend (slope) of a clinical parameter over time
-    Returns positive value for increasing trend, negative for decreasing
+    Least-squares slope (units per hour) of every column of `values` against
+    `hours`, in one pass; readings with a NaN value are left out per column.
+    Returns positive values for increasing trends, negative for decreasing and
+    0.0 where fewer than two readings, or only one distinct time, remain
     """
-    # Drop NaN
-    from typing import Dict, List, Any, Optional, Tuple
-from loguru import logger
-from datetime import datetime
-import os
-
-from app.ml.model import SepsisModel
-from app.ml.feature_engineering import extract_features_from_clinical_data
-
-class SepsisPredictor:
-    def __init__(self):
-        self.model = SepsisModel()
-        logger.info("Initialized SepsisPredictor")
-    
-    async def predict_sepsis_risk(
-        self, clinical_data_list: List[Dict[str, Any]]
-    ) -> Dict[str, Any]:
-        """
-        Process clinical data and predict sepsis risk
-        """
-        try:
-            # Extract features from clinical data
-            features = extract_features_from_clinical_data(clinical_data_list)
-            logger.info(f"Extracted {len(features)} features for prediction")
-            
-            # Make prediction
-            prediction_result = self.model.predict(features)
-            logger.info(f"Prediction complete: risk={prediction_result['is_sepsis_risk']}, probability={prediction_result['probability']:.4f}")
-            
-            return prediction_result
-        
-        except Exception as e:
-            logger.error(f"Error during sepsis prediction: {str(e)}")
-            # Return safe default prediction
-            return {
-                "probability": 0.1,
-                "is_sepsis_risk": False,
-                "features_used": features if 'features' in locals() else {},
-                "model_version": self.model.model_version,
-                "explanation": None
-            }
-    
-    def get_risk_factors(self, prediction_result: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """
-        Extract risk factors from prediction explanation
-        """
-        risk_factors = []
-        try:
-            # Check if we have explanation data
-            if not prediction_result.get("explanation"):
-                return risk_factors
-            
-            explanation = prediction_result["explanation"]
-            features = explanation.get("features", [])
-            shap_values = explanation.get("shap_values", [])
-            
-            # Sort features by absolute SHAP value (impact on prediction)
-            feature_impacts = [(features[i], shap_values[i]) for i in range(len(features))]
-            feature_impacts.sort(key=lambda x: abs(x[1]), reverse=True)
-            
-            # Get top risk factors (both positive and negative impact)
-            for feature_name, shap_value in feature_impacts:
-                # Get the actual feature value
-                feature_value = prediction_result.get("features_used", {}).get(feature_name)
-                if feature_value is None:
-                    continue
-                
-                # Determine if this is a risk factor (positive SHAP value) or protective factor
-                impact_type = "risk_factor" if shap_value > 0 else "protective_factor"
-                
-                # Calculate relative contribution percentage
-                total_impact = sum(abs(val) for val in shap_values)
-                contribution_pct = (abs(shap_value) / total_impact * 100) if total_impact > 0 else 0
-                
-                risk_factors.append({
-                    "feature_name": feature_name,
-                    "value": feature_value,
-                    "impact": shap_value,
-                    "impact_type": impact_type,
-                    "contribution_pct": contribution_pct
-                })
-            
-            return risk_factors
-        
-        except Exception as e:
-            logger.error(f"Error extracting risk factors: {str(e)}")
-            return []
-    
-    def get_alert_details(
-        self, 
-        prediction_result: Dict[str, Any], 
-        patient_data: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        """
-        Generate alert details based on prediction result
-        """
-        try:
-            probability = prediction_result.get("probability", 0)
-            is_sepsis_risk = prediction_result.get("is_sepsis_risk", False)
-            
-            # Determine severity level based on probability
-            if probability >= 0.8:
-                severity = 5  # Critical
-                alert_type = "CRITICAL_SEPSIS_RISK"
-            elif probability >= 0.6:
-                severity = 4  # High
-                alert_type = "HIGH_SEPSIS_RISK"
-            elif probability >= 0.5:
-                severity = 3  # Medium
-                alert_type = "MEDIUM_SEPSIS_RISK"
-            elif probability >= 0.3:
-                severity = 2  # Low
-                alert_type = "LOW_SEPSIS_RISK"
-            else:
-                severity = 1  # Minimal
-                alert_type = "MINIMAL_RISK"
-            
-            # Generate alert message
-            patient_name = ""
-            if patient_data:
-                patient_name = f"{patient_data.get('first_name', '')} {patient_data.get('last_name', '')}".strip()
-            
-            if is_sepsis_risk:
-                if patient_name:
-                    message = f"SEPSIS ALERT: Patient {patient_name} has a {probability:.1%} probability of developing sepsis. Immediate assessment recommended."
-                else:
-                    message = f"SEPSIS ALERT: Patient has a {probability:.1%} probability of developing sepsis. Immediate assessment recommended."
-            else:
-                if patient_name:
-                    message = f"Patient {patient_name} has a {probability:.1%} probability of developing sepsis. Regular monitoring advised."
-                else:
-                    message = f"Patient has a {probability:.1%} probability of developing sepsis. Regular monitoring advised."
-            
-            # Get risk factors
-            risk_factors = self.get_risk_factors(prediction_result)
-            
-            return {
-                "alert_type": alert_type,
-                "severity": severity,
-                "message": message,
-                "is_sepsis_risk": is_sepsis_risk,
-                "probability": probability,
-                "risk_factors": risk_factors
-            }
-        
-        except Exception as e:
-            logger.error(f"Error generating alert details: {str(e)}")
-            return {
-                "alert_type": "SYSTEM_ERROR",
-                "severity": 3,
-                "message": "Error generating sepsis risk assessment. Please check the patient data manually.",
-                "is_sepsis_risk": False,
-                "probability": 0.0,
-                "risk_factors": []
-            }
\ No newline at end of file
+    return _trend_slopes(
+        np.ascontiguousarray(hours, dtype=np.float64), np.ascontiguousarray(values, dtype=np.float64)
+    )
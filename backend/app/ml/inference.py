@@ -0,0 +1,178 @@
+from typing import Dict, List, Any, Optional, Tuple
+from loguru import logger
+from datetime import datetime
+import asyncio
+from bisect import bisect_right
+import os
+import numpy as np
+
+from app.ml.model import SepsisModel
+from app.ml.feature_engineering import extract_features_from_clinical_data
+
+# Lower probability bound of each severity level above minimal, ascending
+_SEVERITY_THRESHOLDS = (0.3, 0.5, 0.6, 0.8)
+# (severity, alert type) for each interval between the thresholds
+_SEVERITY_LEVELS = (
+    (1, "MINIMAL_RISK"),  # Minimal
+    (2, "LOW_SEPSIS_RISK"),  # Low
+    (3, "MEDIUM_SEPSIS_RISK"),  # Medium
+    (4, "HIGH_SEPSIS_RISK"),  # High
+    (5, "CRITICAL_SEPSIS_RISK"),  # Critical
+)
+
+# Alert message templates keyed by (is_sepsis_risk, has patient name)
+_ALERT_MESSAGES = {
+    (True, True): "SEPSIS ALERT: Patient {name} has a {probability:.1%} probability of developing sepsis. Immediate assessment recommended.",
+    (True, False): "SEPSIS ALERT: Patient has a {probability:.1%} probability of developing sepsis. Immediate assessment recommended.",
+    (False, True): "Patient {name} has a {probability:.1%} probability of developing sepsis. Regular monitoring advised.",
+    (False, False): "Patient has a {probability:.1%} probability of developing sepsis. Regular monitoring advised.",
+}
+
+class SepsisPredictor:
+    def __init__(self):
+        self.model = SepsisModel()
+        logger.info("Initialized SepsisPredictor")
+    
+    async def predict_sepsis_risk(
+        self, clinical_data_list: List[Dict[str, Any]], explain: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Process clinical data and predict sepsis risk
+        """
+        try:
+            # Feature extraction and model/SHAP calls are CPU-bound; run them in a
+            # worker thread so the event loop keeps serving other requests
+            features = await asyncio.to_thread(extract_features_from_clinical_data, clinical_data_list)
+            logger.info(f"Extracted {len(features)} features for prediction")
+            
+            # Make prediction
+            prediction_result = await asyncio.to_thread(self.model.predict, features, explain=explain)
+            logger.info(f"Prediction complete: risk={prediction_result['is_sepsis_risk']}, probability={prediction_result['probability']:.4f}")
+            
+            return prediction_result
+        
+        except Exception as e:
+            logger.error(f"Error during sepsis prediction: {str(e)}")
+            # Return safe default prediction
+            return {
+                "probability": 0.1,
+                "is_sepsis_risk": False,
+                "features_used": features if 'features' in locals() else {},
+                "model_version": self.model.model_version,
+                "explanation": None
+            }
+    
+    async def predict_sepsis_risk_batch(
+        self, clinical_data_lists: List[List[Dict[str, Any]]], explain: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Predict sepsis risk for several patients (one clinical data list each)
+        with a single vectorized model call
+        """
+        prediction_results = await asyncio.to_thread(self._predict_batch, clinical_data_lists, explain)
+        logger.info(f"Batch prediction complete for {len(prediction_results)} patients")
+        return prediction_results
+    
+    def _predict_batch(self, clinical_data_lists: List[List[Dict[str, Any]]], explain: bool = True) -> List[Dict[str, Any]]:
+        """
+        Blocking part of predict_sepsis_risk_batch (runs in a worker thread)
+        """
+        features_list = [
+            extract_features_from_clinical_data(clinical_data_list)
+            for clinical_data_list in clinical_data_lists
+        ]
+        return self.model.predict_batch(features_list, explain=explain)
+    
+    def get_risk_factors(self, prediction_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Extract risk factors from prediction explanation
+        """
+        risk_factors = []
+        try:
+            # Check if we have explanation data
+            if not prediction_result.get("explanation"):
+                return risk_factors
+            
+            explanation = prediction_result["explanation"]
+            features = explanation.get("features", [])
+            shap_values = explanation.get("shap_values", [])
+            
+            # Sort features by absolute SHAP value (impact on prediction); the
+            # stable sort keeps ties in feature order
+            impacts = np.asarray(shap_values, dtype=np.float64)
+            abs_impacts = np.abs(impacts)
+            order = np.argsort(-abs_impacts[:len(features)], kind="stable")
+            
+            # Relative contribution percentage of each feature
+            total_impact = abs_impacts.sum()
+            contribution_pcts = abs_impacts[order] / total_impact * 100 if total_impact > 0 else np.zeros(len(order))
+            
+            # Get top risk factors (both positive and negative impact)
+            features_used = prediction_result.get("features_used", {})
+            for i, shap_value, contribution_pct in zip(order.tolist(), impacts[order].tolist(), contribution_pcts.tolist()):
+                # Get the actual feature value
+                feature_name = features[i]
+                feature_value = features_used.get(feature_name)
+                if feature_value is None:
+                    continue
+                
+                risk_factors.append({
+                    "feature_name": feature_name,
+                    "value": feature_value,
+                    "impact": shap_value,
+                    # Positive SHAP values raise the risk, negative ones lower it
+                    "impact_type": "risk_factor" if shap_value > 0 else "protective_factor",
+                    "contribution_pct": contribution_pct
+                })
+            
+            return risk_factors
+        
+        except Exception as e:
+            logger.error(f"Error extracting risk factors: {str(e)}")
+            return []
+    
+    def get_alert_details(
+        self, 
+        prediction_result: Dict[str, Any], 
+        patient_data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate alert details based on prediction result
+        """
+        try:
+            probability = prediction_result.get("probability", 0)
+            is_sepsis_risk = prediction_result.get("is_sepsis_risk", False)
+            
+            # Determine severity level based on probability
+            severity, alert_type = _SEVERITY_LEVELS[bisect_right(_SEVERITY_THRESHOLDS, probability)]
+            
+            # Generate alert message
+            patient_name = ""
+            if patient_data:
+                patient_name = f"{patient_data.get('first_name', '')} {patient_data.get('last_name', '')}".strip()
+            message = _ALERT_MESSAGES[(bool(is_sepsis_risk), bool(patient_name))].format(
+                name=patient_name, probability=probability
+            )
+            
+            # Get risk factors
+            risk_factors = self.get_risk_factors(prediction_result)
+            
+            return {
+                "alert_type": alert_type,
+                "severity": severity,
+                "message": message,
+                "is_sepsis_risk": is_sepsis_risk,
+                "probability": probability,
+                "risk_factors": risk_factors
+            }
+        
+        except Exception as e:
+            logger.error(f"Error generating alert details: {str(e)}")
+            return {
+                "alert_type": "SYSTEM_ERROR",
+                "severity": 3,
+                "message": "Error generating sepsis risk assessment. Please check the patient data manually.",
+                "is_sepsis_risk": False,
+                "probability": 0.0,
+                "risk_factors": []
+            }
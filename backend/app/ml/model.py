@@ -1,15 +1,216 @@
 import pickle
-import json
+from functools import lru_cache
+import orjson
 import numpy as np
-import pandas as pd
 from typing import Dict, List, Any, Tuple, Optional
 from loguru import logger
 import shap
 import joblib
+import xgboost
 from pathlib import Path
 import os
 
 from app.core.config import settings
+from app.ml.serialization import load_object
+
+# Feature matrices whose SHAP values SepsisModel keeps
+SHAP_CACHE_SIZE = 128
+
+# Optional: tree ensembles compiled to a native library by app.ml.compile_model
+try:
+    import tl2cgen
+except ImportError:
+    tl2cgen = None
+
+# Random predictions DummyModel draws up front and hands out in slices
+DUMMY_POOL_SIZE = 4096
+
+# MODEL_PATH suffixes loaded with XGBoost instead of joblib (model.save_model("m.ubj"))
+XGBOOST_MODEL_SUFFIXES = (".ubj", ".json")
+
+class CompiledTreeModel:
+    """
+    predict_proba for a tree ensemble compiled with tl2cgen (a .so MODEL_PATH)
+    """
+    def __init__(self, libpath: str):
+        if tl2cgen is None:
+            raise ImportError("tl2cgen is required to load a compiled model")
+        self.predictor = tl2cgen.Predictor(libpath)
+        # Inputs must match the dtype the trees were compiled with
+        self.dtype = np.dtype(self.predictor.threshold_type)
+    
+    def predict_proba(self, X) -> np.ndarray:
+        features = np.ascontiguousarray(X, dtype=self.dtype)
+        scores = self.predictor.predict(tl2cgen.DMatrix(features)).reshape(len(features), -1)
+        if scores.shape[1] == 1:
+            # Binary objectives (e.g. XGBoost binary:logistic) only output P(positive)
+            return np.column_stack((1.0 - scores[:, 0], scores[:, 0]))
+        return scores
+
+def _pickled_model_path(model_path: str) -> str:
+    """
+    The joblib model: MODEL_PATH itself, or the .pkl next to a compiled .so or
+    native XGBoost model (loaded when those cannot be)
+    """
+    path = Path(model_path)
+    if path.suffix == ".so" or path.suffix in XGBOOST_MODEL_SUFFIXES:
+        return str(path.with_suffix(".pkl"))
+    return model_path
+
+class DummyModel:
+    """
+    Fallback model with a predict_proba that returns random predictions, sliced
+    from a pool drawn once (no allocation per call)
+    """
+    def __init__(self, pool_size: int = DUMMY_POOL_SIZE):
+        # Random probabilities with bias toward negative class
+        rng = np.random.default_rng()
+        self._pool = np.column_stack((
+            rng.uniform(0.7, 0.99, pool_size),  # Negative class
+            rng.uniform(0.01, 0.3, pool_size)   # Positive class
+        ))
+        self._pool.setflags(write=False)
+        self._next = 0
+    
+    def predict_proba(self, X):
+        n_samples = X.shape[0]
+        if n_samples > len(self._pool):
+            # Larger than the pool: draw this batch directly
+            return np.hstack([
+                np.random.uniform(0.7, 0.99, (n_samples, 1)),
+                np.random.uniform(0.01, 0.3, (n_samples, 1))
+            ])
+        start = self._next if self._next + n_samples <= len(self._pool) else 0
+        self._next = start + n_samples
+        return self._pool[start:self._next]
+
+def _create_dummy_model(model_path: str):
+    """
+    Create a dummy model for fallback when loading fails
+    """
+    # Create dummy model
+    model = DummyModel()
+    
+    # Save the dummy model, unless there is a model file that failed to load
+    # (it must not be replaced, or have a dummy put next to it)
+    pickled_model_path = _pickled_model_path(model_path)
+    if not Path(model_path).exists() and not Path(pickled_model_path).exists():
+        model_dir = Path(model_path).parent
+        model_dir.mkdir(parents=True, exist_ok=True)
+        joblib.dump(model, pickled_model_path)
+    
+    return model
+
+def _create_dummy_feature_config(feature_config_path: str):
+    """
+    Create a dummy feature configuration for fallback
+    """
+    feature_config = {
+        "features": [
+            "heart_rate",
+            "respiratory_rate",
+            "temperature",
+            "systolic_bp",
+            "diastolic_bp",
+            "oxygen_saturation",
+            "blood_glucose",
+            "wbc_count",
+            "platelet_count",
+            "lactate",
+            "creatinine",
+            "bilirubin"
+        ],
+        "default_values": {
+            "heart_rate": 75.0,
+            "respiratory_rate": 16.0,
+            "temperature": 37.0,
+            "systolic_bp": 120.0,
+            "diastolic_bp": 80.0,
+            "oxygen_saturation": 98.0,
+            "blood_glucose": 100.0,
+            "wbc_count": 7.0,
+            "platelet_count": 250.0,
+            "lactate": 1.0,
+            "creatinine": 1.0,
+            "bilirubin": 0.6
+        },
+        "threshold": 0.5
+    }
+    
+    # Save the dummy feature config
+    config_dir = Path(feature_config_path).parent
+    config_dir.mkdir(parents=True, exist_ok=True)
+    with open(feature_config_path, 'wb') as f:
+        f.write(orjson.dumps(feature_config, option=orjson.OPT_INDENT_2))
+    
+    return feature_config
+
+# The loaders below run once per process; every SepsisModel shares their result.
+# load_object maps the file's arrays read-only (save_explainer's format, or an
+# uncompressed joblib pickle), so workers loading the same file share those
+# pages through the OS page cache
+
+@lru_cache(maxsize=1)
+def _load_model(model_path: str):
+    """
+    Load the trained model, preferring a compiled one when MODEL_PATH is a .so
+    and XGBoost's loader for .ubj/.json models
+    """
+    suffix = Path(model_path).suffix
+    if suffix == ".so":
+        try:
+            model = CompiledTreeModel(model_path)
+            logger.info(f"Successfully loaded compiled model from {model_path}")
+            return model
+        except Exception as e:
+            logger.error(f"Failed to load compiled model: {str(e)}")
+    elif suffix in XGBOOST_MODEL_SUFFIXES:
+        try:
+            model = xgboost.XGBClassifier()
+            model.load_model(model_path)
+            logger.info(f"Successfully loaded XGBoost model from {model_path}")
+            return model
+        except Exception as e:
+            logger.error(f"Failed to load XGBoost model: {str(e)}")
+    
+    pickled_model_path = _pickled_model_path(model_path)
+    try:
+        model = load_object(pickled_model_path)
+        logger.info(f"Successfully loaded model from {pickled_model_path}")
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load model: {str(e)}")
+        # Create a dummy model for fallback
+        logger.warning("Creating a fallback dummy model")
+        return _create_dummy_model(model_path)
+
+@lru_cache(maxsize=1)
+def _load_explainer(explainer_path: str):
+    """
+    Load the SHAP explainer
+    """
+    try:
+        explainer = load_object(explainer_path)
+        logger.info(f"Successfully loaded explainer from {explainer_path}")
+        return explainer
+    except Exception as e:
+        logger.error(f"Failed to load explainer: {str(e)}")
+        return None
+
+@lru_cache(maxsize=1)
+def _load_feature_config(feature_config_path: str):
+    """
+    Load the feature configuration
+    """
+    try:
+        with open(feature_config_path, 'rb') as f:
+            feature_config = orjson.loads(f.read())
+        logger.info(f"Successfully loaded feature config from {feature_config_path}")
+        return feature_config
+    except Exception as e:
+        logger.error(f"Failed to load feature config: {str(e)}")
+        # Create a dummy feature config for fallback
+        return _create_dummy_feature_config(feature_config_path)
 
 class SepsisModel:
     def __init__(
@@ -21,201 +222,143 @@ class SepsisModel:
         self.model_path = model_path
         self.explainer_path = explainer_path
         self.feature_config_path = feature_config_path
-        self.model = self._load_model()
-        self.explainer = self._load_explainer()
-        self.feature_config = self._load_feature_config()
+        # Process-wide singletons, loaded by the first instance
+        self.model = _load_model(model_path)
+        self.explainer = _load_explainer(explainer_path)
+        # SHAP values of recently explained feature matrices (repeat predictions
+        # on unchanged clinical data skip the tree traversal)
+        self._cached_shap_values = lru_cache(maxsize=SHAP_CACHE_SIZE)(self._compute_shap_values)
+        self.feature_config = _load_feature_config(feature_config_path)
+        self._init_feature_vector()
         self.model_version = "1.0.0"  # This should be read from the model metadata
     
-    def _load_model(self):
+    def _init_feature_vector(self):
         """
-        Load the trained model
+        Precompute each feature's column and the vector of default values, so rows
+        are filled in place instead of going through a pandas DataFrame
         """
-        try:
-            model = joblib.load(self.model_path)
-            logger.info(f"Successfully loaded model from {self.model_path}")
-            return model
-        except Exception as e:
-            logger.error(f"Failed to load model: {str(e)}")
-            # Create a dummy model for fallback
-            logger.warning("Creating a fallback dummy model")
-            return self._create_dummy_model()
+        features = self.feature_config["features"]
+        defaults = self.feature_config["default_values"]
+        self.feature_names = list(features)
+        self._feature_index = {feature: i for i, feature in enumerate(features)}
+        self._default_vector = np.array([defaults.get(feature, 0.0) for feature in features], dtype=np.float64)
     
-    def _load_explainer(self):
+    def prepare_features(self, clinical_data: Dict[str, Any]) -> np.ndarray:
         """
-        Load the SHAP explainer
+        Extract and prepare features from clinical data for model prediction
         """
-        try:
-            explainer = joblib.load(self.explainer_path)
-            logger.info(f"Successfully loaded explainer from {self.explainer_path}")
-            return explainer
-        except Exception as e:
-            logger.error(f"Failed to load explainer: {str(e)}")
-            return None
+        # A (1, n_features) matrix
+        return self.prepare_feature_matrix([clinical_data])
     
-    def _load_feature_config(self):
+    def prepare_feature_matrix(self, clinical_data_list: List[Dict[str, Any]]) -> np.ndarray:
         """
-        Load the feature configuration
+        Stack the features of several patients into one matrix, one row per patient
+        (columns in feature_names order), using defaults for missing values
         """
-        try:
-            with open(self.feature_config_path, 'r') as f:
-                feature_config = json.load(f)
-            logger.info(f"Successfully loaded feature config from {self.feature_config_path}")
-            return feature_config
-        except Exception as e:
-            logger.error(f"Failed to load feature config: {str(e)}")
-            # Create a dummy feature config for fallback
-            return self._create_dummy_feature_config()
-    
-    def _create_dummy_model(self):
-        """
-        Create a dummy model for fallback when loading fails
-        """
-        # Simple class with predict_proba method that returns random predictions
-        class DummyModel:
-            def predict_proba(self, X):
-                n_samples = X.shape[0]
-                # Return random probabilities with bias toward negative class
-                return np.hstack([
-                    np.random.uniform(0.7, 0.99, (n_samples, 1)),  # Negative class
-                    np.random.uniform(0.01, 0.3, (n_samples, 1))   # Positive class
-                ])
-        
-        # Create dummy model
-        model = DummyModel()
-        
-        # Save the dummy model
-        model_dir = Path(self.model_path).parent
-        model_dir.mkdir(parents=True, exist_ok=True)
-        joblib.dump(model, self.model_path)
-        
-        return model
+        matrix = np.tile(self._default_vector, (len(clinical_data_list), 1))
+        feature_index = self._feature_index
+        for row, clinical_data in zip(matrix, clinical_data_list):
+            for feature, value in clinical_data.items():
+                column = feature_index.get(feature)
+                if column is not None and value is not None:
+                    row[column] = value
+        return matrix
     
-    def _create_dummy_feature_config(self):
-        """
-        Create a dummy feature configuration for fallback
-        """
-        feature_config = {
-            "features": [
-                "heart_rate",
-                "respiratory_rate",
-                "temperature",
-                "systolic_bp",
-                "diastolic_bp",
-                "oxygen_saturation",
-                "blood_glucose",
-                "wbc_count",
-                "platelet_count",
-                "lactate",
-                "creatinine",
-                "bilirubin"
-            ],
-            "default_values": {
-                "heart_rate": 75.0,
-                "respiratory_rate": 16.0,
-                "temperature": 37.0,
-                "systolic_bp": 120.0,
-                "diastolic_bp": 80.0,
-                "oxygen_saturation": 98.0,
-                "blood_glucose": 100.0,
-                "wbc_count": 7.0,
-                "platelet_count": 250.0,
-                "lactate": 1.0,
-                "creatinine": 1.0,
-                "bilirubin": 0.6
-            },
-            "threshold": 0.5
+    def _fallback_prediction(self) -> Dict[str, Any]:
+        """
+        Safe default returned when the model cannot produce a prediction
+        """
+        return {
+            "probability": 0.1,  # Low probability as a safe default
+            "is_sepsis_risk": False,
+            "features_used": {},
+            "model_version": self.model_version,
+            "explanation": None
         }
+    
+    def _compute_shap_values(self, shape: Tuple[int, ...], data: bytes) -> Tuple[np.ndarray, float]:
+        """
+        Positive-class SHAP values and base value of a float64 feature matrix
+        given as raw bytes (hashable, so results can be memoized)
+        """
+        shap_values = self.explainer.shap_values(np.frombuffer(data).reshape(shape))
         
-        # Save the dummy feature config
-        config_dir = Path(self.feature_config_path).parent
-        config_dir.mkdir(parents=True, exist_ok=True)
-        with open(self.feature_config_path, 'w') as f:
-            json.dump(feature_config, f, indent=2)
+        # If SHAP returns a list (e.g., for tree models), take the values for positive class
+        if isinstance(shap_values, list):
+            shap_values = shap_values[1]  # Values for positive class
+        shap_values = np.asarray(shap_values)
+        shap_values.setflags(write=False)
         
-        return feature_config
+        # Read after shap_values(): tree explainers only settle expected_value there
+        expected_value = self.explainer.expected_value
+        base_value = float(expected_value) if not isinstance(expected_value, list) else float(expected_value[1])
+        return shap_values, base_value
     
-    def prepare_features(self, clinical_data: Dict[str, Any]) -> pd.DataFrame:
+    def _explain(self, features: np.ndarray) -> List[Optional[Dict[str, Any]]]:
         """
-        Extract and prepare features from clinical data for model prediction
+        SHAP explanations for every row of the feature matrix, computed in one call
         """
-        # Get the list of features used by the model
-        features = self.feature_config["features"]
-        
-        # Extract values for each feature, use default if missing
-        feature_values = {}
-        for feature in features:
-            # Get value from clinical data, use default if not available
-            value = clinical_data.get(feature)
-            if value is None:
-                value = self.feature_config["default_values"].get(feature, 0.0)
+        if not self.explainer:
+            return [None] * len(features)
+        try:
+            # Calculate SHAP values
+            shap_values, base_value = self._cached_shap_values(features.shape, features.tobytes())
             
-            feature_values[feature] = value
-        
-        # Create a pandas DataFrame with a single row
-        df = pd.DataFrame([feature_values])
-        
-        return df
+            # Create explanation with feature names and their SHAP values
+            feature_names = self.feature_names
+            return [
+                {
+                    "features": feature_names,
+                    "shap_values": row,
+                    "base_value": base_value
+                }
+                # One conversion of the whole (patients, features) matrix
+                for row in shap_values.tolist()
+            ]
+        except Exception as e:
+            logger.error(f"Failed to generate SHAP explanation: {str(e)}")
+            return [None] * len(features)
     
-    def predict(self, clinical_data: Dict[str, Any]) -> Dict[str, Any]:
+    def predict(self, clinical_data: Dict[str, Any], explain: bool = True) -> Dict[str, Any]:
         """
         Make sepsis prediction using the loaded model
         """
+        return self.predict_batch([clinical_data], explain=explain)[0]
+    
+    def predict_batch(self, clinical_data_list: List[Dict[str, Any]], explain: bool = True) -> List[Dict[str, Any]]:
+        """
+        Make sepsis predictions for several patients with a single model call;
+        explain=False skips SHAP (the explanation is then None)
+        """
+        if not clinical_data_list:
+            return []
         try:
             # Prepare features for prediction
-            features_df = self.prepare_features(clinical_data)
+            features = self.prepare_feature_matrix(clinical_data_list)
             
-            # Make prediction
-            probabilities = self.model.predict_proba(features_df)
-            sepsis_probability = float(probabilities[0, 1])  # Probability of sepsis (positive class)
+            # Make prediction; column 1 is the probability of sepsis (positive class)
+            sepsis_probabilities = self.model.predict_proba(features)[:, 1]
             
-            # Determine if patient is at risk based on threshold
+            # Determine if patients are at risk based on threshold
             threshold = self.feature_config.get("threshold", 0.5)
-            is_sepsis_risk = sepsis_probability >= threshold
-            
-            # Generate explanation if explainer is available
-            explanation = None
-            if self.explainer:
-                try:
-                    # Calculate SHAP values
-                    shap_values = self.explainer.shap_values(features_df)
-                    
-                    # If SHAP returns a list (e.g., for tree models), take the values for positive class
-                    if isinstance(shap_values, list):
-                        shap_values = shap_values[1]  # Values for positive class
-                    
-                    # Convert to list for JSON serialization
-                    shapley_values = shap_values[0].tolist()
-                    
-                    # Create explanation with feature names and their SHAP values
-                    feature_names = list(features_df.columns)
-                    explanation = {
-                        "features": feature_names,
-                        "shap_values": shapley_values,
-                        "base_value": float(self.explainer.expected_value) 
-                            if not isinstance(self.explainer.expected_value, list) 
-                            else float(self.explainer.expected_value[1])
-                    }
-                except Exception as e:
-                    logger.error(f"Failed to generate SHAP explanation: {str(e)}")
-                    explanation = None
+            explanations = self._explain(features) if explain else [None] * len(features)
             
             # Return prediction results
-            result = {
-                "probability": sepsis_probability,
-                "is_sepsis_risk": is_sepsis_risk,
-                "features_used": features_df.to_dict(orient="records")[0],
-                "model_version": self.model_version,
-                "explanation": explanation
-            }
-            
-            return result
+            return [
+                {
+                    "probability": float(probability),
+                    "is_sepsis_risk": bool(probability >= threshold),
+                    "features_used": features_used,
+                    "model_version": self.model_version,
+                    "explanation": explanation
+                }
+                for probability, features_used, explanation in zip(
+                    sepsis_probabilities,
+                    [dict(zip(self.feature_names, row)) for row in features.tolist()],
+                    explanations
+                )
+            ]
         except Exception as e:
             logger.error(f"Error during prediction: {str(e)}")
             # Return a fallback prediction
-            return {
-                "probability": 0.1,  # Low probability as a safe default
-                "is_sepsis_risk": False,
-                "features_used": {},
-                "model_version": self.model_version,
-                "explanation": None
-            }
\ No newline at end of file
+            return [self._fallback_prediction() for _ in clinical_data_list]
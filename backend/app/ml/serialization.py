@@ -0,0 +1,60 @@
+import mmap
+import pickle
+from typing import Any, List
+import joblib
+
+# First bytes of a file written by dump_with_buffers
+BUFFERED_PICKLE_MAGIC = b"SEPSIS-PICKLE5\n"
+# Raw buffers start on this boundary, so arrays mapped from the file are aligned
+BUFFER_ALIGNMENT = 64
+
+def _align(offset: int) -> int:
+    return -(-offset // BUFFER_ALIGNMENT) * BUFFER_ALIGNMENT
+
+def dump_with_buffers(obj: Any, path: str) -> None:
+    """
+    Pickle obj with protocol 5, writing the ndarray buffers out-of-band as raw
+    bytes after the pickle stream. Layout: magic, a small pickled header
+    (stream size, buffer sizes), the pickle stream, then each buffer aligned
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    with open(path, "wb") as f:
+        f.write(BUFFERED_PICKLE_MAGIC)
+        pickle.dump((len(data), [raw.nbytes for raw in raws]), f, protocol=5)
+        f.write(data)
+        for raw in raws:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(raw)
+
+def load_with_buffers(path: str) -> Any:
+    """
+    Load a dump_with_buffers file; arrays are read-only views of one mmap of
+    the file (no copy, pages shared by every process mapping it)
+    """
+    with open(path, "rb") as f:
+        if f.read(len(BUFFERED_PICKLE_MAGIC)) != BUFFERED_PICKLE_MAGIC:
+            raise ValueError(f"{path} was not written by dump_with_buffers")
+        data_size, buffer_sizes = pickle.load(f)
+        offset = f.tell()
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    data = view[offset:offset + data_size]
+    offset += data_size
+    buffers = []
+    for size in buffer_sizes:
+        offset = _align(offset)
+        buffers.append(view[offset:offset + size])
+        offset += size
+    return pickle.loads(data, buffers=buffers)
+
+def load_object(path: str) -> Any:
+    """
+    Load a dump_with_buffers file, or a joblib pickle (arrays memory-mapped)
+    """
+    with open(path, "rb") as f:
+        buffered = f.read(len(BUFFERED_PICKLE_MAGIC)) == BUFFERED_PICKLE_MAGIC
+    if buffered:
+        return load_with_buffers(path)
+    return joblib.load(path, mmap_mode="r")
@@ -1,9 +1,9 @@
 from typing import Dict, List, Any, Optional
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import aioredis
-import json
+import aiosmtplib
+import orjson
 from loguru import logger
 import asyncio
 from datetime import datetime
@@ -11,20 +11,87 @@ from datetime import datetime
 from app.core.config import settings
 from app.db.models import Alert, User
 
+# Alert email body; format_map fills in the placeholders (CSS braces are doubled)
+_EMAIL_HTML_TEMPLATE = """
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background-color: #003366; color: white; padding: 10px; text-align: center; }}
+                .alert-box {{ border: 2px solid {severity_color}; padding: 15px; margin-top: 20px; }}
+                .alert-title {{ color: {severity_color}; font-weight: bold; font-size: 18px; }}
+                .patient-info {{ background-color: #f0f0f0; padding: 10px; margin-top: 20px; }}
+                .footer {{ margin-top: 30px; font-size: 12px; color: #666; text-align: center; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>Sepsis Alert Notification</h1>
+                </div>
+                <div class="alert-box">
+                    <div class="alert-title">{alert_title}</div>
+                    <p>{message}</p>
+                </div>
+                <div class="patient-info">
+                    <h3>Patient Information</h3>
+                    <p><strong>Name:</strong> {patient_name}</p>
+                    <p><strong>MRN:</strong> {mrn}</p>
+                    <p><strong>Alert Generated:</strong> {created_at}</p>
+                </div>
+                <div>
+                    <h3>Required Action</h3>
+                    <p>Please review this patient's status as soon as possible and update the alert status in the Sepsis Management System.</p>
+                </div>
+                <div class="footer">
+                    <p>This is an automated message from the Sepsis Management System. Please do not reply to this email.</p>
+                    <p>If you have any questions, please contact IT support.</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+# Alert box colour per alert severity
+_SEVERITY_COLORS = {
+    5: "#FF0000",  # Red for critical
+    4: "#FF6600",  # Orange for high
+    3: "#FFCC00",  # Yellow for medium
+    2: "#33CC33",  # Green for low
+}
+
 class NotificationService:
     def __init__(self):
         self.redis_pool = None
+        self._connection_pool = None
         self.connected = False
+        # Created on first publish, inside the running event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        # Idle logged-in SMTP sessions; the semaphore caps sessions (and sends in
+        # flight) at SMTP_MAX_CONNECTIONS
+        self._smtp_idle: List[aiosmtplib.SMTP] = []
+        self._smtp_semaphore: Optional[asyncio.Semaphore] = None
     
     async def connect(self):
         """
-        Connect to Redis for pub/sub messaging
+        Connect to Redis for pub/sub messaging (called at startup; publish_alert
+        retries it if Redis was unreachable then)
         """
         if not self.connected:
             try:
-                self.redis_pool = await aioredis.create_redis_pool(
-                    f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}"
-                )
+                # One client (and pool) even when several publishes connect at once;
+                # the blocking pool makes callers wait for a free connection
+                # instead of failing once REDIS_POOL_SIZE are in use
+                if self.redis_pool is None:
+                    self._connection_pool = aioredis.BlockingConnectionPool.from_url(
+                        f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+                        max_connections=settings.REDIS_POOL_SIZE
+                    )
+                    self.redis_pool = aioredis.Redis(connection_pool=self._connection_pool)
+                # from_url connects lazily; check the server is reachable
+                await self.redis_pool.ping()
                 self.connected = True
                 logger.info("Connected to Redis for notifications")
             except Exception as e:
@@ -33,17 +100,41 @@ class NotificationService:
     
     async def disconnect(self):
         """
-        Disconnect from Redis
+        Publish the alerts still queued, then disconnect from Redis and SMTP
         """
+        while self._smtp_idle:
+            try:
+                await self._smtp_idle.pop().quit()
+            except aiosmtplib.SMTPException:
+                pass
+        if self._flusher_task is not None:
+            if not self._flusher_task.done():
+                try:
+                    await asyncio.wait_for(self._queue.join(), settings.REDIS_DRAIN_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.warning("Gave up waiting for queued alerts to be published on shutdown")
+            # Let the flusher resolve the batch it was publishing before dropping the queue
+            self._flusher_task.cancel()
+            await asyncio.gather(self._flusher_task, return_exceptions=True)
+            # Alerts still queued were not published
+            while not self._queue.empty():
+                _, published = self._queue.get_nowait()
+                if not published.done():
+                    published.set_result(False)
+            self._queue = self._flusher_task = None
         if self.connected and self.redis_pool:
-            self.redis_pool.close()
-            await self.redis_pool.wait_closed()
+            await self.redis_pool.close()
+            await self._connection_pool.disconnect()
+            self.redis_pool = self._connection_pool = None
             self.connected = False
             logger.info("Disconnected from Redis")
     
-    async def publish_alert(self, alert: Alert) -> bool:
+    async def publish_alert(self, alert: Alert, wait: bool = True) -> bool:
         """
-        Publish alert to Redis for real-time notifications
+        Publish alert to Redis for real-time notifications; concurrent alerts
+        are published together in batches by _flush_alerts. Returns whether
+        the alert's batch reached Redis, or with wait=False (fire-and-forget)
+        returns once the alert is queued
         """
         if not self.connected:
             await self.connect()
@@ -60,30 +151,116 @@ class NotificationService:
                 "alert_type": alert.alert_type,
                 "severity": alert.severity,
                 "message": alert.message,
-                "created_at": alert.created_at.isoformat() if alert.created_at else datetime.now().isoformat(),
+                # orjson writes datetimes as ISO 8601 itself
+                "created_at": alert.created_at or datetime.now(),
                 "status": alert.status
             }
             
-            # Create channel based on alert severity
-            channel = f"alerts:severity:{alert.severity}"
-            
-            # Publish to severity-specific channel
-            await self.redis_pool.publish(channel, json.dumps(alert_message))
-            
-            # Also publish to patient-specific channel
-            patient_channel = f"alerts:patient:{alert.patient_id}"
-            await self.redis_pool.publish(patient_channel, json.dumps(alert_message))
-            
-            # Also publish to all-alerts channel
-            await self.redis_pool.publish("alerts:all", json.dumps(alert_message))
-            
-            logger.info(f"Published alert {alert.id} to Redis")
-            return True
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=settings.REDIS_QUEUE_SIZE)
+            if self._flusher_task is None or self._flusher_task.done():
+                # First publish, or the flusher died: (re)start it on the queue
+                self._flusher_task = asyncio.create_task(self._flush_alerts())
+            # Resolved by _flush_alerts with the outcome of the alert's batch
+            published = asyncio.get_running_loop().create_future()
+            await self._queue.put((alert_message, published))
+            if not wait:
+                return True
+            return await published
         
         except Exception as e:
             logger.error(f"Failed to publish alert: {str(e)}")
             return False
     
+    async def _flush_alerts(self):
+        """
+        Background task: take the queued alerts in batches of up to
+        REDIS_BATCH_SIZE and publish each batch in one pipeline, resolving the
+        publishers' futures with the result
+        """
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + settings.REDIS_FLUSH_INTERVAL_MS / 1000
+            while len(batch) < settings.REDIS_BATCH_SIZE:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            result = False
+            try:
+                result = await self._publish_batch([alert_message for alert_message, _ in batch])
+            finally:
+                for _, published in batch:
+                    # Publishers that were cancelled no longer wait for the result
+                    if not published.done():
+                        published.set_result(result)
+                    queue.task_done()
+    
+    async def _publish_batch(self, alert_messages: List[Dict[str, Any]]) -> bool:
+        """
+        Publish alerts to their severity-specific, patient-specific and all-alerts
+        channels in one round trip (no MULTI needed for independent PUBLISHes);
+        returns whether the pipeline succeeded
+        """
+        try:
+            pipe = self.redis_pool.pipeline(transaction=False)
+            for alert_message in alert_messages:
+                # bytes, published as-is
+                payload = orjson.dumps(alert_message)
+                pipe.publish(f"alerts:severity:{alert_message['severity']}", payload)
+                pipe.publish(f"alerts:patient:{alert_message['patient_id']}", payload)
+                pipe.publish("alerts:all", payload)
+            await pipe.execute()
+            logger.info(f"Published {len(alert_messages)} alerts to Redis")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to publish {len(alert_messages)} alerts: {str(e)}")
+            return False
+    
+    async def _open_smtp(self) -> aiosmtplib.SMTP:
+        """
+        Open a new SMTP session (connect, STARTTLS and login)
+        """
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.SMTP_SERVER,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            start_tls=True
+        )
+        await smtp.connect()
+        return smtp
+    
+    async def _send_message(self, email: MIMEMultipart):
+        """
+        Send over an idle pooled session (or a new one), reconnecting once if the
+        server dropped it (e.g. idle timeout)
+        """
+        if self._smtp_semaphore is None:
+            self._smtp_semaphore = asyncio.Semaphore(settings.SMTP_MAX_CONNECTIONS)
+        async with self._smtp_semaphore:
+            smtp = self._smtp_idle.pop() if self._smtp_idle else None
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._open_smtp()
+                try:
+                    await smtp.send_message(email)
+                except aiosmtplib.SMTPServerDisconnected:
+                    smtp = await self._open_smtp()
+                    await smtp.send_message(email)
+            finally:
+                # Sessions still usable after the send go back to the pool
+                if smtp is not None and smtp.is_connected:
+                    self._smtp_idle.append(smtp)
+    
     async def send_email_alert(
         self, 
         recipient_email: str, 
@@ -110,11 +287,7 @@ class NotificationService:
             if html_message:
                 email.attach(MIMEText(html_message, "html"))
             
-            # Connect to SMTP server and send email
-            with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-                server.starttls()
-                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                server.sendmail(settings.SMTP_USER, recipient_email, email.as_string())
+            await self._send_message(email)
             
             logger.info(f"Sent email alert to {recipient_email}")
             return True
@@ -138,97 +311,54 @@ class NotificationService:
         patient_name = f"{patient_data.get('first_name', '')} {patient_data.get('last_name', '')}".strip()
         mrn = patient_data.get('mrn', 'Unknown')
         
-        severity_color = "#000000"
-        if alert.severity == 5:
-            severity_color = "#FF0000"  # Red for critical
-        elif alert.severity == 4:
-            severity_color = "#FF6600"  # Orange for high
-        elif alert.severity == 3:
-            severity_color = "#FFCC00"  # Yellow for medium
-        elif alert.severity == 2:
-            severity_color = "#33CC33"  # Green for low
-        
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #003366; color: white; padding: 10px; text-align: center; }}
-                .alert-box {{ border: 2px solid {severity_color}; padding: 15px; margin-top: 20px; }}
-                .alert-title {{ color: {severity_color}; font-weight: bold; font-size: 18px; }}
-                .patient-info {{ background-color: #f0f0f0; padding: 10px; margin-top: 20px; }}
-                .footer {{ margin-top: 30px; font-size: 12px; color: #666; text-align: center; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Sepsis Alert Notification</h1>
-                </div>
-                <div class="alert-box">
-                    <div class="alert-title">{alert.alert_type.replace('_', ' ')}</div>
-                    <p>{alert.message}</p>
-                </div>
-                <div class="patient-info">
-                    <h3>Patient Information</h3>
-                    <p><strong>Name:</strong> {patient_name}</p>
-                    <p><strong>MRN:</strong> {mrn}</p>
-                    <p><strong>Alert Generated:</strong> {alert.created_at.strftime('%Y-%m-%d %H:%M:%S') if alert.created_at else 'N/A'}</p>
-                </div>
-                <div>
-                    <h3>Required Action</h3>
-                    <p>Please review this patient's status as soon as possible and update the alert status in the Sepsis Management System.</p>
-                </div>
-                <div class="footer">
-                    <p>This is an automated message from the Sepsis Management System. Please do not reply to this email.</p>
-                    <p>If you have any questions, please contact IT support.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return html
+        return _EMAIL_HTML_TEMPLATE.format_map({
+            "severity_color": _SEVERITY_COLORS.get(alert.severity, "#000000"),
+            "alert_title": alert.alert_type.replace('_', ' '),
+            "message": alert.message,
+            "patient_name": patient_name,
+            "mrn": mrn,
+            "created_at": alert.created_at.strftime('%Y-%m-%d %H:%M:%S') if alert.created_at else 'N/A'
+        })
     
     async def notify_users_of_alert(
         self, 
         alert: Alert, 
         patient_data: Dict[str, Any],
-        users: List[User]
+        users: List[User],
+        wait_for_redis: bool = True
     ) -> Dict[str, Any]:
         """
-        Send notifications to multiple users about an alert
+        Send notifications to multiple users about an alert. With
+        wait_for_redis=False the Redis publish is fire-and-forget, and the
+        results report "queued_for_redis" instead of "published_to_redis"
         """
         notification_results = {
             "email_sent": [],
             "email_failed": [],
             "sms_sent": [],
-            "sms_failed": [],
-            "published_to_redis": False
+            "sms_failed": []
         }
         
-        # Publish to Redis for real-time updates
-        redis_result = await self.publish_alert(alert)
-        notification_results["published_to_redis"] = redis_result
+        # Prepare email content (the same for every recipient)
+        subject = f"SEPSIS ALERT: {alert.alert_type.replace('_', ' ')} - Severity {alert.severity}"
+        message = alert.message
+        html_message = self.format_email_html(alert, patient_data)
         
-        # Process each user
-        for user in users:
-            # Skip inactive users
-            if not user.is_active:
-                continue
-            
-            # Prepare email content
-            subject = f"SEPSIS ALERT: {alert.alert_type.replace('_', ' ')} - Severity {alert.severity}"
-            message = alert.message
-            html_message = self.format_email_html(alert, patient_data)
-            
-            # Send email if user has an email
-            if user.email:
-                email_sent = await self.send_email_alert(user.email, subject, message, html_message)
-                if email_sent:
-                    notification_results["email_sent"].append(user.id)
-                else:
-                    notification_results["email_failed"].append(user.id)
+        # Publish to Redis for real-time updates while emailing every active user
+        # that has an address, concurrently (bounded by the SMTP session pool)
+        recipients = [user for user in users if user.is_active and user.email]
+        redis_result, *emails_sent = await asyncio.gather(
+            self.publish_alert(alert, wait=wait_for_redis),
+            *(self.send_email_alert(user.email, subject, message, html_message) for user in recipients),
+            return_exceptions=True
+        )
+        notification_results["published_to_redis" if wait_for_redis else "queued_for_redis"] = redis_result is True
+        for user, email_sent in zip(recipients, emails_sent):
+            if email_sent is True:
+                notification_results["email_sent"].append(user.id)
+            else:
+                notification_results["email_failed"].append(user.id)
         
-        return notification_results
\ No newline at end of file
+        return notification_results
+
+notification_service = NotificationService()
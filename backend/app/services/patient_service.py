@@ -1,20 +1,25 @@
 from typing import Dict, List, Any, Optional, Tuple
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 from datetime import datetime, timedelta
+import asyncio
 
 from app.db import crud
-from app.fhir.client import FHIRClient
+from app.db.models import Patient, model_serializer, model_to_dict
+from app.fhir.client import fhir_client
 from app.fhir.parser import FHIRParser
 
+_patient_search_result = model_serializer(Patient, exclude=("fhir_resource",))
+
 class PatientService:
     def __init__(self):
-        self.fhir_client = FHIRClient()
+        self.fhir_client = fhir_client
         self.fhir_parser = FHIRParser()
     
     async def sync_patient_from_fhir(
         self,
-        db: Session,
+        db: AsyncSession,
         patient_id: str
     ) -> Dict[str, Any]:
         """
@@ -22,29 +27,29 @@ class PatientService:
         """
         try:
             # Get patient from FHIR
-            fhir_patient = self.fhir_client.get_patient(patient_id)
+            fhir_patient = await self.fhir_client.get_patient(patient_id)
             
             # Parse FHIR patient to simplified structure
             parsed_patient = self.fhir_parser.parse_patient(fhir_patient)
             
             # Check if patient exists in our database
-            db_patient = crud.get_patient(db, patient_id)
+            db_patient = await crud.get_patient(db, patient_id)
             
             if db_patient:
                 # Update existing patient
-                updated_patient = crud.update_patient(db, patient_id, parsed_patient)
+                updated_patient = await crud.update_patient(db, patient_id, parsed_patient)
                 result = {
                     "status": "updated",
                     "patient_id": updated_patient.id,
-                    "patient": {c.key: getattr(updated_patient, c.key) for c in updated_patient.__table__.columns}
+                    "patient": model_to_dict(updated_patient)
                 }
             else:
                 # Create new patient
-                new_patient = crud.create_patient(db, parsed_patient)
+                new_patient = await crud.create_patient(db, parsed_patient)
                 result = {
                     "status": "created",
                     "patient_id": new_patient.id,
-                    "patient": {c.key: getattr(new_patient, c.key) for c in new_patient.__table__.columns}
+                    "patient": model_to_dict(new_patient)
                 }
             
             # Sync clinical data
@@ -59,40 +64,45 @@ class PatientService:
     
     async def sync_patient_clinical_data(
         self,
-        db: Session,
+        db: AsyncSession,
         patient_id: str
     ) -> Dict[str, Any]:
         """
         Fetch and sync clinical data for a patient from FHIR
         """
         try:
-            # Get vital signs
-            vital_signs = self.fhir_client.get_patient_observations(patient_id, "vital-signs")
-            
-            # Get lab results
-            lab_results = self.fhir_client.get_patient_observations(patient_id, "laboratory")
+            # Get vital signs and lab results concurrently
+            vital_signs, lab_results = await asyncio.gather(
+                self.fhir_client.get_patient_observations(patient_id, "vital-signs"),
+                self.fhir_client.get_patient_observations(patient_id, "laboratory"),
+            )
             
             # Combine observations
             all_observations = vital_signs + lab_results
             
-            # Parse and store each observation
-            created_count = 0
-            for entry in all_observations:
-                if "resource" not in entry:
-                    continue
-                
-                observation = entry["resource"]
-                parsed_obs = self.fhir_parser.parse_observation(observation)
-                
-                # Check if we already have this observation
-                existing_obs = db.query(crud.ClinicalData).filter(
-                    crud.ClinicalData.fhir_resource_id == parsed_obs["fhir_resource_id"]
-                ).first()
-                
-                if not existing_obs:
-                    # Create new clinical data entry
-                    crud.create_clinical_data(db, parsed_obs)
-                    created_count += 1
+            # Parse every observation
+            parsed_observations = [
+                self.fhir_parser.parse_observation(entry["resource"])
+                for entry in all_observations
+                if "resource" in entry
+            ]
+            
+            # Skip observations we already have (one query for all of them), and
+            # repeats within this sync (vital-signs and laboratory may overlap)
+            seen_ids = await crud.get_existing_clinical_data_ids(
+                db, {obs["fhir_resource_id"] for obs in parsed_observations if obs["fhir_resource_id"] is not None}
+            )
+            new_observations = []
+            for parsed_obs in parsed_observations:
+                fhir_resource_id = parsed_obs["fhir_resource_id"]
+                if fhir_resource_id is not None:
+                    if fhir_resource_id in seen_ids:
+                        continue
+                    seen_ids.add(fhir_resource_id)
+                new_observations.append(parsed_obs)
+            
+            # Store the new ones with one bulk INSERT
+            created_count = await crud.create_clinical_data_records(db, new_observations)
             
             return {
                 "status": "success", 
@@ -106,87 +116,27 @@ class PatientService:
     
     async def get_patient_summary(
         self,
-        db: Session,
+        db: AsyncSession,
         patient_id: str
     ) -> Dict[str, Any]:
         """
-        Get comprehensive patient summary including clinical data and predictions
+        Get comprehensive patient summary including clinical data and predictions.
+        The summary is assembled by the database and returned as raw JSON text
         """
         try:
-            # Get patient
-            patient = crud.get_patient(db, patient_id)
-            if not patient:
+            summary = await crud.get_patient_summary_json(db, patient_id)
+            if summary is None:
                 return {"status": "error", "message": f"Patient {patient_id} not found"}
             
-            # Get recent clinical data
-            recent_clinical_data = crud.get_patient_clinical_data(db, patient_id, skip=0, limit=50)
-            
-            # Get latest vitals
-            latest_vitals = self._extract_latest_vitals(recent_clinical_data)
-            
-            # Get recent sepsis predictions
-            recent_predictions = crud.get_patient_predictions(db, patient_id, skip=0, limit=10)
-            
-            # Get active alerts
-            active_alerts = db.query(crud.Alert).filter(
-                crud.Alert.patient_id == patient_id,
-                crud.Alert.status.in_(["pending", "acknowledged"])
-            ).order_by(crud.Alert.created_at.desc()).all()
-            
-            # Format data for response
-            return {
-                "patient": {c.key: getattr(patient, c.key) for c in patient.__table__.columns if c.key != 'fhir_resource'},
-                "latest_vitals": latest_vitals,
-                "recent_clinical_data": [
-                    {c.key: getattr(data, c.key) for c in data.__table__.columns if c.key != 'fhir_resource'} 
-                    for data in recent_clinical_data[:10]  # Limit to most recent 10
-                ],
-                "sepsis_predictions": [
-                    {c.key: getattr(pred, c.key) for c in pred.__table__.columns if c.key not in ['features_used', 'explanation']}
-                    for pred in recent_predictions
-                ],
-                "latest_prediction": {c.key: getattr(recent_predictions[0], c.key) for c in recent_predictions[0].__table__.columns} if recent_predictions else None,
-                "active_alerts": [
-                    {c.key: getattr(alert, c.key) for c in alert.__table__.columns}
-                    for alert in active_alerts
-                ],
-                "alert_count": len(active_alerts)
-            }
+            return {"status": "success", "summary": summary}
         
         except Exception as e:
             logger.error(f"Error getting patient summary: {str(e)}")
             return {"status": "error", "message": str(e)}
     
-    def _extract_latest_vitals(self, clinical_data_list: List[Any]) -> Dict[str, Any]:
-        """
-        Extract the latest values for each vital sign from clinical data
-        """
-        vital_keys = [
-            "heart_rate", "respiratory_rate", "temperature", 
-            "systolic_bp", "diastolic_bp", "oxygen_saturation",
-            "blood_glucose", "wbc_count", "platelet_count",
-            "lactate", "creatinine", "bilirubin"
-        ]
-        
-        latest_vitals = {}
-        timestamps = {}
-        
-        for data in clinical_data_list:
-            for key in vital_keys:
-                value = getattr(data, key, None)
-                if value is not None and (key not in latest_vitals or data.timestamp > timestamps.get(key, datetime.min)):
-                    latest_vitals[key] = value
-                    timestamps[key] = data.timestamp
-        
-        # Add timestamps to the output
-        for key in latest_vitals.keys():
-            latest_vitals[f"{key}_timestamp"] = timestamps[key].isoformat() if key in timestamps else None
-        
-        return latest_vitals
-    
     async def search_patients(
         self,
-        db: Session,
+        db: AsyncSession,
         query: str,
         limit: int = 20
     ) -> List[Dict[str, Any]]:
@@ -195,14 +145,17 @@ class PatientService:
         """
         try:
             # Search in local database first
-            db_patients = db.query(crud.Patient).filter(
-                (crud.Patient.first_name.ilike(f"%{query}%")) |
-                (crud.Patient.last_name.ilike(f"%{query}%")) |
-                (crud.Patient.mrn.ilike(f"%{query}%"))
-            ).limit(limit).all()
+            result = await db.execute(
+                select(crud.Patient).where(
+                    (crud.Patient.first_name.ilike(f"%{query}%")) |
+                    (crud.Patient.last_name.ilike(f"%{query}%")) |
+                    (crud.Patient.mrn.ilike(f"%{query}%"))
+                ).limit(limit)
+            )
+            db_patients = result.scalars().all()
             
             results = [
-                {c.key: getattr(patient, c.key) for c in patient.__table__.columns if c.key != 'fhir_resource'}
+                _patient_search_result(patient)
                 for patient in db_patients
             ]
             
@@ -214,7 +167,7 @@ class PatientService:
                         "name": query,
                         "_count": limit - len(results)
                     }
-                    fhir_results = self.fhir_client.search_patients(fhir_params)
+                    fhir_results = await self.fhir_client.search_patients(fhir_params)
                     
                     # Process FHIR results
                     for entry in fhir_results:
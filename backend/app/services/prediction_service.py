@@ -1,48 +1,52 @@
 from typing import Dict, List, Any, Optional, Tuple
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 from datetime import datetime
+import asyncio
 
+from app.ml.feature_engineering import FEATURE_SOURCE_COLUMNS
 from app.ml.inference import SepsisPredictor
 from app.db import crud
-from app.db.models import Patient, Alert, AlertStatus, SepsisPrediction, User
-from app.services.notification import NotificationService
+from app.db.models import Patient, Alert, AlertStatus, SepsisPrediction, User, model_to_dict
+from app.services.notification import notification_service
 
 class PredictionService:
     def __init__(self):
         self.predictor = SepsisPredictor()
-        self.notification_service = NotificationService()
+        self.notification_service = notification_service
     
     async def predict_sepsis_for_patient(
         self,
-        db: Session,
+        db: AsyncSession,
         patient_id: str,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        patient: Optional[Patient] = None,
+        explain: bool = True
     ) -> Dict[str, Any]:
         """
-        Run sepsis prediction for a specific patient
+        Run sepsis prediction for a specific patient; pass `patient` if the
+        caller has already loaded it, explain=False to skip the SHAP explanation
         """
         try:
             # Get patient data
-            patient = crud.get_patient(db, patient_id)
+            if patient is None:
+                patient = await crud.get_patient(db, patient_id)
             if not patient:
                 logger.error(f"Patient {patient_id} not found")
                 return {"error": f"Patient {patient_id} not found"}
             
-            # Get clinical data for the patient
-            clinical_data = crud.get_patient_clinical_data(db, patient_id)
+            # Get the clinical data columns feature extraction reads
+            clinical_data = await crud.get_patient_clinical_data(
+                db, patient_id, columns=FEATURE_SOURCE_COLUMNS
+            )
             if not clinical_data:
                 logger.warning(f"No clinical data available for patient {patient_id}")
                 return {"error": "No clinical data available for prediction"}
             
-            # Convert SQLAlchemy models to dictionaries
-            clinical_data_dicts = [
-                {c.key: getattr(data, c.key) for c in data.__table__.columns}
-                for data in clinical_data
-            ]
-            
-            # Make prediction
-            prediction_result = await self.predictor.predict_sepsis_risk(clinical_data_dicts)
+            # Make prediction (rows are read through their mappings, not copied to dicts)
+            prediction_result = await self.predictor.predict_sepsis_risk(
+                [data._mapping for data in clinical_data], explain=explain
+            )
             
             # Save prediction to database
             prediction_data = {
@@ -55,15 +59,15 @@ class PredictionService:
                 "explanation": prediction_result["explanation"]
             }
             
-            prediction = crud.create_sepsis_prediction(db, prediction_data)
+            prediction = await crud.create_sepsis_prediction(db, prediction_data)
             logger.info(f"Created sepsis prediction {prediction.id} for patient {patient_id}")
             
             # Generate alert if risk is detected
             if prediction_result["is_sepsis_risk"]:
-                await self._create_alert_for_prediction(db, prediction, patient)
+                await self._create_alert_for_prediction(db, prediction, patient, prediction_result)
             
             # Prepare response
-            patient_dict = {c.key: getattr(patient, c.key) for c in patient.__table__.columns}
+            patient_dict = model_to_dict(patient)
             
             response = {
                 "prediction_id": prediction.id,
@@ -80,32 +84,18 @@ class PredictionService:
     
     async def _create_alert_for_prediction(
         self,
-        db: Session,
+        db: AsyncSession,
         prediction: SepsisPrediction,
-        patient: Patient
+        patient: Patient,
+        prediction_result: Dict[str, Any]
     ) -> Optional[Alert]:
         """
-        Create an alert based on a sepsis prediction
+        Create an alert based on a sepsis prediction; details come from the model's
+        `prediction_result` (the stored explanation is a deferred column)
         """
         try:
-            # Generate alert details
-            patient_dict = {c.key: getattr(patient, c.key) for c in patient.__table__.columns}
-            alert_details = self.predictor.get_alert_details(
-                {c.key: getattr(prediction, c.key) for c in prediction.__table__.columns},
-                patient_dict
-            )
-            
             # Create alert in database
-            alert_data = {
-                "patient_id": patient.id,
-                "prediction_id": prediction.id,
-                "alert_type": alert_details["alert_type"],
-                "severity": alert_details["severity"],
-                "status": AlertStatus.PENDING,
-                "message": alert_details["message"]
-            }
-            
-            alert = crud.create_alert(db, alert_data)
+            alert = await crud.create_alert(db, self._alert_data(prediction, patient, prediction_result))
             logger.info(f"Created alert {alert.id} for patient {patient.id}")
             
             # Notify users about the alert
@@ -117,33 +107,85 @@ class PredictionService:
             logger.error(f"Error creating alert: {str(e)}")
             return None
     
+    def _alert_data(
+        self,
+        prediction: SepsisPrediction,
+        patient: Patient,
+        prediction_result: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Column values of the alert for a risky prediction
+        """
+        # Generate alert details
+        alert_details = self.predictor.get_alert_details(
+            prediction_result,
+            model_to_dict(patient)
+        )
+        return {
+            "patient_id": patient.id,
+            "prediction_id": prediction.id,
+            "alert_type": alert_details["alert_type"],
+            "severity": alert_details["severity"],
+            "status": AlertStatus.PENDING,
+            "message": alert_details["message"]
+        }
+    
+    async def _create_alerts_for_predictions(
+        self,
+        db: AsyncSession,
+        risky_predictions: List[Tuple[SepsisPrediction, Patient, Dict[str, Any]]]
+    ) -> List[Alert]:
+        """
+        Create the alerts for several (prediction, patient, prediction_result)
+        in one INSERT, then notify users about all of them concurrently
+        """
+        try:
+            alerts = await crud.create_alerts(db, [
+                self._alert_data(prediction, patient, prediction_result)
+                for prediction, patient, prediction_result in risky_predictions
+            ])
+            logger.info(f"Created {len(alerts)} alerts in batch")
+            
+            # One recipient lookup for the batch; notifying doesn't touch the session
+            users = await crud.get_notification_recipients(db)
+            await asyncio.gather(*(
+                self._notify_users_about_alert(db, alert, patient, users)
+                for alert, (_, patient, _) in zip(alerts, risky_predictions)
+            ))
+            return alerts
+        
+        except Exception as e:
+            logger.error(f"Error creating alerts: {str(e)}")
+            return []
+    
     async def _notify_users_about_alert(
         self,
-        db: Session,
+        db: AsyncSession,
         alert: Alert,
-        patient: Patient
+        patient: Patient,
+        users: Optional[List[User]] = None
     ) -> Dict[str, Any]:
         """
-        Notify relevant users about a sepsis alert
+        Notify relevant users about a sepsis alert; pass `users` if the
+        recipients are already loaded
         """
         try:
             # Get users to notify (here we're just getting all active doctors and nurses)
             # In a real system, you'd filter by department, assigned patients, etc.
-            users = db.query(User).filter(
-                User.is_active == True,
-                (User.role == "doctor") | (User.role == "nurse")
-            ).all()
+            if users is None:
+                users = await crud.get_notification_recipients(db)
             
             if not users:
                 logger.warning("No users to notify about alert")
                 return {"status": "no_users"}
             
             # Convert patient to dict for the notification service
-            patient_dict = {c.key: getattr(patient, c.key) for c in patient.__table__.columns}
+            patient_dict = model_to_dict(patient)
             
-            # Send notifications
+            # Send notifications; the results are only logged, so the prediction
+            # doesn't wait for the Redis publish (fire-and-forget)
             notification_results = await self.notification_service.notify_users_of_alert(
-                alert, patient_dict, users
+                alert, patient_dict, users, wait_for_redis=False
             )
             
             logger.info(f"Notifications sent for alert {alert.id}: {notification_results}")
@@ -155,12 +197,14 @@ class PredictionService:
     
     async def batch_predict_sepsis(
         self,
-        db: Session,
+        db: AsyncSession,
         patient_ids: List[str],
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        explain: bool = True
     ) -> Dict[str, Any]:
         """
-        Run sepsis prediction for multiple patients
+        Run sepsis prediction for multiple patients: data is fetched in two
+        queries, scored in one model call and saved in one INSERT
         """
         results = {
             "successful": [],
@@ -170,30 +214,70 @@ class PredictionService:
             "failure_count": 0
         }
         
-        for patient_id in patient_ids:
-            try:
-                prediction_result = await self.predict_sepsis_for_patient(db, patient_id, user_id)
-                if "error" not in prediction_result:
-                    results["successful"].append({
-                        "patient_id": patient_id,
-                        "prediction_id": prediction_result["prediction_id"],
-                        "is_sepsis_risk": prediction_result["prediction"]["is_sepsis_risk"],
-                        "probability": prediction_result["prediction"]["probability"]
-                    })
-                    results["success_count"] += 1
+        try:
+            # Load every patient and their recent clinical data up front
+            patients = await crud.get_patients_by_ids(db, patient_ids)
+            clinical_data = await crud.get_recent_clinical_data_for_patients(
+                db, list(patients), columns=FEATURE_SOURCE_COLUMNS
+            )
+            
+            ready_ids = []
+            for patient_id in patient_ids:
+                if patient_id not in patients:
+                    error = f"Patient {patient_id} not found"
+                elif patient_id not in clinical_data:
+                    error = "No clinical data available for prediction"
                 else:
-                    results["failed"].append({
-                        "patient_id": patient_id,
-                        "error": prediction_result["error"]
-                    })
-                    results["failure_count"] += 1
+                    ready_ids.append(patient_id)
+                    continue
+                results["failed"].append({"patient_id": patient_id, "error": error})
+                results["failure_count"] += 1
+            
+            # One model call for the whole batch
+            prediction_results = await self.predictor.predict_sepsis_risk_batch([
+                [data._mapping for data in clinical_data[patient_id]]
+                for patient_id in ready_ids
+            ], explain=explain)
             
-            except Exception as e:
-                logger.error(f"Error in batch prediction for patient {patient_id}: {str(e)}")
-                results["failed"].append({
+            # Save all predictions in one INSERT
+            predictions = await crud.create_sepsis_predictions(db, [
+                {
                     "patient_id": patient_id,
-                    "error": str(e)
-                })
-                results["failure_count"] += 1
+                    "user_id": user_id,
+                    "probability": prediction_result["probability"],
+                    "is_sepsis_risk": prediction_result["is_sepsis_risk"],
+                    "features_used": prediction_result["features_used"],
+                    "model_version": prediction_result["model_version"],
+                    "explanation": prediction_result["explanation"]
+                }
+                for patient_id, prediction_result in zip(ready_ids, prediction_results)
+            ])
+            logger.info(f"Created {len(predictions)} sepsis predictions in batch")
+        
+        except Exception as e:
+            logger.error(f"Error in batch prediction: {str(e)}")
+            await db.rollback()
+            failed_ids = {entry["patient_id"] for entry in results["failed"]}
+            for patient_id in patient_ids:
+                if patient_id not in failed_ids:
+                    results["failed"].append({"patient_id": patient_id, "error": str(e)})
+                    results["failure_count"] += 1
+            return results
+        
+        # Generate alerts for the predictions where risk is detected
+        await self._create_alerts_for_predictions(db, [
+            (prediction, patients[prediction.patient_id], prediction_result)
+            for prediction, prediction_result in zip(predictions, prediction_results)
+            if prediction.is_sepsis_risk
+        ])
+        
+        for prediction in predictions:
+            results["successful"].append({
+                "patient_id": prediction.patient_id,
+                "prediction_id": prediction.id,
+                "is_sepsis_risk": prediction.is_sepsis_risk,
+                "probability": prediction.probability
+            })
+            results["success_count"] += 1
         
-        return results
\ No newline at end of file
+        return results
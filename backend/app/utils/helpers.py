@@ -1,11 +1,28 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import json
+import mmap
 import os
-import uuid
+import re
+import threading
 import base64
+import binascii
 from pathlib import Path
 
+# Pattern is_valid_email checks addresses against
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Image file extensions whose MIME subtype is spelled differently
+_IMAGE_SUBTYPES = {"jpg": "jpeg"}
+
+# IDs generate_unique_id cuts from each os.urandom call
+UNIQUE_ID_POOL_SIZE = 256
+# Version (4) and variant (RFC 4122) bits of a random UUID, as uuid.UUID sets them
+_UUID4_CLEAR = ~((0xF000 << 64) | (0xC000 << 48))
+_UUID4_SET = (0x4000 << 64) | (0x8000 << 48)
+_id_lock = threading.Lock()
+_id_pool = b""
+_id_offset = 0
+
 def format_datetime(dt: Optional[datetime]) -> Optional[str]:
     """
     Format datetime to ISO format string
@@ -27,9 +44,25 @@ def parse_datetime(dt_str: Optional[str]) -> Optional[datetime]:
 
 def generate_unique_id() -> str:
     """
-    Generate a unique ID
+    Generate a unique ID: a random (version 4) UUID string, cut from a pool of
+    os.urandom bytes refilled every UNIQUE_ID_POOL_SIZE ids
     """
-    return str(uuid.uuid4())
+    global _id_pool, _id_offset
+    with _id_lock:
+        if _id_offset == len(_id_pool):
+            _id_pool = os.urandom(16 * UNIQUE_ID_POOL_SIZE)
+            _id_offset = 0
+        value = int.from_bytes(_id_pool[_id_offset:_id_offset + 16], "big")
+        _id_offset += 16
+    h = "%032x" % (value & _UUID4_CLEAR | _UUID4_SET)
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+def _reset_id_pool() -> None:
+    # A forked worker must not hand out the ids left in its parent's pool
+    global _id_pool, _id_offset
+    _id_pool, _id_offset = b"", 0
+
+os.register_at_fork(after_in_child=_reset_id_pool)
 
 def encode_image_to_base64(image_path: str) -> Optional[str]:
     """
@@ -37,11 +70,16 @@ def encode_image_to_base64(image_path: str) -> Optional[str]:
     """
     try:
         with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-            image_type = Path(image_path).suffix.lstrip('.').lower()
-            if image_type == 'jpg':
-                image_type = 'jpeg'
-            return f"data:image/{image_type};base64,{encoded_string}"
+            if os.fstat(image_file.fileno()).st_size:
+                # Encode straight from the page cache instead of a read() copy
+                with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image_data:
+                    encoded_string = base64.b64encode(image_data).decode("ascii")
+            else:
+                # Empty files cannot be mapped
+                encoded_string = ""
+        extension = Path(image_path).suffix.lstrip('.').lower()
+        image_type = _IMAGE_SUBTYPES.get(extension, extension)
+        return f"data:image/{image_type};base64,{encoded_string}"
     except Exception as e:
         return None
 
@@ -68,6 +106,22 @@ def is_valid_email(email: str) -> bool:
     """
     Simple email validation
     """
-    import re
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
\ No newline at end of file
+    return _EMAIL_RE.match(email) is not None
+
+def encode_cursor(sort_value: datetime, row_id: str) -> str:
+    """
+    Encode a keyset pagination position as an opaque base64url token
+    """
+    raw = json.dumps([sort_value.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a token from encode_cursor; raises ValueError if it is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), str(row_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid pagination cursor") from e